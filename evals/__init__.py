@@ -7,6 +7,12 @@ including entity extraction, sentiment analysis, and combined analysis.
 __version__ = "0.1.0"
 
 __all__ = [
+    'benchmark',
+    'grade',
+    'merge',
     'prompts',
+    'score',
+    'service',
+    'sweep',
     'utils',
 ]
@@ -0,0 +1,13 @@
+"""Offline benchmarks for the experiment runners.
+
+This package provides:
+- Mock server: An OpenAI-compatible stand-in with canned responses and injected latency/failures
+- Benchmark suite: Throughput, latency and memory measurements against the mock server
+- Startup benchmark: Cold-start time of the command-line entry points
+"""
+
+__all__ = [
+    'mock_server',
+    'run_benchmark',
+    'startup',
+]
@@ -0,0 +1,291 @@
+"""Local OpenAI-compatible mock server for offline runner benchmarks.
+
+This module provides a small chat.completions endpoint that answers the repo's
+prompts with canned responses derived from the dataset labels, with a
+configurable latency distribution, server error rate and 429 injection. Usage
+reports cached_tokens like a provider with automatic prefix caching: the
+longest prompt prefix seen before, in 128-token steps from a minimum length. Point
+the OpenAI client at it with OPENAI_BASE_URL to exercise the runners without
+network access or API spend:
+
+    python -m evals.benchmark.mock_server --port 8787 --latency_ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=mock python experiment_runner.py ...
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from evals.prompts.layout import PREFIX_CACHE_MIN_TOKENS
+from evals.utils.data import load_dataset, prepare_rows
+
+# Granularity of cached prefixes beyond the minimum length
+PREFIX_CACHE_STEP_TOKENS = 128
+
+def load_labels() -> Dict[str, Tuple[List[str], str]]:
+    """Build a tweet -> (airlines, sentiment) lookup from both dataset splits.
+
+    Returns:
+        Dictionary mapping tweet text to its labelled airlines and sentiment
+    """
+    labels = {}
+    for dataset_type in ("train", "test"):
+        columns = prepare_rows(load_dataset(dataset_type))
+        for tweet, airlines, sentiment in zip(columns['tweet'], columns['airlines'], columns['sentiment']):
+            labels[tweet] = (airlines, sentiment)
+    return labels
+
+class MockLLM:
+    """Canned-response model with injected latency and failures."""
+
+    def __init__(self, labels: Dict[str, Tuple[List[str], str]], latency_ms: float = 300.0, latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                 seed: Optional[int] = None, prefix_cache_min_tokens: int = PREFIX_CACHE_MIN_TOKENS):
+        """Initialize the mock model.
+
+        Args:
+            labels: Tweet -> (airlines, sentiment) lookup from load_labels
+            latency_ms: Median response latency in milliseconds (log-normal distribution)
+            latency_sigma: Log-space standard deviation of the latency distribution
+            error_rate: Fraction of requests answered with HTTP 500
+            rate_limit_rate: Fraction of requests answered with HTTP 429
+            retry_after: Retry-After value (seconds) sent with 429 responses
+            seed: Optional random seed for reproducible runs
+            prefix_cache_min_tokens: Shortest prefix reported as cached, 0 to disable prefix caching
+        """
+        self.labels = labels
+        # Longest tweets first so a tweet that contains another one matches correctly
+        self._tweets = sorted(labels, key=len, reverse=True)
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0}
+        self.prefix_cache_min_tokens = prefix_cache_min_tokens
+        self._prefixes = set()
+
+    def sample_latency(self) -> float:
+        """Draw one response latency in seconds."""
+        with self._lock:
+            if self.latency_ms <= 0:
+                return 0.0
+            return self._random.lognormvariate(math.log(self.latency_ms / 1000.0), self.latency_sigma)
+
+    def sample_failure(self) -> Optional[int]:
+        """Decide whether to fail the current request.
+
+        Returns:
+            HTTP status to fail with (429 or 500), or None to succeed
+        """
+        with self._lock:
+            self.counts['requests'] += 1
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                self.counts['rate_limited'] += 1
+                return 429
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.counts['errors'] += 1
+                return 500
+            self.counts['ok'] += 1
+            return None
+
+    def cached_tokens(self, prompt: str) -> int:
+        """Report how many leading tokens of a prompt a prefix cache would serve.
+
+        Tokens are estimated as four characters each, matching the usage the
+        server reports. Every prefix of the prompt at the cache's granularity
+        is remembered for later requests.
+
+        Args:
+            prompt: Prompt text (all messages concatenated)
+
+        Returns:
+            Cached prompt tokens: 0 or at least prefix_cache_min_tokens, in 128-token steps
+        """
+        if self.prefix_cache_min_tokens <= 0:
+            return 0
+        cached = 0
+        hit = True
+        with self._lock:
+            for tokens in range(self.prefix_cache_min_tokens, len(prompt) // 4 + 1, PREFIX_CACHE_STEP_TOKENS):
+                key = hash(prompt[:tokens * 4])
+                if hit and key in self._prefixes:
+                    cached = tokens
+                else:
+                    hit = False
+                    self._prefixes.add(key)
+        return cached
+
+    def find_tweets(self, prompt: str) -> List[str]:
+        """Find the known tweets contained in a prompt, in prompt order.
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            Matched tweets ordered by their position in the prompt
+        """
+        found = []
+        taken = []
+        for tweet in self._tweets:
+            pos = prompt.find(tweet)
+            if pos == -1 or any(start <= pos < end for start, end in taken):
+                continue
+            taken.append((pos, pos + len(tweet)))
+            found.append((pos, tweet))
+        return [tweet for _, tweet in sorted(found)]
+
+    def respond(self, prompt: str) -> str:
+        """Produce the canned response for a prompt.
+
+        Args:
+            prompt: Prompt text (all messages concatenated)
+
+        Returns:
+            Response content in the format the prompt asks for
+        """
+        if "INFERRED PASS" in prompt:
+            # Grader prompts: every ambiguous record is an inferred pass
+            items = len(re.findall(r"^### Item \d+$", prompt, re.MULTILINE))
+            if items:
+                return json.dumps([{"item": number, "result": "INFERRED PASS"} for number in range(1, items + 1)])
+            return "Result: INFERRED PASS"
+        tweets = self.find_tweets(prompt)
+        labelled = [(tweet,) + self.labels[tweet] for tweet in tweets] or [("", [], "neutral")]
+        tweet, airlines, sentiment = labelled[0]
+        if "Tweets to analyze" in prompt:
+            return json.dumps([{"tweet": t, "airlines": a, "sentiment": s} for t, a, s in labelled])
+        if '"sentiments"' in prompt:
+            return json.dumps({"sentiments": {airline: sentiment for airline in airlines}})
+        if re.search(r"^\s*Airline: ", prompt, re.MULTILINE):
+            return json.dumps({"sentiment": sentiment})
+        if "STEP 2" in prompt:
+            return json.dumps({"airlines": airlines, "sentiment": sentiment})
+        return json.dumps({"airlines": airlines})
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded HTTP server sized for highly concurrent benchmark clients."""
+
+    daemon_threads = True
+    # The default backlog of 5 drops connection bursts and adds ~1s SYN retransmit stalls
+    request_queue_size = 256
+
+def make_handler(model: MockLLM):
+    """Create a request handler class bound to a mock model.
+
+    Args:
+        model: The MockLLM answering requests
+
+    Returns:
+        BaseHTTPRequestHandler subclass
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send_json(200, model.counts)
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            time.sleep(model.sample_latency())
+            failure = model.sample_failure()
+            if failure == 429:
+                self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests"}},
+                                {"Retry-After": str(model.retry_after)})
+                return
+            if failure == 500:
+                self._send_json(500, {"error": {"message": "Internal server error (mock)", "type": "server_error"}})
+                return
+            prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+            content = model.respond(prompt)
+            prompt_tokens = max(1, len(prompt) // 4)
+            cached_tokens = model.cached_tokens(prompt)
+            completion_tokens = max(1, len(content) // 4)
+            self._send_json(200, {
+                "id": f"chatcmpl-mock-{model.counts['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                },
+            })
+
+    return Handler
+
+def start_mock_server(model: MockLLM, host: str = "127.0.0.1", port: int = 0) -> Tuple[MockServer, str]:
+    """Start the mock server on a background thread.
+
+    Args:
+        model: The MockLLM answering requests
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+
+    Returns:
+        Tuple of (server, base_url), where base_url is suitable for OPENAI_BASE_URL
+    """
+    server = MockServer((host, port), make_handler(model))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main():
+    """Run the mock server in the foreground."""
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI chat.completions server.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8787, help="Port to bind (default: 8787)")
+    parser.add_argument("--latency_ms", type=float, default=300.0, help="Median latency in ms (default: 300)")
+    parser.add_argument("--latency_sigma", type=float, default=0.5, help="Log-normal latency sigma (default: 0.5)")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of HTTP 500 responses (default: 0)")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Fraction of HTTP 429 responses (default: 0)")
+    parser.add_argument("--retry_after", type=float, default=1.0, help="Retry-After seconds on 429 (default: 1)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--prefix_cache_min_tokens", type=int, default=PREFIX_CACHE_MIN_TOKENS,
+                        help=f"Shortest prompt prefix reported as cached, 0 to disable (default: {PREFIX_CACHE_MIN_TOKENS}, as OpenAI)")
+    args = parser.parse_args()
+
+    model = MockLLM(load_labels(), args.latency_ms, args.latency_sigma, args.error_rate,
+                    args.rate_limit_rate, args.retry_after, args.seed, args.prefix_cache_min_tokens)
+    server = MockServer((args.host, args.port), make_handler(model))
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
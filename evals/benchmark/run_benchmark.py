@@ -0,0 +1,174 @@
+"""Reproducible throughput benchmark for experiment_runner.py.
+
+This module starts the mock LLM server, runs each experiment type and batch
+size against it in a fresh subprocess, and reports:
+- Tweets per second and API requests per run
+- p50/p95/p99 request latency as seen by the runner
+- Peak resident memory of the runner process
+
+Results can be saved as JSON and compared with an earlier run to catch
+regressions in the hot loop without network access:
+
+    python -m evals.benchmark.run_benchmark --n_samples 200 --output bench.json
+    python -m evals.benchmark.run_benchmark --n_samples 200 --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+from evals.benchmark.mock_server import MockLLM, load_labels, start_mock_server
+
+# (experiment, batch_size) pairs covering every runner code path
+DEFAULT_CASES = [
+    ("entity_v2_standardized", 1),
+    ("sentiment_v2_context_aware", 1),
+    ("sentiment_v3_multi_airline", 1),
+    ("combined_v1", 1),
+    ("combined_batch_v1", 10),
+    ("combined_batch_v1", 25),
+]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _peak_rss_mb(ru_maxrss: int) -> float:
+    """Convert ru_maxrss to megabytes (kilobytes on Linux, bytes on macOS)."""
+    return ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else ru_maxrss / 1024
+
+def run_case(experiment: str, batch_size: int, n_samples: int, concurrency: int, base_url: str,
+             results_dir: str) -> Dict:
+    """Run one experiment against the mock server and collect its metrics.
+
+    Args:
+        experiment: Experiment name passed to --experiment
+        batch_size: Batch size passed to --batch_size
+        n_samples: Number of tweets to process
+        concurrency: Concurrent requests passed to --concurrency
+        base_url: Mock server base URL
+        results_dir: Directory for the run's output directory
+
+    Returns:
+        Dictionary with throughput, latency percentiles and peak RSS
+    """
+    case_dir = tempfile.mkdtemp(dir=results_dir)
+    command = [sys.executable, os.path.join(REPO_ROOT, "experiment_runner.py"),
+               "--experiment", experiment, "--n_samples", str(n_samples), "--batch_size", str(batch_size),
+               "--concurrency", str(concurrency), "--rpm", "0", "--tpm", "0", "--results_dir", case_dir,
+               # Indexing would time the index update and leave index.sqlite next to the run directory
+               "--no_index"]
+    env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="mock")
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"{experiment} (batch {batch_size}) exited with status {process.returncode}")
+
+    (run_dir,) = os.listdir(case_dir)
+    with open(os.path.join(case_dir, run_dir, "summary.json")) as f:
+        summary = json.load(f)
+    return {
+        'experiment': experiment,
+        'batch_size': batch_size,
+        'n_samples': n_samples,
+        'requests': summary['requests'],
+        'tweets_per_sec': summary['tweets_per_sec'],
+        'p50_ms': summary['latency']['p50'] * 1000,
+        'p95_ms': summary['latency']['p95'] * 1000,
+        'p99_ms': summary['latency']['p99'] * 1000,
+        'peak_rss_mb': _peak_rss_mb(usage.ru_maxrss),
+    }
+
+def compare_to_baseline(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """Find cases whose throughput or memory regressed beyond a tolerance.
+
+    Args:
+        results: Results from this benchmark run
+        baseline: Results from an earlier --output file
+        tolerance: Allowed relative regression (0.1 = 10%)
+
+    Returns:
+        Human-readable regression descriptions (empty if none)
+    """
+    previous = {(entry['experiment'], entry['batch_size']): entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        old = previous.get((entry['experiment'], entry['batch_size']))
+        if old is None:
+            continue
+        name = f"{entry['experiment']} (batch {entry['batch_size']})"
+        if entry['tweets_per_sec'] < old['tweets_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {entry['tweets_per_sec']:.1f} tweets/sec vs {old['tweets_per_sec']:.1f} baseline")
+        if entry['peak_rss_mb'] > old['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: {entry['peak_rss_mb']:.0f} MB peak RSS vs {old['peak_rss_mb']:.0f} MB baseline")
+    return regressions
+
+def print_table(results: List[Dict]):
+    """Print benchmark results as an aligned table."""
+    print(f"{'experiment':<30} {'batch':>5} {'requests':>8} {'tweets/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'RSS MB':>7}")
+    for entry in results:
+        print(f"{entry['experiment']:<30} {entry['batch_size']:>5} {entry['requests']:>8} "
+              f"{entry['tweets_per_sec']:>9.1f} {entry['p50_ms']:>8.1f} {entry['p95_ms']:>8.1f} "
+              f"{entry['p99_ms']:>8.1f} {entry['peak_rss_mb']:>7.0f}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark suite.
+
+    Returns:
+        Process exit code (1 if a baseline regression was found)
+    """
+    parser = argparse.ArgumentParser(description="Benchmark experiment_runner.py against a mock LLM server.")
+    parser.add_argument("--n_samples", type=int, default=200, help="Tweets per run (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Runner --concurrency (default: 16)")
+    parser.add_argument("--experiments", nargs="+", default=None, help="Only run these experiments")
+    parser.add_argument("--latency_ms", type=float, default=200.0, help="Mock median latency in ms (default: 200)")
+    parser.add_argument("--latency_sigma", type=float, default=0.5, help="Mock log-normal latency sigma (default: 0.5)")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Mock fraction of HTTP 500 responses (default: 0)")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Mock fraction of HTTP 429 responses (default: 0)")
+    parser.add_argument("--seed", type=int, default=42, help="Mock random seed (default: 42)")
+    parser.add_argument("--output", default=None, help="Save results as JSON to this path")
+    parser.add_argument("--baseline", default=None, help="Compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression vs baseline (default: 0.15)")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in DEFAULT_CASES if args.experiments is None or case[0] in args.experiments]
+    model = MockLLM(load_labels(), args.latency_ms, args.latency_sigma, args.error_rate,
+                    args.rate_limit_rate, retry_after=0.5, seed=args.seed)
+    server, base_url = start_mock_server(model)
+    print(f"Mock server at {base_url} | median latency {args.latency_ms:.0f} ms | "
+          f"{args.n_samples} tweets per run | concurrency {args.concurrency}")
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as results_dir:
+            for experiment, batch_size in cases:
+                results.append(run_case(experiment, batch_size, args.n_samples, args.concurrency, base_url, results_dir))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print_table(results)
+    print(f"Mock server: {model.counts['requests']} requests | {model.counts['rate_limited']} rate limited | "
+          f"{model.counts['errors']} errors")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
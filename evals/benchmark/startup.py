@@ -0,0 +1,149 @@
+"""Cold-start benchmark for the command-line entry points.
+
+This module runs each CLI's --help in a fresh interpreter, without an API key,
+and reports:
+- Wall time from process start to exit (median and best of the repeats)
+- Total time spent in imports, from -X importtime
+
+--help exercises module import and argument parsing only, so a heavy import
+that creeps back to module level (pandas, numpy, openai) shows up here.
+Results can be saved as JSON and compared with an earlier run:
+
+    python -m evals.benchmark.startup --output startup.json
+    python -m evals.benchmark.startup --baseline startup.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (name, command after the interpreter)
+ENTRY_POINTS = [
+    ("experiment_runner", ["experiment_runner.py"]),
+    ("score", ["-m", "evals.score"]),
+    ("grade", ["-m", "evals.grade"]),
+    ("sweep", ["-m", "evals.sweep"]),
+    ("merge", ["-m", "evals.merge"]),
+    ("results_index", ["-m", "evals.results_index"]),
+    ("service", ["-m", "evals.service"]),
+    ("run_benchmark", ["-m", "evals.benchmark.run_benchmark"]),
+]
+
+# Top-level (unindented) entries of -X importtime output: "import time: self | cumulative | name"
+_TOP_LEVEL_IMPORT = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| \S")
+
+def _import_time_ms(stderr: str) -> float:
+    """Total import time in ms from -X importtime output."""
+    return sum(int(match.group(1)) for match in map(_TOP_LEVEL_IMPORT.match, stderr.splitlines()) if match) / 1000
+
+def time_entry_point(name: str, command: List[str], repeats: int) -> Dict:
+    """Run one entry point's --help repeatedly in fresh interpreters.
+
+    Args:
+        name: Label for the entry point
+        command: Arguments after the interpreter that start the entry point
+        repeats: Number of fresh processes to time
+
+    Returns:
+        Dictionary with median and best wall time and median import time in ms
+    """
+    # No API key, so an entry point that needs one to start fails here
+    env = {key: value for key, value in os.environ.items() if not key.startswith("OPENAI_")}
+    wall = []
+    imports = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", *command, "--help"], cwd=REPO_ROOT, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wall.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise RuntimeError(f"{name} --help exited with status {result.returncode}:\n{result.stderr[-2000:]}")
+        imports.append(_import_time_ms(result.stderr))
+    return {
+        'entry_point': name,
+        'wall_ms': statistics.median(wall),
+        'best_ms': min(wall),
+        'import_ms': statistics.median(imports),
+    }
+
+def compare_to_baseline(results: List[Dict], baseline: List[Dict], tolerance: float, slack_ms: float) -> List[str]:
+    """Find entry points whose startup time regressed beyond a tolerance.
+
+    Args:
+        results: Results from this benchmark run
+        baseline: Results from an earlier --output file
+        tolerance: Allowed relative regression (0.1 = 10%)
+        slack_ms: Absolute slack added to the allowance, so timer noise on fast commands is not a regression
+
+    Returns:
+        Human-readable regression descriptions (empty if none)
+    """
+    previous = {entry['entry_point']: entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry['entry_point'])
+        if old is None:
+            continue
+        if entry['wall_ms'] > old['wall_ms'] * (1 + tolerance) + slack_ms:
+            regressions.append(f"{entry['entry_point']}: {entry['wall_ms']:.0f} ms startup vs "
+                               f"{old['wall_ms']:.0f} ms baseline")
+    return regressions
+
+def print_table(results: List[Dict]):
+    """Print startup results as an aligned table."""
+    print(f"{'entry point':<20} {'median ms':>10} {'best ms':>8} {'import ms':>10}")
+    for entry in results:
+        print(f"{entry['entry_point']:<20} {entry['wall_ms']:>10.0f} {entry['best_ms']:>8.0f} {entry['import_ms']:>10.0f}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the startup benchmark.
+
+    Returns:
+        Process exit code (1 if a baseline regression or an over-budget entry point was found)
+    """
+    parser = argparse.ArgumentParser(description="Benchmark cold-start time of the command-line entry points.")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh processes per entry point (default: 5)")
+    parser.add_argument("--entry_points", nargs="+", default=None, help="Only time these entry points")
+    parser.add_argument("--output", default=None, help="Save results as JSON to this path")
+    parser.add_argument("--baseline", default=None, help="Compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression vs baseline (default: 0.25)")
+    parser.add_argument("--slack_ms", type=float, default=50.0, help="Absolute slack in ms on top of --tolerance (default: 50)")
+    parser.add_argument("--max_ms", type=float, default=None, help="Fail if any entry point's median startup exceeds this many ms")
+    args = parser.parse_args(argv)
+
+    entry_points = [entry for entry in ENTRY_POINTS if args.entry_points is None or entry[0] in args.entry_points]
+    results = [time_entry_point(name, command, args.repeats) for name, command in entry_points]
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    status = 0
+    if args.max_ms is not None:
+        slow = [entry for entry in results if entry['wall_ms'] > args.max_ms]
+        for entry in slow:
+            print(f"OVER BUDGET {entry['entry_point']}: {entry['wall_ms']:.0f} ms startup vs {args.max_ms:.0f} ms budget")
+        status = 1 if slow else status
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance, args.slack_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} (+{args.slack_ms:.0f} ms) of {args.baseline}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
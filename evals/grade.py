@@ -0,0 +1,187 @@
+"""Grading pipeline for experiment results.
+
+This module grades solution.jsonl files with the grader prompts in evals/graders/:
+- Records with a mechanical verdict (exact matches, missing airlines) are decided locally
+- The rest are packed into numbered batches, one grading request per batch
+- Items a batch response leaves ungraded are re-graded one record per request
+- Verdicts and aggregate rates are written next to each solution.jsonl
+
+Requests go through the same call_api path as the experiments, so they share
+its concurrency, rate limiting, response cache and metrics.
+
+    python -m evals.grade evals/results/<run> [evals/results/<other_run> ...] [--batch_size 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from typing import TYPE_CHECKING, Dict, Iterator, List
+
+from evals.score import load_solutions, score_solutions
+from evals.utils.grading import VERDICTS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_GRADE_BATCH_SIZE = 10
+
+# Completion budget per graded item ({"item": 10, "result": "INFERRED PASS"}) plus slack
+GRADE_ITEM_TOKENS = 20
+
+def grading_jobs(df: pd.DataFrame, indices: List, batch_size: int) -> Iterator[Dict]:
+    """Pack records into grading requests, never mixing runs in one batch.
+
+    Args:
+        df: Frame from load_solutions
+        indices: Frame indices of the records to grade
+        batch_size: Maximum records per request (1 for the single-record grader prompt)
+
+    Yields:
+        Job dictionaries with 'indices', 'prompt' and 'max_tokens'
+    """
+    from evals.utils.grading import load_grader, render_batch_grader, render_grader
+
+    templates = {}
+    selected = df.loc[indices]
+    for run, group in selected.groupby('run', sort=False):
+        task = group['task'].iloc[0]
+        if task not in templates:
+            templates[task] = load_grader(task)
+        group_indices = list(group.index)
+        for start in range(0, len(group_indices), batch_size):
+            chunk = group_indices[start:start + batch_size]
+            records = [df.at[index, 'record'] for index in chunk]
+            if len(chunk) == 1:
+                prompt, max_tokens = render_grader(templates[task], records[0]), 200
+            else:
+                prompt = render_batch_grader(templates[task], records)
+                max_tokens = GRADE_ITEM_TOKENS * len(chunk) + 50
+            yield {'key': f"grade-{run}-{chunk[0]}-{len(chunk)}", 'run': run, 'indices': chunk,
+                   'prompt': prompt, 'max_tokens': max_tokens}
+
+def grade_records(df: pd.DataFrame, verdicts: pd.Series, batch_size: int = DEFAULT_GRADE_BATCH_SIZE,
+                  concurrency: int = 8) -> Dict:
+    """Grade the records without a prefilter verdict with the LLM graders.
+
+    Args:
+        df: Frame from load_solutions
+        verdicts: Series from prefilter_verdicts (None for records needing a grader)
+        batch_size: Maximum records per grading request
+        concurrency: Maximum number of grading requests in flight
+
+    Returns:
+        Dictionary with final 'verdicts', their 'source' ('prefilter' or 'llm') and
+        per-run 'requests' counts
+    """
+    import pandas as pd
+
+    # Deferred so local scoring does not load the API stack
+    from evals.utils.executor import execute_jobs
+    from evals.utils.grading import parse_batch_verdicts, parse_verdict
+
+    graded = verdicts.copy()
+    source = pd.Series("prefilter", index=df.index, dtype=object)
+    requests: Dict[str, int] = {}
+
+    def handle(job, response):
+        requests[job['run']] = requests.get(job['run'], 0) + 1
+        if len(job['indices']) == 1:
+            results = [parse_verdict(response)]
+        else:
+            results = parse_batch_verdicts(response, len(job['indices']))
+        for index, verdict in zip(job['indices'], results):
+            graded.at[index] = verdict
+            source.at[index] = 'llm'
+
+    pending = list(verdicts.index[verdicts.isna()])
+    execute_jobs(grading_jobs(df, pending, batch_size), handle, concurrency)
+    # Items a batch response skipped or garbled get one request each
+    missing = [index for index in pending if graded.at[index] is None]
+    if missing and batch_size > 1:
+        execute_jobs(grading_jobs(df, missing, 1), handle, concurrency)
+    return {'verdicts': graded, 'source': source, 'requests': requests}
+
+def aggregate_verdicts(verdicts: pd.Series, source: pd.Series, requests: int = 0) -> Dict:
+    """Compute verdict counts and rates for one run.
+
+    Args:
+        verdicts: Final verdicts of the run's records
+        source: Matching 'prefilter' / 'llm' sources
+        requests: Grading requests spent on the run
+
+    Returns:
+        JSON-serializable aggregate dictionary
+    """
+    records = len(verdicts)
+    counts = {verdict: int((verdicts == verdict).sum()) for verdict in VERDICTS}
+    counts['ungraded'] = int(verdicts.isna().sum())
+    total = max(records, 1)
+    return {
+        'records': records,
+        'counts': counts,
+        'pass_rate': (counts['PASS'] + counts['INFERRED PASS']) / total,
+        'strict_pass_rate': counts['PASS'] / total,
+        'fail_rate': counts['FAIL'] / total,
+        'prefilter_graded': int((source == 'prefilter').sum() - counts['ungraded']),
+        'llm_graded': int((source == 'llm').sum()),
+        'llm_requests': requests,
+    }
+
+def write_grades(df: pd.DataFrame, result: Dict) -> Dict[str, Dict]:
+    """Write grades.jsonl and grades.json next to each graded solution.jsonl.
+
+    Args:
+        df: Frame from load_solutions
+        result: Output of grade_records
+
+    Returns:
+        Aggregates per solution.jsonl path
+    """
+    summaries = {}
+    for run, group in df.groupby('run', sort=False):
+        run_dir = os.path.dirname(run)
+        verdicts = result['verdicts'].loc[group.index]
+        source = result['source'].loc[group.index]
+        with open(os.path.join(run_dir, "grades.jsonl"), 'w') as f:
+            for index in group.index:
+                record = group.at[index, 'record']
+                f.write(json.dumps({'id': record.get('id'), 'input': record['input'], 'ideal': record['ideal'],
+                                    'output': record['output'], 'verdict': verdicts.at[index],
+                                    'source': source.at[index]}) + '\n')
+        summaries[run] = aggregate_verdicts(verdicts, source, result['requests'].get(run, 0))
+        with open(os.path.join(run_dir, "grades.json"), 'w') as f:
+            json.dump(summaries[run], f, indent=2)
+    return summaries
+
+def main():
+    """Grade solution files from the command line."""
+    # Deferred to keep --help fast
+    from evals.utils.api import configure_rate_limit
+
+    parser = argparse.ArgumentParser(description="Grade experiment results with the LLM graders.")
+    parser.add_argument("paths", nargs="+", help="Run output directories or solution.jsonl files")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_GRADE_BATCH_SIZE,
+                        help=f"Records per grading request (default: {DEFAULT_GRADE_BATCH_SIZE})")
+    parser.add_argument("--concurrency", type=int, default=8, help="Grading requests in flight (default: 8)")
+    parser.add_argument("--rpm", type=float, default=500, help="Requests-per-minute budget, 0 to disable (default: 500)")
+    parser.add_argument("--tpm", type=float, default=200000, help="Tokens-per-minute budget, 0 to disable (default: 200000)")
+    args = parser.parse_args()
+
+    configure_rate_limit(args.rpm, args.tpm)
+    df = load_solutions(args.paths)
+    verdicts = score_solutions(df)['verdicts']
+    result = grade_records(df, verdicts, max(1, args.batch_size), args.concurrency)
+    for run, summary in write_grades(df, result).items():
+        counts = summary['counts']
+        print(f"{run} ({summary['records']} records)")
+        print(f"  {counts['PASS']} PASS | {counts['INFERRED PASS']} INFERRED PASS | {counts['FAIL']} FAIL | "
+              f"{counts['ungraded']} ungraded")
+        print(f"  Pass rate {summary['pass_rate']:.1%} (strict {summary['strict_pass_rate']:.1%}) | "
+              f"{summary['prefilter_graded']} decided locally | {summary['llm_graded']} graded in "
+              f"{summary['llm_requests']} requests")
+        print(f"  Saved verdicts to {os.path.join(os.path.dirname(run), 'grades.jsonl')}")
+
+if __name__ == "__main__":
+    main()
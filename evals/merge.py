@@ -0,0 +1,227 @@
+"""Merge the shard directories of a sharded run into one run directory.
+
+Shards are produced by running experiment_runner.py with `--shard i/N` on one or
+more machines. Merging:
+- Checks that every shard 0..N-1 is present exactly once and that all shards
+  were run with the same parameters
+- Recomputes the expected records from the dataset and fails if any are
+  missing, or if a record shows up in a shard it does not hash to
+- Writes solution.jsonl in dataset order, combined metrics (metrics.json and
+  calls.csv from every shard's calls), summary.json and config.json
+
+    python -m evals.merge evals/results/<run>_shard_0of4_* ... evals/results/<run>_shard_3of4_*
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from evals.prompts.sentiment import SENTIMENT_PROMPT_FUNCS
+from evals.results_index import index_run_dir
+from evals.utils.checkpoint import record_key, repair_jsonl
+from evals.utils.data import (ARCHIVE_CHUNK_SIZE, Archive, create_output_dir, load_dataset, load_run_config, parse_shard,
+                              prepare_rows, save_run_config, shard_of, write_run_summary)
+from evals.utils.metrics import MetricsRecorder
+
+# Run parameters that must agree across shards
+SHARED_CONFIG_KEYS = ('experiment', 'n_samples', 'batch_size', 'test', 'archive', 'chunk_size', 'pack_tokens',
+                      'entity_fast_path', 'dedup_threshold', 'cascade_target_accuracy')
+
+# Summary sections whose counters add up across shards
+COUNTER_SECTIONS = ('fast_path', 'cascade', 'dedup', 'batch_recovery', 'cache')
+
+def load_shards(dirs: List[str]) -> Tuple[Dict, List[Dict]]:
+    """Read and cross-check the configs of a run's shard directories.
+
+    Args:
+        dirs: Shard output directories
+
+    Returns:
+        (shared run config, shards sorted by index with 'dir', 'index' and 'count')
+
+    Raises:
+        ValueError: If a directory is not a shard, parameters differ, or shards are missing or repeated
+    """
+    shards = []
+    for shard_dir in dirs:
+        config = load_run_config(shard_dir)
+        if not config.get('shard'):
+            raise ValueError(f"{shard_dir} was not run with --shard")
+        index, count = parse_shard(config['shard'])
+        shards.append({'dir': shard_dir, 'config': config, 'index': index, 'count': count})
+
+    config = {key: shards[0]['config'].get(key) for key in SHARED_CONFIG_KEYS}
+    count = shards[0]['count']
+    for shard in shards:
+        differing = [key for key in SHARED_CONFIG_KEYS if shard['config'].get(key) != config[key]]
+        if differing or shard['count'] != count:
+            raise ValueError(f"{shard['dir']} was run with different parameters ({', '.join(differing) or 'shard count'})")
+    indices = sorted(shard['index'] for shard in shards)
+    repeated = sorted({index for index in indices if indices.count(index) > 1})
+    missing = sorted(set(range(count)) - set(indices))
+    if repeated or missing:
+        raise ValueError(f"expected shards 0..{count - 1} once each; missing {missing or 'none'}, repeated {repeated or 'none'}")
+    return config, sorted(shards, key=lambda shard: shard['index'])
+
+def expected_keys(config: Dict) -> List[Tuple]:
+    """List the record keys of the unsharded run in dataset order.
+
+    Args:
+        config: Shared run config
+
+    Returns:
+        record_key tuples; sentiment experiments have one per (tweet, airline) pair
+    """
+    if config.get('archive'):
+        chunks = Archive(config['archive'], config['n_samples'], config.get('chunk_size') or ARCHIVE_CHUNK_SIZE)
+    else:
+        chunks = [prepare_rows(load_dataset("test" if config['test'] else "train", config['n_samples']))]
+    keys = []
+    for columns in chunks:
+        if config['experiment'] in SENTIMENT_PROMPT_FUNCS:
+            keys.extend(record_key(row_id, airline) for row_id, airlines in zip(columns['id'], columns['airlines'])
+                        for airline in airlines)
+        else:
+            keys.extend(record_key(row_id) for row_id in columns['id'])
+    return keys
+
+def merge_solutions(shards: List[Dict], keys: List[Tuple]) -> Tuple[List[str], Dict]:
+    """Collect the shards' records in dataset order and check them against the expected keys.
+
+    Args:
+        shards: Output of load_shards
+        keys: Output of expected_keys
+
+    Returns:
+        (solution lines in dataset order, report with 'missing' keys per shard index,
+        'misplaced' and 'unexpected' record counts and 'duplicates' dropped)
+    """
+    position = {key: i for i, key in enumerate(keys)}
+    count = shards[0]['count']
+    lines: List = [None] * len(keys)
+    report = {'missing': {}, 'misplaced': 0, 'unexpected': 0, 'duplicates': 0}
+    for shard in shards:
+        path = os.path.join(shard['dir'], "solution.jsonl")
+        if not os.path.exists(path):
+            continue
+        repair_jsonl(path)
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                airline = record['input'].get('airline') if isinstance(record['input'], dict) else None
+                key = record_key(record.get('id'), airline)
+                if key not in position:
+                    report['unexpected'] += 1
+                elif shard_of(key[0], count) != shard['index']:
+                    report['misplaced'] += 1
+                elif lines[position[key]] is not None:
+                    report['duplicates'] += 1
+                else:
+                    lines[position[key]] = line if line.endswith('\n') else line + '\n'
+    for key, line in zip(keys, lines):
+        if line is None:
+            index = shard_of(key[0], count)
+            report['missing'][index] = report['missing'].get(index, 0) + 1
+    return lines, report
+
+def merge_summaries(shards: List[Dict], n_tweets: int, metrics: Dict) -> Dict:
+    """Combine the shards' summary.json files.
+
+    Shards run in parallel, so elapsed time is the slowest shard's and
+    throughput is over that wall time; latency is taken from the combined
+    per-call metrics.
+
+    Args:
+        shards: Output of load_shards
+        n_tweets: Tweets in the merged run
+        metrics: Combined metrics summary
+
+    Returns:
+        Summary dictionary for the merged run
+    """
+    summaries = []
+    for shard in shards:
+        path = os.path.join(shard['dir'], "summary.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                summaries.append(json.load(f))
+    elapsed = max((summary['elapsed'] for summary in summaries), default=0.0)
+    requests = sum(summary['requests'] for summary in summaries)
+    first = summaries[0] if summaries else {}
+    merged = {
+        'experiment': first.get('experiment'),
+        'dataset': first.get('dataset'),
+        'n_samples': n_tweets,
+        'batch_size': first.get('batch_size'),
+        'shards': shards[0]['count'],
+        'concurrency': sum(summary.get('concurrency', 0) for summary in summaries),
+        'elapsed': elapsed,
+        'requests': requests,
+        'requests_per_sec': requests / elapsed if elapsed > 0 else 0.0,
+        'tweets_per_sec': n_tweets / elapsed if elapsed > 0 else 0.0,
+        'latency': metrics['latency'],
+    }
+    for section in COUNTER_SECTIONS:
+        parts = [summary[section] for summary in summaries if section in summary]
+        if parts:
+            merged[section] = {name: sum(part.get(name, 0) for part in parts)
+                               for name, value in parts[0].items() if isinstance(value, (int, float))}
+    if 'cascade_threshold' in first:
+        # Every shard fits the same deterministic model
+        merged['cascade_threshold'] = first['cascade_threshold']
+    return merged
+
+def main():
+    """Merge shard directories from the command line."""
+    parser = argparse.ArgumentParser(description="Merge the shard directories of a sharded run.")
+    parser.add_argument("dirs", nargs="+", help="Shard output directories (one per shard)")
+    parser.add_argument("--output", default=None, help="Merged run directory (default: a new directory in --results_dir)")
+    parser.add_argument("--results_dir", default="evals/results", help="Parent directory for the merged run (default: evals/results)")
+    args = parser.parse_args()
+
+    try:
+        config, shards = load_shards(args.dirs)
+    except (ValueError, OSError) as e:
+        print(f"Cannot merge: {e}", file=sys.stderr)
+        sys.exit(1)
+    keys = expected_keys(config)
+    lines, report = merge_solutions(shards, keys)
+    if report['duplicates']:
+        print(f"Dropped {report['duplicates']} duplicate records", file=sys.stderr)
+    if report['missing'] or report['misplaced'] or report['unexpected']:
+        missing = ", ".join(f"shard {index}: {n}" for index, n in sorted(report['missing'].items()))
+        print(f"Cannot merge: {sum(report['missing'].values())} of {len(keys)} records missing ({missing or 'none'}), "
+              f"{report['misplaced']} in the wrong shard, {report['unexpected']} not in the dataset sample. "
+              f"Finish incomplete shards with experiment_runner.py --resume <shard_dir>.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        output_dir = args.output
+        os.makedirs(output_dir, exist_ok=True)
+    else:
+        output_dir = create_output_dir(config['experiment'], config['n_samples'], config['batch_size'] or 1,
+                                       config['test'], args.results_dir)
+    with open(os.path.join(output_dir, "solution.jsonl"), 'w') as f:
+        f.writelines(lines)
+    save_run_config(output_dir, {**config, 'shard': None, 'merged_from': [shard['dir'] for shard in shards]})
+
+    n_tweets = len({key[0] for key in keys})
+    calls = [os.path.join(shard['dir'], "calls.csv") for shard in shards]
+    tags = {}
+    metrics_path = os.path.join(shards[0]['dir'], "metrics.json")
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            shard_metrics = json.load(f)
+        tags = {key: shard_metrics.get(key) for key in ('experiment', 'prompt_func', 'batch_size')}
+    recorder = MetricsRecorder.from_calls_csv([path for path in calls if os.path.exists(path)], tags)
+    metrics = recorder.write(output_dir, n_tweets)
+    write_run_summary(output_dir, merge_summaries(shards, n_tweets, metrics))
+    print(f"Merged {len(shards)} shards: {len(lines)} records, {len(recorder.calls)} calls, "
+          f"${metrics['cost']['total']:.4f}")
+    index_run_dir(output_dir)
+    print(f"Saved merged run to {output_dir}")
+
+if __name__ == "__main__":
+    main()
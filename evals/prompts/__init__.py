@@ -4,10 +4,12 @@ This package contains prompt templates for different types of analysis:
 - Entity extraction: Identifying airline mentions in tweets
 - Sentiment analysis: Analyzing sentiment towards mentioned airlines
 - Combined: Performing both entity extraction and sentiment analysis in one step
+- Layout: Splitting prompts into a static, cacheable prefix and a per-request suffix
 """
 
 __all__ = [
     'entity',
     'sentiment',
     'combined',
+    'layout',
 ] 
\ No newline at end of file
@@ -1,12 +1,16 @@
 """Combined entity extraction and sentiment analysis prompts.
 
 This module provides prompts for performing both entity extraction and sentiment analysis
-in a single step, including both single-tweet and batch processing variants.
+in a single step, including both single-tweet and batch processing variants. The
+*_prefix variants carry the same instructions as a static system prefix, with the
+tweet(s) after it, so the provider can cache the prefix across calls.
 """
 
 import json
 from typing import List
 
+from evals.prompts.layout import SplitPrompt
+
 def combined_prompt(tweet: str) -> str:
     """Generate a prompt for combined entity extraction and sentiment analysis on a single tweet.
     
@@ -98,8 +102,89 @@ Output as JSON array with results for each tweet. Example output:
 
 If no airlines mentioned in a tweet, include that tweet with: {{"airlines": [], "sentiment": "negative"}}'''
 
+_COMBINED_INSTRUCTIONS = '''STEP 1 - Extract Airlines:
+
+Examples:
+- "@AmericanAir delayed again!" → "American Airlines"
+- "USAirways" → "US Airways"
+- "Flying United and Southwest today " → "United Airlines, Southwest Airlines"
+- "Jet Blue" → "JetBlue Airways"
+
+STEP 2 - Analyze Sentiment:
+Analyze the sentiment of {target} toward the mentioned airline(s). Considerations:
+- Infer the overall sentiment of the tweet
+- Consider customer satisfaction and underlying sarcasm
+- Pay attention to sentiment indicators such as emojis, hashtags, etc.
+- If on the border of neutral/negative, lean on neutral unless overall sentiment is negative
+
+Sentiment can only return as positive, negative, or neutral.
+
+Focus on the customer's actual satisfaction with the airline(s).'''
+
+COMBINED_V1_PREFIX = (
+    "Extract airline names using official names then analyze the sentiment of the tweet toward the mentioned airline(s).\n\n"
+    + _COMBINED_INSTRUCTIONS.format(target="the tweet") + '''
+
+Output as JSON just the results. Example output:
+{
+    "airlines": ["Official Airline Name", "Another Airline"],
+    "sentiment": "positive"
+}
+
+If no airlines mentioned, return: {"airlines": [], "sentiment": "negative"}''')
+
+COMBINED_BATCH_V1_PREFIX = (
+    "For each tweet, extract airline names using official names then analyze the sentiment of these tweets toward the mentioned airline(s).\n\n"
+    + _COMBINED_INSTRUCTIONS.format(target="each tweet") + '''
+
+Output as JSON array with results for each tweet. Example output:
+[
+    {
+        "tweet": "I love flying with @Delta! Great service!",
+        "airlines": ["Delta Airlines"],
+        "sentiment": "positive"
+    },
+    {
+        "tweet": "Terrible experience with @United",
+        "airlines": ["United Airlines"],
+        "sentiment": "negative"
+    }
+]
+
+If no airlines mentioned in a tweet, include that tweet with: {"airlines": [], "sentiment": "negative"}''')
+
+def combined_prompt_prefix(tweet: str) -> SplitPrompt:
+    """Combined single-tweet prompt with the instructions as a static prefix.
+    
+    Args:
+        tweet: The tweet to analyze
+        
+    Returns:
+        SplitPrompt of COMBINED_V1_PREFIX and the tweet
+    """
+    return SplitPrompt(COMBINED_V1_PREFIX, f'Tweet to analyze: "{tweet}"')
+
+def combined_prompt_batch_prefix(tweets: List[str]) -> SplitPrompt:
+    """Combined batch prompt with the instructions and output format as a static prefix.
+    
+    Args:
+        tweets: List of tweets to analyze
+        
+    Returns:
+        SplitPrompt of COMBINED_BATCH_V1_PREFIX and the numbered tweets
+    """
+    tweets_text = "\n".join(f"{i+1}. {tweet}" for i, tweet in enumerate(tweets))
+    return SplitPrompt(COMBINED_BATCH_V1_PREFIX, f"Tweets to analyze:\n{tweets_text}")
+
+# Prompts that take a list of tweets; these are the ones usable for micro-batched streaming
+COMBINED_BATCH_PROMPT_FUNCS = {
+    "combined_batch_v1": combined_prompt_batch,
+    "combined_batch_v1_prefix": combined_prompt_batch_prefix,
+}
+
 # Dictionary mapping experiment names to prompt functions
 COMBINED_PROMPT_FUNCS = {
     "combined_v1": combined_prompt,
-    "combined_batch_v1": combined_prompt_batch
-} 
\ No newline at end of file
+    "combined_v1_prefix": combined_prompt_prefix,
+    **COMBINED_BATCH_PROMPT_FUNCS
+}
\ No newline at end of file
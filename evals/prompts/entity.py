@@ -1,9 +1,13 @@
 """Entity extraction prompts for identifying airline mentions in tweets.
 
 This module provides different prompt variants for extracting airline names from tweets,
-with varying levels of detail and examples.
+with varying levels of detail and examples. The *_prefix variants carry the same
+instructions as a static system prefix followed by the tweet, so the provider can
+cache the prefix across calls.
 """
 
+from evals.prompts.layout import SplitPrompt
+
 def prompt_entity_v1(tweet: str) -> str:
     """Simple entity extraction prompt.
     
@@ -65,9 +69,78 @@ def prompt_entity_v3_examples(tweet: str) -> str:
     Tweet: "Flying United and Southwest today"
     Output: {{"airlines": ["United Airlines", "Southwest Airlines"]}}'''
 
+ENTITY_V1_PREFIX = '''Extract all airline names mentioned in the tweet.
+
+Return as JSON: {"airlines": ["Airline Name 1", "Airline Name 2"]}
+If no airlines mentioned, return: {"airlines": []}'''
+
+ENTITY_V2_PREFIX = '''Extract airline names from the tweet and return them using these EXACT official names:
+
+Official Names to Use:
+- American Airlines
+- United Airlines
+- Southwest Airlines
+- US Airways
+- JetBlue Airways
+- Virgin America
+- Delta Air Lines
+- Air Canada
+
+For any other airline, use their official name.
+
+Return as JSON: {"airlines": ["Official Name 1", "Official Name 2"]}
+If no airlines mentioned, return: {"airlines": []}'''
+
+ENTITY_V3_PREFIX = '''Extract airline names using official names. Examples:
+
+Tweet: "@AmericanAir delayed again!"
+Output: {"airlines": ["American Airlines"]}
+
+Tweet: "Flying United and Southwest today"
+Output: {"airlines": ["United Airlines", "Southwest Airlines"]}'''
+
+def prompt_entity_v1_prefix(tweet: str) -> SplitPrompt:
+    """Simple entity extraction prompt with the instructions as a static prefix.
+    
+    Args:
+        tweet: The tweet to analyze
+        
+    Returns:
+        SplitPrompt of ENTITY_V1_PREFIX and the tweet
+    """
+    return SplitPrompt(ENTITY_V1_PREFIX, f'Tweet: "{tweet}"')
+
+def prompt_entity_v2_standardized_prefix(tweet: str) -> SplitPrompt:
+    """Standardized official names prompt with the name list as a static prefix.
+    
+    Args:
+        tweet: The tweet to analyze
+        
+    Returns:
+        SplitPrompt of ENTITY_V2_PREFIX and the tweet
+    """
+    return SplitPrompt(ENTITY_V2_PREFIX, f'Tweet: "{tweet}"')
+
+def prompt_entity_v3_examples_prefix(tweet: str) -> SplitPrompt:
+    """Few-shot prompt with the examples as a static prefix.
+    
+    Unlike prompt_entity_v3_examples, the tweet to analyze is included, as
+    the next example to complete.
+    
+    Args:
+        tweet: The tweet to analyze
+        
+    Returns:
+        SplitPrompt of ENTITY_V3_PREFIX and the tweet
+    """
+    return SplitPrompt(ENTITY_V3_PREFIX, f'Tweet: "{tweet}"\nOutput:')
+
 # Dictionary mapping experiment names to prompt functions
 ENTITY_PROMPT_FUNCS = {
     "entity_v1": prompt_entity_v1,
     "entity_v2_standardized": prompt_entity_v2_standardized,
     "entity_v3_examples": prompt_entity_v3_examples,
+    "entity_v1_prefix": prompt_entity_v1_prefix,
+    "entity_v2_standardized_prefix": prompt_entity_v2_standardized_prefix,
+    "entity_v3_examples_prefix": prompt_entity_v3_examples_prefix,
 } 
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""Prompt layout for provider-side prefix caching.
+
+This module provides:
+- SplitPrompt: A prompt split into a static instruction prefix, sent as the
+  system message, and a per-request suffix, sent as the user message
+- Helpers that turn a plain prompt string or a SplitPrompt into chat messages
+  and into flat text for token estimates and cache keys
+- prefix_cache_warning: Flags a static prefix too short for the provider to cache
+
+Providers reuse the longest prompt prefix they have already seen, but only if
+it is byte-identical, so a prefix must not contain anything that varies per
+tweet or per airline. OpenAI caches prompts of at least 1024 tokens, in
+128-token steps beyond that; a shorter static prefix is laid out correctly but
+is not cached until it grows (e.g. with more few-shot examples).
+"""
+
+import json
+from typing import Dict, List, NamedTuple, Optional, Union
+
+from evals.utils.ratelimit import estimate_tokens
+
+# Shortest prompt prefix OpenAI caches automatically
+PREFIX_CACHE_MIN_TOKENS = 1024
+
+class SplitPrompt(NamedTuple):
+    """Prompt with a static prefix shared by every request and a per-request suffix."""
+
+    prefix: str
+    suffix: str
+
+# What prompt functions return and call_api accepts
+Prompt = Union[str, SplitPrompt]
+
+def prompt_messages(prompt: Prompt) -> List[Dict[str, str]]:
+    """Build the chat messages for a prompt.
+
+    Args:
+        prompt: Plain prompt string or SplitPrompt
+
+    Returns:
+        A single user message, or a system message with the prefix followed by
+        a user message with the suffix
+    """
+    if isinstance(prompt, SplitPrompt):
+        return [{"role": "system", "content": prompt.prefix}, {"role": "user", "content": prompt.suffix}]
+    return [{"role": "user", "content": prompt}]
+
+def prompt_text(prompt: Prompt) -> str:
+    """Flatten a prompt to the text the model reads, for token estimates.
+
+    Args:
+        prompt: Plain prompt string or SplitPrompt
+
+    Returns:
+        The prompt string, or the prefix and suffix joined by a blank line
+    """
+    if isinstance(prompt, SplitPrompt):
+        return f"{prompt.prefix}\n\n{prompt.suffix}"
+    return prompt
+
+def prompt_key(prompt: Prompt) -> str:
+    """Text identifying a prompt's request for the response cache.
+
+    A SplitPrompt is keyed on its messages, so it never shares a cache entry
+    with a plain prompt of the same text.
+
+    Args:
+        prompt: Plain prompt string or SplitPrompt
+
+    Returns:
+        The prompt string, or the JSON-encoded messages of a SplitPrompt
+    """
+    if isinstance(prompt, SplitPrompt):
+        return json.dumps(prompt_messages(prompt))
+    return prompt
+
+def prefix_cache_warning(prompt: Prompt) -> Optional[str]:
+    """Explain why a prompt's static prefix will not be served from the prefix cache.
+
+    Args:
+        prompt: Plain prompt string or SplitPrompt
+
+    Returns:
+        A warning if the prompt has no static prefix or its prefix is shorter than
+        PREFIX_CACHE_MIN_TOKENS (estimated), otherwise None
+    """
+    if not isinstance(prompt, SplitPrompt):
+        return None
+    tokens = estimate_tokens(prompt.prefix)
+    if tokens >= PREFIX_CACHE_MIN_TOKENS:
+        return None
+    return (f"Warning: the static prompt prefix is ~{tokens} tokens, below the {PREFIX_CACHE_MIN_TOKENS}-token "
+            f"minimum for prefix caching; expect no cached tokens")
@@ -1,9 +1,16 @@
 """Sentiment analysis prompts for analyzing airline-related tweets.
 
 This module provides different prompt variants for analyzing sentiment in tweets,
-with varying levels of context and guidance.
+with varying levels of context and guidance, including a multi-airline variant that
+asks for the sentiment toward every mentioned airline in a single request. The
+*_prefix variants carry the same instructions as a static system prefix, with the
+tweet and airline(s) after it, so the provider can cache the prefix across calls.
 """
 
+from typing import List
+
+from evals.prompts.layout import SplitPrompt
+
 def sentiment_prompt_v1_basic(tweet: str, airline: str) -> str:
     """Basic sentiment analysis prompt.
     
@@ -46,8 +53,118 @@ def sentiment_prompt_v2_context_aware(tweet: str, airline: str) -> str:
     
     Return as JSON: {{"sentiment": "positive"}} or {{"sentiment": "negative"}} or {{"sentiment": "neutral"}}'''
 
+def sentiment_prompt_v3_multi_airline(tweet: str, airlines: List[str]) -> str:
+    """Context-aware prompt covering every mentioned airline in one request.
+    
+    Args:
+        tweet: The tweet to analyze
+        airlines: The airlines to analyze sentiment for
+        
+    Returns:
+        Formatted prompt string
+    """
+    airlines_text = "\n".join(f"    - {airline}" for airline in airlines)
+    example = ", ".join(f'"{airline}": "positive|negative|neutral"' for airline in airlines)
+    return f'''Analyze the sentiment of this tweet toward each of the airlines listed below. Considerations:
+    
+    - Infer the overall sentiment of the tweet
+    - Consider customer satisfaction and underlying sarcasm
+    - Pay attention to sentiment indicators such as emojis, hashtags, etc.
+    - An airline can receive a different sentiment than another airline in the same tweet
+    - If on the border of neutral/negative, lean on neutral unless overall sentiment is negative
+    
+    Tweet: "{tweet}"
+    Airlines:
+{airlines_text}
+    
+    Focus on the customer's actual satisfaction with each airline.
+    
+    Sentiment can only be positive, negative, or neutral. Use the airline names exactly as listed.
+    
+    Return as JSON: {{"sentiments": {{{example}}}}}'''
+
+SENTIMENT_V1_PREFIX = '''What is the sentiment of the tweet toward the airline named with it?
+
+Return as JSON: {"sentiment": "positive"} or {"sentiment": "negative"} or {"sentiment": "neutral"}'''
+
+SENTIMENT_V2_PREFIX = '''Analyze the sentiment of the tweet toward the airline named with it. Considerations:
+
+- Infer the overall sentiment of the tweet
+- Consider customer satisfaction and underlying sarcasm
+- Pay attention to sentiment indicators such as emojis, hashtags, etc.
+- If no airlines mentioned, return "neutral"
+- If on the border of neutral/negative, lean on neutral unless overall sentiment is negative
+
+Focus on the customer's actual satisfaction with that airline.
+
+Return as JSON: {"sentiment": "positive"} or {"sentiment": "negative"} or {"sentiment": "neutral"}'''
+
+SENTIMENT_V3_PREFIX = '''Analyze the sentiment of the tweet toward each of the airlines listed with it. Considerations:
+
+- Infer the overall sentiment of the tweet
+- Consider customer satisfaction and underlying sarcasm
+- Pay attention to sentiment indicators such as emojis, hashtags, etc.
+- An airline can receive a different sentiment than another airline in the same tweet
+- If on the border of neutral/negative, lean on neutral unless overall sentiment is negative
+
+Focus on the customer's actual satisfaction with each airline.
+
+Sentiment can only be positive, negative, or neutral. Use the airline names exactly as listed.
+
+Return as JSON with one entry per listed airline, in the format shown with the tweet.'''
+
+def sentiment_prompt_v1_basic_prefix(tweet: str, airline: str) -> SplitPrompt:
+    """Basic sentiment prompt with the instructions as a static prefix.
+    
+    Args:
+        tweet: The tweet to analyze
+        airline: The airline to analyze sentiment for
+        
+    Returns:
+        SplitPrompt of SENTIMENT_V1_PREFIX and the tweet and airline
+    """
+    return SplitPrompt(SENTIMENT_V1_PREFIX, f'Tweet: "{tweet}"\nAirline: {airline}')
+
+def sentiment_prompt_v2_context_aware_prefix(tweet: str, airline: str) -> SplitPrompt:
+    """Context-aware sentiment prompt with the instructions as a static prefix.
+    
+    Args:
+        tweet: The tweet to analyze
+        airline: The airline to analyze sentiment for
+        
+    Returns:
+        SplitPrompt of SENTIMENT_V2_PREFIX and the tweet and airline
+    """
+    return SplitPrompt(SENTIMENT_V2_PREFIX, f'Tweet: "{tweet}"\nAirline: {airline}')
+
+def sentiment_prompt_v3_multi_airline_prefix(tweet: str, airlines: List[str]) -> SplitPrompt:
+    """Multi-airline sentiment prompt with the instructions as a static prefix.
+    
+    The output example names the tweet's airlines, so it goes in the suffix.
+    
+    Args:
+        tweet: The tweet to analyze
+        airlines: The airlines to analyze sentiment for
+        
+    Returns:
+        SplitPrompt of SENTIMENT_V3_PREFIX and the tweet, airlines and output format
+    """
+    airlines_text = "\n".join(f"- {airline}" for airline in airlines)
+    example = ", ".join(f'"{airline}": "positive|negative|neutral"' for airline in airlines)
+    return SplitPrompt(SENTIMENT_V3_PREFIX,
+                       f'Tweet: "{tweet}"\nAirlines:\n{airlines_text}\n\nReturn as JSON: {{"sentiments": {{{example}}}}}')
+
+# Prompts that take the full list of airlines for a tweet instead of a single airline
+MULTI_SENTIMENT_PROMPT_FUNCS = {
+    "sentiment_v3_multi_airline": sentiment_prompt_v3_multi_airline,
+    "sentiment_v3_multi_airline_prefix": sentiment_prompt_v3_multi_airline_prefix,
+}
+
 # Dictionary mapping experiment names to prompt functions
 SENTIMENT_PROMPT_FUNCS = {
     "sentiment_v1_basic": sentiment_prompt_v1_basic,
     "sentiment_v2_context_aware": sentiment_prompt_v2_context_aware,
+    "sentiment_v1_basic_prefix": sentiment_prompt_v1_basic_prefix,
+    "sentiment_v2_context_aware_prefix": sentiment_prompt_v2_context_aware_prefix,
+    **MULTI_SENTIMENT_PROMPT_FUNCS,
 } 
\ No newline at end of file
@@ -0,0 +1,414 @@
+"""SQLite index of experiment runs for cross-run analysis.
+
+This module keeps a catalog of the run directories under a results directory:
+- One row per run: experiment, dataset, batch size, samples, start time, the
+  run's config, summary and call metrics, and its local scores
+- One row per record, keyed by a hash of the tweet text (plus the airline for
+  sentiment records), with the output, a canonical answer for agreement checks,
+  whether it is correct and its prefilter verdict
+- Incremental updates: a run is only re-read when one of its files changed
+- Comparisons of two runs on the tweets both answered, straight from the index
+
+experiment_runner.py, the sweep and merge commands index each run when it
+finishes. Older run directories are added with `update`:
+
+    python -m evals.results_index update
+    python -m evals.results_index runs --experiment sentiment_v1_basic
+    python -m evals.results_index compare sentiment_v1_basic sentiment_v2_context_aware --dataset test
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+INDEX_FILENAME = "index.sqlite"
+DEFAULT_RESULTS_DIR = "evals/results"
+
+# Files whose changes trigger re-indexing a run
+RUN_FILES = ("solution.jsonl", "config.json", "summary.json", "metrics.json")
+
+_RUN_TIMESTAMP = re.compile(r"_(\d{8}_\d{6})$")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    "run TEXT PRIMARY KEY, experiment TEXT, task TEXT, dataset TEXT, batch_size INTEGER, n_samples INTEGER, "
+    "shard TEXT, started TEXT, records INTEGER, entity_f1 REAL, entity_exact_match REAL, sentiment_accuracy REAL, "
+    "tweets_per_sec REAL, latency_p50 REAL, cost_per_1k_tweets REAL, config TEXT, summary TEXT, metrics TEXT, "
+    "scores TEXT, signature TEXT NOT NULL, indexed_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_experiment ON runs(experiment, dataset, started)",
+    "CREATE TABLE IF NOT EXISTS records ("
+    "run TEXT NOT NULL, tweet_hash TEXT NOT NULL, airline TEXT NOT NULL, row_id TEXT, tweet TEXT, ideal TEXT, "
+    "output TEXT, answer TEXT, correct INTEGER, verdict TEXT, PRIMARY KEY (run, tweet_hash, airline)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_records_tweet ON records(tweet_hash, airline)",
+)
+
+def tweet_hash(tweet: str) -> str:
+    """Stable key of a tweet's text, shared by every run that saw the same tweet."""
+    return hashlib.blake2b((tweet or "").encode('utf-8'), digest_size=12).hexdigest()
+
+def _run_started(run_dir: str, solution_path: str) -> str:
+    """Start time of a run from its directory name, or the solution file's modification time."""
+    match = _RUN_TIMESTAMP.search(os.path.basename(os.path.normpath(run_dir)))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").isoformat(sep=' ')
+    return datetime.fromtimestamp(os.path.getmtime(solution_path)).isoformat(sep=' ', timespec='seconds')
+
+def _read_json(path: str) -> Optional[Dict]:
+    """Read a JSON file, or None if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _answer(task: str, airlines: List[str], sentiment: Optional[str]) -> str:
+    """Canonical form of a record's output, so equal answers compare equal across runs."""
+    from evals.utils.entity_matcher import normalize_airline
+
+    names = sorted({normalize_airline(name) for name in airlines})
+    if task == 'entity':
+        return json.dumps(names)
+    if task == 'sentiment':
+        return sentiment
+    return json.dumps([names, sentiment])
+
+class ResultsIndex:
+    """SQLite catalog of run directories and their records.
+
+    Runs are stored by their path relative to the directory holding the index,
+    so a results directory can be moved or copied together with its index.
+    """
+
+    def __init__(self, path: str):
+        """Open (or create) the index database.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        os.makedirs(self.root, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def __enter__(self) -> "ResultsIndex":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run_name(self, run_dir: str) -> str:
+        """Key of a run directory in the index (its path relative to the index's directory)."""
+        return os.path.relpath(os.path.abspath(run_dir), self.root)
+
+    def run_dir(self, run: str) -> str:
+        """Directory of an indexed run."""
+        return os.path.join(self.root, run)
+
+    @staticmethod
+    def _signature(run_dir: str) -> str:
+        """Modification times and sizes of a run's files."""
+        parts = []
+        for name in RUN_FILES:
+            try:
+                stat = os.stat(os.path.join(run_dir, name))
+                parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+            except OSError:
+                parts.append("-")
+        return "|".join(parts)
+
+    def index_run(self, run_dir: str, force: bool = False) -> bool:
+        """Add or refresh one run directory.
+
+        The run's solution.jsonl is scored with evals.score and its records are
+        replaced in a single transaction. A tweet repeated within a run is
+        indexed once.
+
+        Args:
+            run_dir: Run output directory containing solution.jsonl
+            force: Re-index even if the run's files are unchanged
+
+        Returns:
+            True if the run was (re-)indexed, False if it was already up to date
+        """
+        from evals.score import entity_counts, load_solutions, prefilter_verdicts, score_run
+
+        run = self.run_name(run_dir)
+        solution_path = os.path.join(run_dir, "solution.jsonl")
+        signature = self._signature(run_dir)
+        existing = self._conn.execute("SELECT signature FROM runs WHERE run = ?", (run,)).fetchone()
+        if existing is not None and existing['signature'] == signature and not force:
+            return False
+
+        config = _read_json(os.path.join(run_dir, "config.json")) or {}
+        summary = _read_json(os.path.join(run_dir, "summary.json")) or {}
+        metrics = _read_json(os.path.join(run_dir, "metrics.json")) or {}
+        df = load_solutions([solution_path])
+        records = []
+        scores = {}
+        if len(df):
+            counts = entity_counts(df)
+            verdicts = prefilter_verdicts(df, counts)
+            scores = score_run(df, counts, verdicts)
+            exact = ((counts['fn'] == 0) & (counts['fp'] == 0)).tolist()
+            for row, airlines_exact, verdict in zip(df.itertuples(index=False), exact, verdicts.tolist()):
+                sentiment_correct = row.output_sentiment == row.ideal_sentiment
+                correct = {'entity': airlines_exact, 'sentiment': sentiment_correct}.get(row.task, airlines_exact and sentiment_correct)
+                record_id = row.record.get('id')
+                records.append((run, tweet_hash(row.tweet), row.airline if isinstance(row.airline, str) else "",
+                                None if record_id is None else str(record_id), row.tweet,
+                                json.dumps(row.record['ideal']), json.dumps(row.record['output']),
+                                _answer(row.task, row.output_airlines, row.output_sentiment), int(correct), verdict))
+
+        if config.get('test') is not None:
+            dataset = config.get('archive') or ("test" if config['test'] else "train")
+        else:
+            dataset = summary.get('dataset') or metrics.get('dataset')
+        entity = scores.get('entity', {})
+        latency = metrics.get('latency') or summary.get('latency') or {}
+        with self._conn:
+            self._conn.execute("DELETE FROM records WHERE run = ?", (run,))
+            self._conn.execute("DELETE FROM runs WHERE run = ?", (run,))
+            # Repeated tweets are ignored by the insert, so the run stores the rows actually kept
+            stored = self._conn.executemany("INSERT OR IGNORE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                            records).rowcount
+            self._conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run, config.get('experiment') or summary.get('experiment') or metrics.get('experiment'),
+                 scores.get('task'), dataset, config.get('batch_size') or summary.get('batch_size'),
+                 summary.get('n_samples') or config.get('n_samples'), config.get('shard'),
+                 _run_started(run_dir, solution_path), stored, entity.get('f1'), entity.get('exact_match'),
+                 scores.get('sentiment', {}).get('accuracy'),
+                 summary.get('tweets_per_sec'), latency.get('p50'),
+                 metrics.get('cost', {}).get('per_1k_tweets'), json.dumps(config), json.dumps(summary),
+                 json.dumps(metrics), json.dumps(scores), signature, time.time()))
+        return True
+
+    def update(self, results_dir: Optional[str] = None, prune: bool = True, force: bool = False) -> Dict[str, int]:
+        """Index every run directory below a results directory.
+
+        Args:
+            results_dir: Directory to scan, including sweep subdirectories (default: the index's directory)
+            prune: Drop runs whose directory no longer has a solution.jsonl
+            force: Re-index unchanged runs too
+
+        Returns:
+            Counts of 'indexed', 'unchanged' and 'removed' runs
+        """
+        counts = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        for directory, _, files in os.walk(results_dir or self.root):
+            if "solution.jsonl" in files:
+                counts['indexed' if self.index_run(directory, force) else 'unchanged'] += 1
+        if prune:
+            for (run,) in self._conn.execute("SELECT run FROM runs").fetchall():
+                if not os.path.exists(os.path.join(self.run_dir(run), "solution.jsonl")):
+                    with self._conn:
+                        self._conn.execute("DELETE FROM records WHERE run = ?", (run,))
+                        self._conn.execute("DELETE FROM runs WHERE run = ?", (run,))
+                    counts['removed'] += 1
+        return counts
+
+    def runs(self, experiment: Optional[str] = None, dataset: Optional[str] = None,
+             include_shards: bool = False) -> List[Dict[str, Any]]:
+        """List indexed runs, newest first.
+
+        Args:
+            experiment: Only runs of this experiment
+            dataset: Only runs on this dataset ('train', 'test' or an archive path)
+            include_shards: Also list the shard directories of sharded runs
+
+        Returns:
+            Run rows as dictionaries (config, summary, metrics and scores still JSON-encoded)
+        """
+        query = "SELECT * FROM runs WHERE (? IS NULL OR experiment = ?) AND (? IS NULL OR dataset = ?)"
+        if not include_shards:
+            query += " AND shard IS NULL"
+        rows = self._conn.execute(query + " ORDER BY started DESC, run DESC",
+                                  (experiment, experiment, dataset, dataset)).fetchall()
+        return [dict(row) for row in rows]
+
+    def resolve(self, name: str, dataset: Optional[str] = None) -> str:
+        """Find the run a name refers to.
+
+        Args:
+            name: Run directory (indexed) or experiment name, for its latest complete run
+            dataset: Restrict experiment lookups to this dataset
+
+        Returns:
+            The run's key in the index
+
+        Raises:
+            KeyError: If no indexed run matches
+        """
+        for run in (self.run_name(name), name):
+            if self._conn.execute("SELECT 1 FROM runs WHERE run = ?", (run,)).fetchone():
+                return run
+        runs = self.runs(name, dataset)
+        if not runs:
+            raise KeyError(f"no indexed run of '{name}'{f' on {dataset}' if dataset else ''}")
+        return runs[0]['run']
+
+    def compare(self, run_a: str, run_b: str, show: int = 0) -> Dict[str, Any]:
+        """Compare two runs on the records both contain (same tweet text and airline).
+
+        Args:
+            run_a: Key of the first run
+            run_b: Key of the second run
+            show: Number of disagreeing records to include
+
+        Returns:
+            Dictionary with both runs, shared and run-only record counts, answer
+            agreement, correctness of each run on the shared records and the
+            split of records only one run got right, plus up to `show` disagreements
+
+        Raises:
+            ValueError: If the runs are of different tasks
+        """
+        runs = {row['run']: dict(row) for row in self._conn.execute(
+            "SELECT run, experiment, task, dataset, started, records FROM runs WHERE run IN (?, ?)", (run_a, run_b))}
+        if runs[run_a]['task'] != runs[run_b]['task']:
+            raise ValueError(f"runs are of different tasks ({runs[run_a]['task']} vs {runs[run_b]['task']})")
+        shared = self._conn.execute(
+            "SELECT COUNT(*) AS shared, TOTAL(a.answer = b.answer) AS agree, TOTAL(a.correct) AS a_correct, "
+            "TOTAL(b.correct) AS b_correct, TOTAL(a.correct AND b.correct) AS both_correct, "
+            "TOTAL(a.correct AND NOT b.correct) AS a_only, TOTAL(b.correct AND NOT a.correct) AS b_only "
+            "FROM records a JOIN records b ON b.run = ? AND b.tweet_hash = a.tweet_hash AND b.airline = a.airline "
+            "WHERE a.run = ?", (run_b, run_a)).fetchone()
+        result = {key: int(shared[key]) for key in shared.keys()}
+        n = result['shared']
+        result.update({
+            'a': runs[run_a],
+            'b': runs[run_b],
+            'only_a': runs[run_a]['records'] - n,
+            'only_b': runs[run_b]['records'] - n,
+            'neither_correct': n - result['a_correct'] - result['b_only'],
+            'agreement': result['agree'] / n if n else 0.0,
+            'a_accuracy': result['a_correct'] / n if n else 0.0,
+            'b_accuracy': result['b_correct'] / n if n else 0.0,
+            'disagreements': [],
+        })
+        if show:
+            rows = self._conn.execute(
+                "SELECT a.tweet, a.airline, a.ideal, a.output AS a_output, b.output AS b_output, "
+                "a.correct AS a_correct, b.correct AS b_correct "
+                "FROM records a JOIN records b ON b.run = ? AND b.tweet_hash = a.tweet_hash AND b.airline = a.airline "
+                "WHERE a.run = ? AND a.answer IS NOT b.answer LIMIT ?", (run_b, run_a, show)).fetchall()
+            result['disagreements'] = [{**dict(row), 'ideal': json.loads(row['ideal']),
+                                        'a_output': json.loads(row['a_output']), 'b_output': json.loads(row['b_output'])}
+                                       for row in rows]
+        return result
+
+def default_index_path(results_dir: str = DEFAULT_RESULTS_DIR) -> str:
+    """Path of the index kept in a results directory."""
+    return os.path.join(results_dir, INDEX_FILENAME)
+
+def index_run_dir(run_dir: str, index_path: Optional[str] = None) -> bool:
+    """Add or refresh one finished run in an index.
+
+    Args:
+        run_dir: Run output directory
+        index_path: Index database (default: the index in the run's parent directory)
+
+    Returns:
+        True if the run was (re-)indexed
+    """
+    index_path = index_path or default_index_path(os.path.dirname(os.path.normpath(run_dir)))
+    with ResultsIndex(index_path) as index:
+        return index.index_run(run_dir)
+
+def format_runs(rows: List[Dict[str, Any]]) -> str:
+    """Render index rows as a fixed-width table, newest first."""
+    def rate(value):
+        return f"{value:.1%}" if value is not None else "-"
+
+    header = (f"{'Started':<19} {'Experiment':<34} {'Data':<5} {'Batch':>5} {'Records':>7} {'Ent F1':>7} "
+              f"{'Sent acc':>8} {'$/1k':>7}  Run")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        f1 = f"{row['entity_f1']:.3f}" if row['entity_f1'] is not None else "-"
+        cost = f"{row['cost_per_1k_tweets']:.3f}" if row['cost_per_1k_tweets'] is not None else "-"
+        lines.append(f"{row['started']:<19} {row['experiment'] or '?':<34} {str(row['dataset'])[:5]:<5} "
+                     f"{row['batch_size'] or 1:>5} {row['records']:>7} {f1:>7} {rate(row['sentiment_accuracy']):>8} "
+                     f"{cost:>7}  {row['run']}")
+    return "\n".join(lines)
+
+def format_comparison(result: Dict[str, Any]) -> str:
+    """Render the output of ResultsIndex.compare as a short text report."""
+    lines = []
+    for label in ('a', 'b'):
+        run = result[label]
+        lines.append(f"{label.upper()}: {run['experiment']} ({run['dataset']}, {run['records']} records, "
+                     f"started {run['started']}) {run['run']}")
+    n = result['shared']
+    lines.append(f"Shared records: {n} ({result['only_a']} only in A, {result['only_b']} only in B)")
+    lines.append(f"Agreement: {result['agree']}/{n} ({result['agreement']:.1%})")
+    lines.append(f"Correct: A {result['a_accuracy']:.1%} | B {result['b_accuracy']:.1%} | both {result['both_correct']} | "
+                 f"A only {result['a_only']} | B only {result['b_only']} | neither {result['neither_correct']}")
+    if result['disagreements']:
+        lines.append("Disagreements:")
+        for row in result['disagreements']:
+            airline = f" [{row['airline']}]" if row['airline'] else ""
+            lines.append(f"  {row['tweet'][:70]!r}{airline}")
+            lines.append(f"    ideal {json.dumps(row['ideal'])} | A{'' if row['a_correct'] else ' (wrong)'} "
+                         f"{json.dumps(row['a_output'])} | B{'' if row['b_correct'] else ' (wrong)'} {json.dumps(row['b_output'])}")
+    return "\n".join(lines)
+
+def main():
+    """Update and query the results index from the command line."""
+    parser = argparse.ArgumentParser(description="Index experiment runs and compare them without re-reading solution files.")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help=f"Results directory holding the index (default: {DEFAULT_RESULTS_DIR})")
+    parser.add_argument("--index", default=None, help=f"Index database (default: RESULTS_DIR/{INDEX_FILENAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update", help="Index new and changed run directories and drop deleted ones")
+    update.add_argument("--force", action="store_true", help="Re-index every run")
+    listing = commands.add_parser("runs", help="List indexed runs, newest first")
+    listing.add_argument("--experiment", default=None, help="Only runs of this experiment")
+    listing.add_argument("--dataset", default=None, help="Only runs on this dataset (train, test or an archive path)")
+    listing.add_argument("--shards", action="store_true", help="Include the shard directories of sharded runs")
+    compare = commands.add_parser("compare", help="Compare two runs on the tweets both answered")
+    compare.add_argument("a", help="Experiment name (its latest complete run) or run directory")
+    compare.add_argument("b", help="Experiment name (its latest complete run) or run directory")
+    compare.add_argument("--dataset", default=None, help="Pick the latest runs on this dataset (train, test or an archive path)")
+    compare.add_argument("--show", type=int, default=10, help="Disagreements to print (default: 10)")
+    compare.add_argument("--output", default=None, help="Save the comparison as JSON to this path")
+    args = parser.parse_args()
+
+    with ResultsIndex(args.index or default_index_path(args.results_dir)) as index:
+        if args.command == "update":
+            counts = index.update(args.results_dir, force=args.force)
+            print(f"Indexed {counts['indexed']} runs ({counts['unchanged']} unchanged, {counts['removed']} removed) "
+                  f"in {index.path}")
+        elif args.command == "runs":
+            print(format_runs(index.runs(args.experiment, args.dataset, args.shards)))
+        else:
+            try:
+                result = index.compare(index.resolve(args.a, args.dataset), index.resolve(args.b, args.dataset),
+                                       max(0, args.show))
+            except (KeyError, ValueError) as e:
+                print(f"Cannot compare: {e.args[0]}", file=sys.stderr)
+                sys.exit(1)
+            print(format_comparison(result))
+            if args.output:
+                with open(args.output, 'w') as f:
+                    json.dump(result, f, indent=2)
+                print(f"Saved comparison to {args.output}")
+
+if __name__ == "__main__":
+    main()
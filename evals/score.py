@@ -0,0 +1,276 @@
+"""Local scoring for experiment results.
+
+This module scores one or many solution.jsonl files without calling a model:
+- Entity precision, recall, F1 and exact match, with airline alias normalisation
+- Sentiment accuracy and confusion matrices
+- Deterministic PASS / FAIL verdicts for rows the graders would decide mechanically
+
+Only the remaining ambiguous rows (extra airlines, or a sentiment that differs
+from a possibly subjective label) need an LLM grader; --grade sends just those
+rows to the grader prompts in evals/graders/ (see evals/grade.py).
+
+    python -m evals.score evals/results/<run> [evals/results/<other_run> ...] [--grade]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from evals.utils.entity_matcher import normalize_airline
+from evals.utils.parsers import VALID_SENTIMENTS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SENTIMENT_LABELS = VALID_SENTIMENTS + ["unknown"]
+
+def detect_task(record: Dict) -> str:
+    """Infer the experiment task from a solution record's shape.
+
+    Args:
+        record: A solution.jsonl record
+
+    Returns:
+        'entity', 'sentiment' or 'combined'
+    """
+    if isinstance(record['input'], dict):
+        return 'sentiment'
+    if isinstance(record['ideal'], dict):
+        return 'combined'
+    return 'entity'
+
+def _airline_list(value: Any) -> list:
+    """Coerce a model or label airline field to a list of non-empty names."""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return [name for name in value if isinstance(name, str) and name.strip()]
+
+def _columns(record: Dict, task: str) -> Dict:
+    """Flatten one record into the scoring columns for its task."""
+    output = record['output']
+    if task == 'entity':
+        return {'tweet': record['input'], 'airline': None, 'ideal_airlines': _airline_list(record['ideal']),
+                'output_airlines': _airline_list(output), 'ideal_sentiment': None, 'output_sentiment': None}
+    if task == 'sentiment':
+        return {'tweet': record['input'].get('tweet'), 'airline': record['input'].get('airline'),
+                'ideal_airlines': [], 'output_airlines': [], 'ideal_sentiment': record['ideal'], 'output_sentiment': output}
+    # Combined outputs that failed to parse were written as the raw response string
+    output = output if isinstance(output, dict) else {}
+    return {'tweet': record['input'], 'airline': None, 'ideal_airlines': _airline_list(record['ideal'].get('airlines')),
+            'output_airlines': _airline_list(output.get('airlines')), 'ideal_sentiment': record['ideal'].get('sentiment'),
+            'output_sentiment': output.get('sentiment')}
+
+def resolve_solution_path(path: str) -> str:
+    """Accept either a run output directory or a solution.jsonl path."""
+    return os.path.join(path, "solution.jsonl") if os.path.isdir(path) else path
+
+def load_solutions(paths: List[str]) -> pd.DataFrame:
+    """Load solution.jsonl files into one frame of scoring columns.
+
+    Args:
+        paths: solution.jsonl files or run output directories
+
+    Returns:
+        DataFrame with one row per record: run, task, tweet, airline, ideal/output
+        airlines and sentiments, and the original record
+    """
+    import pandas as pd
+
+    rows = []
+    for path in paths:
+        solution_path = resolve_solution_path(path)
+        with open(solution_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn final line of an interrupted run
+                task = detect_task(record)
+                rows.append({'run': solution_path, 'task': task, **_columns(record, task), 'record': record})
+    df = pd.DataFrame(rows, columns=['run', 'task', 'tweet', 'airline', 'ideal_airlines', 'output_airlines',
+                                     'ideal_sentiment', 'output_sentiment', 'record'])
+    for column in ('ideal_sentiment', 'output_sentiment'):
+        sentiment = df[column].fillna("").astype(str).str.lower().str.strip()
+        df[column] = sentiment.where(sentiment.isin(VALID_SENTIMENTS), "unknown")
+    return df
+
+def _normalized_pairs(airlines: pd.Series) -> pd.DataFrame:
+    """Explode airline lists into unique (row, airline) pairs with official names."""
+    pairs = airlines.explode().dropna().rename('airline').reset_index().rename(columns={'index': 'row'})
+    names = {name: normalize_airline(name) for name in pairs['airline'].unique()}
+    pairs['airline'] = pairs['airline'].map(names)
+    return pairs.drop_duplicates()
+
+def entity_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Count matched, missing and extra airlines per row.
+
+    Args:
+        df: Frame from load_solutions
+
+    Returns:
+        Frame indexed like df with 'tp', 'fn' (missing) and 'fp' (extra) columns
+    """
+    import pandas as pd
+
+    pairs = _normalized_pairs(df['ideal_airlines']).merge(
+        _normalized_pairs(df['output_airlines']), on=['row', 'airline'], how='outer', indicator=True)
+    counts = pd.crosstab(pairs['row'], pairs['_merge'])
+    counts = counts.reindex(index=df.index, columns=['both', 'left_only', 'right_only'], fill_value=0)
+    return counts.rename(columns={'both': 'tp', 'left_only': 'fn', 'right_only': 'fp'})
+
+def prefilter_verdicts(df: pd.DataFrame, counts: pd.DataFrame) -> pd.Series:
+    """Decide the rows whose grader verdict is mechanical.
+
+    Exact matches PASS. Missing an expected airline, or an unparseable
+    sentiment, FAILs. Anything else (extra airlines, or a sentiment that
+    differs from the label) is left for an LLM grader as None.
+
+    Args:
+        df: Frame from load_solutions
+        counts: Frame from entity_counts
+
+    Returns:
+        Series of 'PASS', 'FAIL' or None per row
+    """
+    import numpy as np
+    import pandas as pd
+
+    has_entities = df['task'].isin(['entity', 'combined']).to_numpy()
+    has_sentiment = df['task'].isin(['sentiment', 'combined']).to_numpy()
+    missing = has_entities & (counts['fn'].to_numpy() > 0)
+    extra = has_entities & (counts['fp'].to_numpy() > 0)
+    unparsed = has_sentiment & (df['output_sentiment'] == "unknown").to_numpy()
+    mismatch = has_sentiment & (df['output_sentiment'] != df['ideal_sentiment']).to_numpy()
+    verdicts = np.select([missing | unparsed, ~extra & ~mismatch], ["FAIL", "PASS"], default="")
+    verdicts = pd.Series(verdicts, index=df.index, dtype=object)
+    return verdicts.where(verdicts != "", None)
+
+def score_run(df: pd.DataFrame, counts: pd.DataFrame, verdicts: pd.Series) -> Dict:
+    """Compute the metrics of one run.
+
+    Args:
+        df: Rows of a single run from load_solutions
+        counts: Matching rows of entity_counts
+        verdicts: Matching rows of prefilter_verdicts
+
+    Returns:
+        JSON-serializable metrics dictionary
+    """
+    import pandas as pd
+
+    task = df['task'].iloc[0]
+    scores = {'run': df['run'].iloc[0], 'task': task, 'records': len(df)}
+    if task in ('entity', 'combined'):
+        tp, fn, fp = counts['tp'].sum(), counts['fn'].sum(), counts['fp'].sum()
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        scores['entity'] = {
+            'precision': float(precision),
+            'recall': float(recall),
+            'f1': float(2 * precision * recall / (precision + recall)) if precision + recall else 0.0,
+            'exact_match': float(((counts['fn'] == 0) & (counts['fp'] == 0)).mean()),
+        }
+    if task in ('sentiment', 'combined'):
+        confusion = pd.crosstab(df['ideal_sentiment'], df['output_sentiment'])
+        confusion = confusion.reindex(index=VALID_SENTIMENTS, columns=SENTIMENT_LABELS, fill_value=0)
+        scores['sentiment'] = {
+            'accuracy': float((df['ideal_sentiment'] == df['output_sentiment']).mean()),
+            'confusion': {ideal: {output: int(n) for output, n in row.items()} for ideal, row in confusion.iterrows()},
+        }
+    scores['verdicts'] = {
+        'PASS': int((verdicts == "PASS").sum()),
+        'FAIL': int((verdicts == "FAIL").sum()),
+        'ambiguous': int(verdicts.isna().sum()),
+    }
+    return scores
+
+def score_solutions(df: pd.DataFrame) -> Dict[str, Any]:
+    """Score every run in a loaded frame.
+
+    Args:
+        df: Frame from load_solutions
+
+    Returns:
+        Dictionary with per-run 'scores' and per-row prefilter 'verdicts'
+    """
+    counts = entity_counts(df)
+    verdicts = prefilter_verdicts(df, counts)
+    scores = [score_run(df.loc[index], counts.loc[index], verdicts.loc[index])
+              for index in df.groupby('run', sort=False).groups.values()]
+    return {'scores': scores, 'verdicts': verdicts}
+
+def format_scores(scores: Dict, graded: Optional[Dict[str, int]] = None) -> str:
+    """Render one run's scores as a short text report.
+
+    Args:
+        scores: Output of score_run
+        graded: Final verdict counts after LLM grading, if any
+
+    Returns:
+        Multi-line report string
+    """
+    lines = [f"{scores['run']} ({scores['task']}, {scores['records']} records)"]
+    if 'entity' in scores:
+        entity = scores['entity']
+        lines.append(f"  Entities: precision {entity['precision']:.3f} | recall {entity['recall']:.3f} | "
+                     f"F1 {entity['f1']:.3f} | exact match {entity['exact_match']:.1%}")
+    if 'sentiment' in scores:
+        sentiment = scores['sentiment']
+        lines.append(f"  Sentiment: accuracy {sentiment['accuracy']:.1%}")
+        lines.append("  Confusion (rows = ideal, columns = output):")
+        lines.append("    " + " " * 9 + "".join(f"{label:>10}" for label in SENTIMENT_LABELS))
+        for ideal, row in sentiment['confusion'].items():
+            lines.append(f"    {ideal:<9}" + "".join(f"{row[label]:>10}" for label in SENTIMENT_LABELS))
+    verdicts = scores['verdicts']
+    records = max(scores['records'], 1)
+    lines.append(f"  Prefilter: {verdicts['PASS']} PASS | {verdicts['FAIL']} FAIL | {verdicts['ambiguous']} ambiguous "
+                 f"(pass rate {verdicts['PASS'] / records:.1%} to {(verdicts['PASS'] + verdicts['ambiguous']) / records:.1%})")
+    if graded is not None:
+        passed = graded.get('PASS', 0) + graded.get('INFERRED PASS', 0)
+        lines.append(f"  Graded: {graded.get('PASS', 0)} PASS | {graded.get('INFERRED PASS', 0)} INFERRED PASS | "
+                     f"{graded.get('FAIL', 0)} FAIL | {graded.get('ungraded', 0)} ungraded (pass rate {passed / records:.1%})")
+    return "\n".join(lines)
+
+def main():
+    """Score solution files from the command line."""
+    parser = argparse.ArgumentParser(description="Score experiment results locally.")
+    parser.add_argument("paths", nargs="+", help="Run output directories or solution.jsonl files")
+    parser.add_argument("--grade", action="store_true", help="Send ambiguous rows to the LLM graders in batches")
+    parser.add_argument("--concurrency", type=int, default=8, help="Grading requests in flight with --grade (default: 8)")
+    parser.add_argument("--ambiguous", default=None, help="Write the ambiguous records to this JSONL file")
+    parser.add_argument("--output", default=None, help="Save the scores as JSON to this path")
+    args = parser.parse_args()
+
+    df = load_solutions(args.paths)
+    result = score_solutions(df)
+    verdicts = result['verdicts']
+
+    if args.ambiguous:
+        with open(args.ambiguous, 'w') as f:
+            for index in verdicts.index[verdicts.isna()]:
+                f.write(json.dumps({'run': df.at[index, 'run'], 'task': df.at[index, 'task'], **df.at[index, 'record']}) + '\n')
+        print(f"Wrote {int(verdicts.isna().sum())} ambiguous records to {args.ambiguous}")
+
+    graded = None
+    if args.grade:
+        # Deferred so local scoring does not load the API stack
+        from evals.grade import grade_records
+        graded = grade_records(df, verdicts, concurrency=args.concurrency)['verdicts']
+    for scores in result['scores']:
+        if graded is not None:
+            counts = graded[df['run'] == scores['run']].fillna("ungraded").value_counts()
+            scores['graded'] = {verdict: int(n) for verdict, n in counts.items()}
+        print(format_scores(scores, scores.get('graded')))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result['scores'], f, indent=2, default=str)
+        print(f"Saved scores to {args.output}")
+
+if __name__ == "__main__":
+    main()
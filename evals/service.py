@@ -0,0 +1,224 @@
+"""Local HTTP service for classifying tweets with the combined batch prompts.
+
+Endpoints:
+- POST /classify: {"tweet": "..."} returns {"output": {...}}; {"tweets": [...]} (or a
+  bare JSON list) returns {"outputs": [...]} in the same order
+- GET /stats: queue depth, batch sizes, latency percentiles, request and cache counters
+- GET /health: liveness check
+
+Tweets from concurrent requests are coalesced into batch prompt calls within a
+short window, all calls share one pooled async client on a single event loop,
+and per-tweet results are served from the response cache when enabled.
+
+    python -m evals.service --port 8080 --batch_size 10 --max_wait 0.05 --cache readwrite
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from evals.prompts.combined import COMBINED_BATCH_PROMPT_FUNCS
+from evals.utils import api
+from evals.utils.cache import CACHE_MODES, DEFAULT_CACHE_PATH, ResponseCache
+from evals.utils.recovery import classify_batch
+from evals.utils.streaming import MicroBatcher
+
+class ClassificationService:
+    """Micro-batched classifier running on a background event loop."""
+
+    def __init__(self, prompt_func: Callable, batch_size: int = 10, max_wait: float = 0.05,
+                 concurrency: int = 4, max_queue: int = 1000, timeout: float = 120.0):
+        """Start the event loop and the micro-batcher.
+
+        Args:
+            prompt_func: Batch prompt function (from COMBINED_BATCH_PROMPT_FUNCS)
+            batch_size: Maximum tweets per API call
+            max_wait: Maximum seconds a tweet waits for its batch to fill
+            concurrency: Maximum API calls in flight
+            max_queue: Maximum tweets waiting for a batch before requests block
+            timeout: Seconds a request waits for its results before failing
+        """
+        self.prompt_func = prompt_func
+        self.timeout = timeout
+        self.started_at = time.time()
+        self.counts = {'requests': 0, 'tweets': 0, 'cache_hits': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.batcher = MicroBatcher(self._classify, batch_size, max_wait, concurrency, max_queue)
+        self._batching = asyncio.run_coroutine_threadsafe(self.batcher.start(), self.loop).result()
+
+    def _cache_key(self, tweet: str) -> str:
+        """Key a single tweet's result by prompt function, so cached results survive regrouping."""
+        return ResponseCache.make_key(api.MODEL, api.TEMPERATURE, 0, f"classify:{self.prompt_func.__name__}\n{tweet}")
+
+    async def _classify(self, tweets: List[str]) -> List[Dict]:
+        """Classify one micro-batch and cache the tweets that were recovered."""
+        recovered = await classify_batch(tweets, self.prompt_func)
+        if api.cache is not None:
+            failed = set(recovered['failed'])
+            for i, (tweet, result) in enumerate(zip(tweets, recovered['results'])):
+                if i not in failed:
+                    api.cache.put(self._cache_key(tweet), json.dumps(result))
+        return recovered['results']
+
+    def classify(self, tweets: List[str]) -> List[Dict]:
+        """Classify tweets, blocking the calling (request) thread until all results are in.
+
+        Args:
+            tweets: Tweets to classify
+
+        Returns:
+            One {"airlines": [...], "sentiment": ...} result per tweet, in order
+        """
+        results: List[Optional[Dict]] = [None] * len(tweets)
+        pending = []
+        for i, tweet in enumerate(tweets):
+            cached = api.cache.get(self._cache_key(tweet)) if api.cache is not None else None
+            if cached is not None:
+                results[i] = json.loads(cached)
+            else:
+                pending.append((i, asyncio.run_coroutine_threadsafe(self.batcher.submit(tweet), self.loop)))
+        with self._lock:
+            self.counts['requests'] += 1
+            self.counts['tweets'] += len(tweets)
+            self.counts['cache_hits'] += len(tweets) - len(pending)
+        deadline = time.monotonic() + self.timeout
+        try:
+            for i, future in pending:
+                results[i] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except Exception:
+            with self._lock:
+                self.counts['errors'] += 1
+            for _, future in pending:
+                future.cancel()
+            raise
+        return results
+
+    def stats(self) -> Dict:
+        """Report service counters, queue depth, batching and latency statistics."""
+        with self._lock:
+            counts = dict(self.counts)
+        stats = {'uptime': time.time() - self.started_at, **counts, 'batcher': self.batcher.stats()}
+        if api.cache is not None:
+            stats['cache'] = api.cache.stats()
+        return stats
+
+    def close(self):
+        """Process queued tweets, then stop the event loop."""
+        async def drain():
+            await self.batcher.close()
+            await self._batching
+
+        try:
+            asyncio.run_coroutine_threadsafe(drain(), self.loop).result(timeout=self.timeout)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+class ServiceServer(ThreadingHTTPServer):
+    """Threaded HTTP server; each request thread blocks on its results, not the event loop."""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+def make_handler(service: ClassificationService, max_request_tweets: int = 1000):
+    """Create a request handler class bound to a classification service.
+
+    Args:
+        service: The service answering requests
+        max_request_tweets: Largest list of tweets accepted in one request
+
+    Returns:
+        BaseHTTPRequestHandler subclass
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, service.stats())
+            elif self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self.path != "/classify":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(body or b"null")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": "request body must be JSON"})
+                return
+            single = isinstance(request, dict) and isinstance(request.get("tweet"), str)
+            tweets = [request["tweet"]] if single else request.get("tweets") if isinstance(request, dict) else request
+            if not isinstance(tweets, list) or not all(isinstance(tweet, str) and tweet.strip() for tweet in tweets):
+                self._send_json(400, {"error": 'expected {"tweet": "..."}, {"tweets": [...]} or a list of tweets'})
+                return
+            if len(tweets) > max_request_tweets:
+                self._send_json(413, {"error": f"at most {max_request_tweets} tweets per request"})
+                return
+            try:
+                outputs = service.classify(tweets)
+            except Exception as e:
+                self._send_json(504 if isinstance(e, concurrent.futures.TimeoutError) else 500, {"error": str(e) or type(e).__name__})
+                return
+            self._send_json(200, {"output": outputs[0]} if single else {"outputs": outputs})
+
+    return Handler
+
+def main():
+    """Run the classification service in the foreground."""
+    parser = argparse.ArgumentParser(description="Serve tweet classification over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind (default: 8080)")
+    parser.add_argument("--experiment", default="combined_batch_v1", choices=list(COMBINED_BATCH_PROMPT_FUNCS),
+                        help="Batch prompt to serve (default: combined_batch_v1)")
+    parser.add_argument("--batch_size", type=int, default=10, help="Maximum tweets per API call (default: 10)")
+    parser.add_argument("--max_wait", type=float, default=0.05, help="Seconds a tweet waits for its batch to fill (default: 0.05)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum API calls in flight (default: 4)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds a request waits for its results (default: 120)")
+    parser.add_argument("--rpm", type=float, default=500, help="Requests-per-minute budget, 0 to disable (default: 500)")
+    parser.add_argument("--tpm", type=float, default=200000, help="Tokens-per-minute budget, 0 to disable (default: 200000)")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="readwrite", help="Response cache mode (default: readwrite)")
+    parser.add_argument("--cache_path", default=DEFAULT_CACHE_PATH, help=f"Response cache database (default: {DEFAULT_CACHE_PATH})")
+    args = parser.parse_args()
+
+    api.configure_rate_limit(args.rpm, args.tpm)
+    api.configure_cache(args.cache, args.cache_path)
+    service = ClassificationService(COMBINED_BATCH_PROMPT_FUNCS[args.experiment], args.batch_size, args.max_wait,
+                                    args.concurrency, max_queue=args.batch_size * args.concurrency * 4,
+                                    timeout=args.timeout)
+    server = ServiceServer((args.host, args.port), make_handler(service))
+    print(f"Classification service listening on http://{args.host}:{args.port} "
+          f"(batch size {args.batch_size}, max wait {args.max_wait}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        api.configure_cache("off")
+
+if __name__ == "__main__":
+    main()
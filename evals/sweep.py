@@ -0,0 +1,326 @@
+"""Sweep several experiments through one shared request pool.
+
+This module runs a grid of experiments, batch sizes and datasets in a single process:
+- Each dataset is loaded once and shared by every run that uses it
+- All runs send their requests through one event loop, one concurrency limit,
+  one rate limiter and one response cache; slots are granted first-come
+  first-served and every run keeps the same number of jobs queued, so runs
+  progress round-robin instead of one after another
+- Each run writes its own output directory (solution.jsonl, config.json,
+  metrics.json, calls.csv, summary.json) as experiment_runner.py would
+- A comparison table of accuracy, latency and tokens is printed and saved as
+  comparison.json and comparison.csv in the sweep directory
+
+    python -m evals.sweep --experiments entity_v2_standardized sentiment_v2_context_aware combined_batch_v1 \\
+        --batch_sizes 10 25 --datasets train test --n_samples 200 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import csv
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from evals.prompts.combined import COMBINED_BATCH_PROMPT_FUNCS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+COMPARISON_FIELDS = ["experiment", "batch_size", "dataset", "records", "entity_f1", "entity_exact_match",
+                     "sentiment_accuracy", "requests", "elapsed", "tweets_per_sec", "latency_p50", "latency_p95",
+                     "tokens_per_tweet", "cached_token_rate", "cost_per_1k_tweets", "parse_failures", "output_dir"]
+
+def plan_runs(experiments: List[str], batch_sizes: List[int], datasets: List[str]) -> List[Dict]:
+    """Expand the sweep grid into individual runs.
+
+    Batch prompts run once per batch size above 1; every other experiment runs
+    one tweet per request, so it runs once per dataset whatever the batch sizes.
+
+    Args:
+        experiments: Experiment names
+        batch_sizes: Batch sizes for the batch prompts
+        datasets: 'train' and/or 'test'
+
+    Returns:
+        Run dictionaries with 'experiment', 'batch_size' and 'dataset'
+    """
+    runs = []
+    for dataset in dict.fromkeys(datasets):
+        for experiment in dict.fromkeys(experiments):
+            if experiment in COMBINED_BATCH_PROMPT_FUNCS:
+                sizes = [size for size in dict.fromkeys(batch_sizes) if size > 1]
+            else:
+                sizes = [1]
+            runs.extend({'experiment': experiment, 'batch_size': size, 'dataset': dataset} for size in sizes)
+    return runs
+
+def run_label(run: Dict) -> str:
+    """Short display name of a run."""
+    batch = f" x{run['batch_size']}" if run['batch_size'] > 1 else ""
+    return f"{run['experiment']}{batch} ({run['dataset']})"
+
+class SharedPool:
+    """Event loop thread whose concurrency limit is shared by every run submitted to it."""
+
+    def __init__(self, concurrency: int):
+        """Start the event loop thread.
+
+        Args:
+            concurrency: Maximum requests in flight across all runs
+        """
+        self.concurrency = max(1, concurrency)
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+        async def make_slots():
+            return asyncio.Semaphore(self.concurrency)
+
+        self.slots = asyncio.run_coroutine_threadsafe(make_slots(), self.loop).result()
+
+    def executor(self, recorder) -> Callable:
+        """Create an execute function for one run, compatible with execute_jobs.
+
+        Args:
+            recorder: MetricsRecorder receiving the run's API calls and parse results
+
+        Returns:
+            Function running (jobs, handle, concurrency, process) on the shared loop,
+            blocking the calling thread until the run's jobs are done
+        """
+        from evals.utils.executor import run_jobs
+        from evals.utils.metrics import bind_recorder
+
+        def execute(jobs, handle, concurrency, process=None):
+            async def run():
+                bind_recorder(recorder)
+                return await run_jobs(jobs, handle, self.concurrency, process, self.slots)
+
+            return asyncio.run_coroutine_threadsafe(run(), self.loop).result()
+
+        return execute
+
+    def close(self):
+        """Stop the event loop."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+def execute_run(run: Dict, df: pd.DataFrame, sweep_dir: str, pool: SharedPool) -> Dict:
+    """Run one experiment of the sweep and write its output directory.
+
+    Args:
+        run: Run from plan_runs
+        df: The run's dataset, shared with other runs
+        sweep_dir: Parent directory of the sweep's run directories
+        pool: Shared request pool
+
+    Returns:
+        The run with its 'output_dir', 'solution_path', executor 'stats' and 'metrics' summary
+    """
+    import experiment_runner as runner
+    from evals.utils.data import create_output_dir, save_run_config, write_run_summary
+    from evals.utils.metrics import MetricsRecorder, latency_summary
+
+    experiment, batch_size = run['experiment'], run['batch_size']
+    n_samples = len(df)
+    output_dir = create_output_dir(experiment, n_samples, batch_size, run['dataset'] == "test", sweep_dir)
+    solution_path = os.path.join(output_dir, "solution.jsonl")
+    save_run_config(output_dir, {'experiment': experiment, 'n_samples': n_samples, 'batch_size': batch_size,
+                                 'test': run['dataset'] == "test", 'archive': None, 'pack_tokens': None, 'entity_fast_path': False,
+                                 'dedup_threshold': None, 'cascade_target_accuracy': None})
+
+    prompt_funcs = {**runner.ENTITY_PROMPT_FUNCS, **runner.SENTIMENT_PROMPT_FUNCS, **runner.COMBINED_PROMPT_FUNCS}
+    prompt_func = prompt_funcs[experiment]
+    recorder = MetricsRecorder({'experiment': experiment, 'prompt_func': prompt_func.__name__,
+                                'batch_size': batch_size, 'dataset': run['dataset']})
+    execute = pool.executor(recorder)
+    if experiment in runner.ENTITY_PROMPT_FUNCS:
+        stats = runner.run_entity_experiment(df, n_samples, prompt_func, solution_path, pool.concurrency, execute=execute)
+    elif experiment in runner.SENTIMENT_PROMPT_FUNCS:
+        stats = runner.run_sentiment_experiment(df, n_samples, prompt_func, solution_path, pool.concurrency, execute=execute)
+    else:
+        stats = runner.run_combined_experiment(df, n_samples, batch_size, prompt_func, solution_path, pool.concurrency,
+                                               execute=execute)
+
+    metrics = recorder.write(output_dir, n_samples)
+    summary = {
+        'experiment': experiment,
+        'dataset': run['dataset'],
+        'n_samples': n_samples,
+        'batch_size': batch_size,
+        'concurrency': pool.concurrency,
+        'elapsed': stats['elapsed'],
+        'requests': stats['requests'],
+        'requests_per_sec': stats['requests_per_sec'],
+        'tweets_per_sec': n_samples / stats['elapsed'] if stats['elapsed'] > 0 else 0.0,
+        'latency': latency_summary(stats['latencies']),
+        'sweep': os.path.basename(sweep_dir),
+    }
+    if 'batch_recovery' in stats:
+        summary['batch_recovery'] = stats['batch_recovery']
+    write_run_summary(output_dir, summary)
+    return {**run, 'output_dir': output_dir, 'solution_path': solution_path, 'stats': stats, 'metrics': metrics}
+
+def comparison_rows(results: List[Dict]) -> List[Dict]:
+    """Score each run's solution.jsonl and line the runs up for comparison.
+
+    Args:
+        results: Outputs of execute_run
+
+    Returns:
+        One row per run with COMPARISON_FIELDS
+    """
+    from evals.score import load_solutions, score_solutions
+
+    scores = {}
+    if results:
+        df = load_solutions([result['solution_path'] for result in results])
+        scores = {os.path.normpath(score['run']): score for score in score_solutions(df)['scores']}
+    rows = []
+    for result in results:
+        score = scores.get(os.path.normpath(result['solution_path']), {})
+        metrics, stats = result['metrics'], result['stats']
+        rows.append({
+            'experiment': result['experiment'],
+            'batch_size': result['batch_size'],
+            'dataset': result['dataset'],
+            'records': score.get('records', 0),
+            'entity_f1': score['entity']['f1'] if 'entity' in score else None,
+            'entity_exact_match': score['entity']['exact_match'] if 'entity' in score else None,
+            'sentiment_accuracy': score['sentiment']['accuracy'] if 'sentiment' in score else None,
+            'requests': stats['requests'],
+            'elapsed': stats['elapsed'],
+            'tweets_per_sec': metrics['tweets'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0,
+            'latency_p50': metrics['latency']['p50'],
+            'latency_p95': metrics['latency']['p95'],
+            'tokens_per_tweet': metrics['tokens']['per_tweet'],
+            'cached_token_rate': metrics['tokens']['cached_rate'],
+            'cost_per_1k_tweets': metrics['cost']['per_1k_tweets'],
+            'parse_failures': metrics['parse_failures'],
+            'output_dir': result['output_dir'],
+        })
+    return rows
+
+def format_comparison(rows: List[Dict]) -> str:
+    """Render comparison rows as a fixed-width table.
+
+    Args:
+        rows: Output of comparison_rows
+
+    Returns:
+        Multi-line table string
+    """
+    def rate(value):
+        return f"{value:.1%}" if value is not None else "-"
+
+    header = (f"{'Experiment':<34} {'Batch':>5} {'Data':<5} {'Ent F1':>7} {'Exact':>7} {'Sent acc':>8} "
+              f"{'Reqs':>6} {'Tweets/s':>8} {'p50 s':>6} {'p95 s':>6} {'Tok/tw':>7} {'Cached':>7} {'$/1k':>7}")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        f1 = f"{row['entity_f1']:.3f}" if row['entity_f1'] is not None else "-"
+        lines.append(f"{row['experiment']:<34} {row['batch_size']:>5} {row['dataset']:<5} {f1:>7} "
+                     f"{rate(row['entity_exact_match']):>7} {rate(row['sentiment_accuracy']):>8} {row['requests']:>6} "
+                     f"{row['tweets_per_sec']:>8.1f} {row['latency_p50']:>6.2f} {row['latency_p95']:>6.2f} "
+                     f"{row['tokens_per_tweet']:>7.0f} {rate(row['cached_token_rate']):>7} {row['cost_per_1k_tweets']:>7.3f}")
+    return "\n".join(lines)
+
+def write_comparison(sweep_dir: str, rows: List[Dict]):
+    """Write comparison.json and comparison.csv to the sweep directory.
+
+    Args:
+        sweep_dir: Sweep output directory
+        rows: Output of comparison_rows
+    """
+    with open(os.path.join(sweep_dir, "comparison.json"), 'w') as f:
+        json.dump(rows, f, indent=2)
+    with open(os.path.join(sweep_dir, "comparison.csv"), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COMPARISON_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main():
+    """Run a sweep from the command line."""
+    from evals.prompts.entity import ENTITY_PROMPT_FUNCS
+    from evals.prompts.sentiment import SENTIMENT_PROMPT_FUNCS
+    from evals.prompts.combined import COMBINED_PROMPT_FUNCS
+    from evals.utils.cache import CACHE_MODES, DEFAULT_CACHE_PATH
+
+    available = list(ENTITY_PROMPT_FUNCS) + list(SENTIMENT_PROMPT_FUNCS) + list(COMBINED_PROMPT_FUNCS)
+    parser = argparse.ArgumentParser(description="Run several experiments through one shared request pool.")
+    parser.add_argument("--experiments", nargs="+", required=True, choices=available, metavar="EXPERIMENT",
+                        help=f"Experiments to run ({', '.join(available)})")
+    parser.add_argument("--batch_sizes", nargs="+", type=int, default=[10],
+                        help="Batch sizes for batch prompts such as combined_batch_v1 (default: 10)")
+    parser.add_argument("--datasets", nargs="+", choices=["train", "test"], default=["train"],
+                        help="Datasets to run on (default: train)")
+    parser.add_argument("--n_samples", type=int, default=None, help="Number of samples per dataset (default: full dataset)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum API requests in flight across all runs (default: 8)")
+    parser.add_argument("--rpm", type=float, default=500, help="Requests-per-minute budget, 0 to disable (default: 500)")
+    parser.add_argument("--tpm", type=float, default=200000, help="Tokens-per-minute budget, 0 to disable (default: 200000)")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off", help="Response cache mode (default: off)")
+    parser.add_argument("--cache_path", default=DEFAULT_CACHE_PATH, help=f"Response cache database (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--results_dir", default="evals/results", help="Parent directory for the sweep directory (default: evals/results)")
+    args = parser.parse_args()
+
+    runs = plan_runs(args.experiments, args.batch_sizes, args.datasets)
+    if not runs:
+        parser.error("no runs: batch prompts need at least one --batch_sizes value above 1")
+
+    # Deferred to keep --help fast
+    from evals.utils import api
+    from evals.results_index import ResultsIndex, default_index_path
+    from evals.utils.data import load_dataset
+
+    api.configure_rate_limit(args.rpm, args.tpm)
+    api.configure_cache(args.cache, args.cache_path)
+    api.configure_metrics(enabled=False)
+    data = {dataset: load_dataset(dataset, args.n_samples) for dataset in dict.fromkeys(run['dataset'] for run in runs)}
+    sweep_dir = os.path.join(args.results_dir, f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    print(f"Sweeping {len(runs)} runs with {args.concurrency} requests in flight: "
+          f"{', '.join(run_label(run) for run in runs)}")
+    pool = SharedPool(args.concurrency)
+    results = [None] * len(runs)
+    stdout = sys.stdout
+    try:
+        # Per-record progress lines from interleaved runs would be unreadable
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(runs)) as threads:
+                futures = {threads.submit(execute_run, run, data[run['dataset']], sweep_dir, pool): position
+                           for position, run in enumerate(runs)}
+                for future in concurrent.futures.as_completed(futures):
+                    run = runs[futures[future]]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"{run_label(run)} failed: {e}", file=sys.stderr)
+                        continue
+                    results[futures[future]] = result
+                    print(f"Finished {run_label(run)} in {result['stats']['elapsed']:.1f}s "
+                          f"({result['stats']['requests']} requests)", file=stdout)
+    finally:
+        pool.close()
+        if api.cache is not None:
+            cache_stats = api.cache.stats()
+            print(f"Cache ({args.cache}): {cache_stats['hits']} hits | {cache_stats['misses']} misses | "
+                  f"hit rate {cache_stats['hit_rate']:.1%}")
+            api.configure_cache("off")
+
+    rows = comparison_rows([result for result in results if result is not None])
+    write_comparison(sweep_dir, rows)
+    print(format_comparison(rows))
+    with ResultsIndex(default_index_path(args.results_dir)) as index:
+        for result in results:
+            if result is not None:
+                index.index_run(result['output_dir'])
+    print(f"Saved sweep to {sweep_dir}")
+
+if __name__ == "__main__":
+    main()
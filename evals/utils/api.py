@@ -1,32 +1,337 @@
 """API utilities for making calls to language models.
 
 This module provides functions for interacting with language model APIs,
-including handling API calls and responses.
+including handling API calls and responses. Calls are served from an optional
+response cache, admitted through an optional rate limiter and retried with
+jittered exponential backoff on rate limit (429) and server (5xx) errors,
+honouring any Retry-After header. When a metrics recorder is configured, each
+call's latency, retries and token usage are recorded. When hedging is enabled,
+async requests that run past a percentile of recent latencies get a duplicate
+and the first response wins. Prompts may be plain strings or SplitPrompts,
+whose static prefix is sent as a system message so the provider can cache it.
+
+The openai package and the clients are loaded on first use, so importing this
+module is cheap and does not need an API key.
 """
 
-import openai
+import asyncio
+import email.utils
+import random
+import threading
+import time
+import weakref
+from typing import Optional
+
+from evals.prompts.layout import Prompt, prompt_key, prompt_messages, prompt_text
+from evals.utils.cache import DEFAULT_CACHE_PATH, ResponseCache
+from evals.utils.hedging import HedgePolicy
+from evals.utils.metrics import MetricsRecorder, bound_recorder
+from evals.utils.ratelimit import RateLimiter, estimate_tokens
 
 MODEL = "gpt-4o-mini"
-client = openai.OpenAI()
+TEMPERATURE = 0.1
+MAX_RETRIES = 8
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_client = None
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_client_lock = threading.Lock()
+limiter: Optional[RateLimiter] = None
+cache: Optional[ResponseCache] = None
+metrics: Optional[MetricsRecorder] = None
+hedger: Optional[HedgePolicy] = None
+
+def get_client():
+    """Return the shared synchronous OpenAI client, creating it on first use.
+    
+    Returns:
+        openai.OpenAI client with SDK retries disabled
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import openai
+            # Retries are scheduled here rather than inside the SDK so they share the rate limiter
+            _client = openai.OpenAI(max_retries=0)
+        return _client
+
+def get_async_client():
+    """Return the AsyncOpenAI client of the running event loop, creating it on first use.
+    
+    Every call on a loop reuses one client and its connection pool. An async
+    client's connections are tied to the loop that opened them, so each loop
+    (e.g. one asyncio.run per run) gets its own client.
+    
+    Returns:
+        openai.AsyncOpenAI client with SDK retries disabled
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        async_client = _async_clients.get(loop)
+        if async_client is None:
+            import openai
+            async_client = _async_clients[loop] = openai.AsyncOpenAI(max_retries=0)
+        return async_client
+
+def __getattr__(name: str):
+    """Keep `api.client` working for callers written before the clients were lazy."""
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def configure_rate_limit(rpm: Optional[float] = None, tpm: Optional[float] = None):
+    """Set the requests- and tokens-per-minute budgets shared by all API calls.
+    
+    Args:
+        rpm: Requests-per-minute budget (None for unlimited)
+        tpm: Tokens-per-minute budget (None for unlimited)
+    """
+    global limiter
+    limiter = RateLimiter(rpm, tpm) if (rpm or tpm) else None
+
+def configure_cache(mode: str = "readwrite", path: str = DEFAULT_CACHE_PATH):
+    """Enable, change or disable the response cache shared by all API calls.
+    
+    Args:
+        mode: 'off', 'read' or 'readwrite'
+        path: Path to the SQLite cache database
+    """
+    global cache
+    if cache is not None:
+        cache.close()
+    cache = ResponseCache(path, mode) if mode != "off" else None
+
+def configure_hedging(quantile: Optional[float] = None, max_rate: float = 0.05) -> Optional[HedgePolicy]:
+    """Enable or disable hedged requests for all async API calls.
+    
+    Args:
+        quantile: Percentile (0-100) of recent latencies after which a duplicate is sent (None to disable)
+        max_rate: Maximum duplicates as a fraction of requests
+        
+    Returns:
+        The new hedging policy, or None when disabled
+    """
+    global hedger
+    hedger = HedgePolicy(quantile, max_rate) if quantile else None
+    return hedger
+
+def configure_metrics(tags: Optional[dict] = None, enabled: bool = True) -> Optional[MetricsRecorder]:
+    """Start (or stop) recording per-call metrics for all API calls.
+    
+    Args:
+        tags: Run-level tags copied onto every call (experiment, prompt_func, batch_size)
+        enabled: Whether to record metrics at all
+        
+    Returns:
+        The new recorder, or None when disabled
+    """
+    global metrics
+    metrics = MetricsRecorder(tags) if enabled else None
+    return metrics
+
+def active_metrics() -> Optional[MetricsRecorder]:
+    """Return the recorder for calls from the current task: a bound one, else the global one."""
+    recorder = bound_recorder()
+    return recorder if recorder is not None else metrics
+
+def _record_call(started: float, retries: int, status: str, usage=None):
+    """Record a finished call with the active metrics recorder, if any."""
+    recorder = active_metrics()
+    if recorder is not None:
+        recorder.record_call(MODEL, time.perf_counter() - started, retries, status, usage)
 
-def call_api(prompt: str, max_tokens: int = 150) -> str:
+def _parse_retry_after(headers) -> Optional[float]:
+    """Read the server's requested retry delay from response headers.
+    
+    Args:
+        headers: Response headers of the failed request
+        
+    Returns:
+        Delay in seconds, or None if the server did not specify one
+    """
+    if headers is None:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        retry_date = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_date.timestamp() - time.time()) if retry_date else None
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Decide whether a failed request should be retried and how long to wait.
+    
+    Args:
+        error: Exception raised by the client
+        attempt: Zero-based index of the attempt that failed
+        
+    Returns:
+        Seconds to wait before retrying, or None if the error is not retryable
+    """
+    import openai
+
+    if attempt >= MAX_RETRIES:
+        return None
+    retry_after = None
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code not in RETRYABLE_STATUS:
+            return None
+        retry_after = _parse_retry_after(error.response.headers)
+    elif not isinstance(error, openai.APIConnectionError):
+        return None
+    backoff = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+    delay = max(retry_after, backoff) if retry_after is not None else backoff
+    if limiter is not None and isinstance(error, openai.RateLimitError):
+        limiter.pause(delay)
+    return delay
+
+def call_api(prompt: Prompt, max_tokens: int = 150) -> str:
     """Make an API call to the language model.
     
     Args:
-        prompt: The prompt to send to the model
+        prompt: The prompt to send to the model (a string or a SplitPrompt)
         max_tokens: Maximum number of tokens in the response
         
     Returns:
         The model's response as a string, stripped of whitespace
     """
+    started = time.perf_counter()
+    cache_key = ResponseCache.make_key(MODEL, TEMPERATURE, max_tokens, prompt_key(prompt)) if cache is not None else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _record_call(started, 0, "cache")
+            return cached
+    cost = estimate_tokens(prompt_text(prompt)) + max_tokens
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire(cost)
+        try:
+            response = get_client().chat.completions.create(
+                model=MODEL,
+                messages=prompt_messages(prompt),
+                temperature=TEMPERATURE,
+                max_tokens=max_tokens
+            )
+            content = response.choices[0].message.content.strip()
+            if cache_key is not None and content:
+                cache.put(cache_key, content)
+            _record_call(started, attempt, "ok", response.usage)
+            return content
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                print(f"API Error: {e}")
+                _record_call(started, attempt, "error")
+                return ""
+            attempt += 1
+            time.sleep(delay)
+
+async def _create_async(prompt: Prompt, max_tokens: int):
+    """Send one chat completion request with the shared async client."""
+    return await get_async_client().chat.completions.create(
+        model=MODEL,
+        messages=prompt_messages(prompt),
+        temperature=TEMPERATURE,
+        max_tokens=max_tokens
+    )
+
+async def _create_hedged(prompt: Prompt, max_tokens: int, cost: int):
+    """Send a request, adding a duplicate if it outlives the hedging delay.
+    
+    The first successful response wins and the other request is cancelled. A
+    failure is only raised once both requests have failed.
+    
+    Args:
+        prompt: The prompt to send to the model (a string or a SplitPrompt)
+        max_tokens: Maximum number of tokens in the response
+        cost: Estimated tokens, charged to the rate limiter again for the duplicate
+        
+    Returns:
+        The winning response
+    """
+    policy = hedger
+    if policy is None:
+        return await _create_async(prompt, max_tokens)
+
+    async def timed(duplicate: bool):
+        if limiter is not None and duplicate:
+            await limiter.acquire_async(cost)
+        started = time.perf_counter()
+        response = await _create_async(prompt, max_tokens)
+        return response, time.perf_counter() - started
+
+    primary = asyncio.ensure_future(timed(False))
+    tasks = [primary]
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"API Error: {e}")
-        return "" 
\ No newline at end of file
+        delay = policy.start()
+        if delay is not None:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if not done and policy.try_hedge():
+                tasks.append(asyncio.ensure_future(timed(True)))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    response, latency = task.result()
+                    policy.observe(latency, hedge_won=task is not primary)
+                    return response
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def call_api_async(prompt: Prompt, max_tokens: int = 150) -> str:
+    """Make a non-blocking API call to the language model.
+    
+    Mirrors call_api but uses the shared AsyncOpenAI client so many requests
+    can be in flight at once from a single event loop.
+    
+    Args:
+        prompt: The prompt to send to the model (a string or a SplitPrompt)
+        max_tokens: Maximum number of tokens in the response
+        
+    Returns:
+        The model's response as a string, stripped of whitespace
+    """
+    started = time.perf_counter()
+    cache_key = ResponseCache.make_key(MODEL, TEMPERATURE, max_tokens, prompt_key(prompt)) if cache is not None else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _record_call(started, 0, "cache")
+            return cached
+    cost = estimate_tokens(prompt_text(prompt)) + max_tokens
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire_async(cost)
+        try:
+            response = await _create_hedged(prompt, max_tokens, cost)
+            content = response.choices[0].message.content.strip()
+            if cache_key is not None and content:
+                cache.put(cache_key, content)
+            _record_call(started, attempt, "ok", response.usage)
+            return content
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                print(f"API Error: {e}")
+                _record_call(started, attempt, "error")
+                return ""
+            attempt += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,109 @@
+"""Utilities for offline bulk runs through the OpenAI Batch API.
+
+This module provides functions for writing experiment prompts as Batch API
+request files and for reading Batch API output files back into a mapping from
+custom_id to response text, so results can be joined back onto dataset rows.
+"""
+
+import json
+from typing import Awaitable, Callable, Dict, Iterable
+
+from evals.prompts.layout import Prompt, prompt_messages
+from evals.utils.api import MODEL, TEMPERATURE
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+def build_batch_request(custom_id: str, prompt: Prompt, max_tokens: int = 150) -> Dict:
+    """Build one Batch API request line for a prompt.
+    
+    Args:
+        custom_id: Stable identifier used to join the result back to its job
+        prompt: The prompt to send to the model (a string or a SplitPrompt)
+        max_tokens: Maximum number of tokens in the response
+        
+    Returns:
+        Request dictionary in Batch API input format
+    """
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": MODEL,
+            "messages": prompt_messages(prompt),
+            "temperature": TEMPERATURE,
+            "max_tokens": max_tokens,
+        },
+    }
+
+def write_batch_file(jobs: Iterable[Dict], path: str) -> int:
+    """Write every job's prompt to a Batch API input JSONL file.
+    
+    Jobs sharing a 'dedup' value with an earlier job are left out; at ingest
+    time they reuse that job's result.
+    
+    Args:
+        jobs: Iterable of job dictionaries with 'key', 'prompt' and optionally 'max_tokens'
+        path: Path of the JSONL file to write
+        
+    Returns:
+        Number of requests written
+    """
+    count = 0
+    seen = set()
+    shared = set()
+    with open(path, 'w') as f:
+        for job in jobs:
+            dedup = job.get('dedup')
+            if dedup is not None:
+                if dedup in shared:
+                    continue
+                shared.add(dedup)
+            if job['key'] in seen:
+                raise ValueError(f"Duplicate custom_id '{job['key']}'")
+            seen.add(job['key'])
+            f.write(json.dumps(build_batch_request(job['key'], job['prompt'], job.get('max_tokens', 150))) + '\n')
+            count += 1
+    return count
+
+def read_batch_results(path: str) -> Dict[str, str]:
+    """Read a Batch API output JSONL file.
+    
+    Failed requests (non-200 status or an error object) map to an empty string,
+    matching what call_api returns when a request fails.
+    
+    Args:
+        path: Path to the Batch API output file
+        
+    Returns:
+        Dictionary mapping custom_id to the model's response text
+    """
+    results = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            content = ""
+            if not item.get("error") and response.get("status_code") == 200:
+                try:
+                    content = (response["body"]["choices"][0]["message"]["content"] or "").strip()
+                except (KeyError, IndexError, TypeError):
+                    content = ""
+            results[item["custom_id"]] = content
+    return results
+
+def batch_results_processor(results: Dict[str, str]) -> Callable[[Dict], Awaitable[str]]:
+    """Create an executor processor that answers jobs from batch results.
+    
+    Args:
+        results: Mapping from custom_id to response text, as from read_batch_results
+        
+    Returns:
+        Coroutine function returning the stored response for a job ('' if missing)
+    """
+    async def process(job: Dict) -> str:
+        return results.get(job['key'], "")
+
+    return process
@@ -0,0 +1,150 @@
+"""Persistent response cache for API calls.
+
+This module provides an on-disk SQLite cache of model responses keyed on the
+request parameters (model, temperature, max_tokens) and a hash of the prompt,
+so re-running the same prompts over the same data can skip the API entirely.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = "evals/cache/responses.sqlite"
+CACHE_MODES = ("off", "read", "readwrite")
+
+class ResponseCache:
+    """Content-addressed SQLite cache of model responses.
+    
+    Entries older than `max_age_days` are treated as misses and removed, and
+    the least recently used entries are evicted once the stored responses
+    exceed `max_bytes`. Mode 'read' serves hits without storing new responses;
+    mode 'readwrite' does both.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, mode: str = "readwrite",
+                 max_bytes: int = 512 * 1024 * 1024, max_age_days: float = 30):
+        """Open (or create) the cache database.
+        
+        Args:
+            path: Path to the SQLite database file
+            mode: 'read' or 'readwrite'
+            max_bytes: Maximum total size of stored responses before LRU eviction
+            max_age_days: Maximum age of an entry before it expires
+        """
+        if mode not in CACHE_MODES[1:]:
+            raise ValueError(f"Invalid cache mode '{mode}', expected one of {CACHE_MODES[1:]}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+        if mode == "readwrite":
+            self.evict()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+        """Build the cache key for a request.
+        
+        Args:
+            model: Model name
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens in the response
+            prompt: The prompt text
+            
+        Returns:
+            Hex digest identifying the request
+        """
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return hashlib.sha256(json.dumps([model, temperature, max_tokens, prompt_hash]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a cached response.
+        
+        Args:
+            key: Cache key from make_key
+            
+        Returns:
+            The cached response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.mode == "readwrite":
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a response (no-op unless the cache is in 'readwrite' mode).
+        
+        Args:
+            key: Cache key from make_key
+            response: Model response to store
+        """
+        if self.mode != "readwrite":
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now)
+            )
+            self._conn.commit()
+            self.writes += 1
+
+    def evict(self):
+        """Remove expired entries, then least recently used entries over the size budget."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    keys.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for the run summary.
+        
+        Returns:
+            Dictionary with hits, misses, writes and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """Apply eviction and close the database."""
+        if self.mode == "readwrite":
+            self.evict()
+        self._conn.close()
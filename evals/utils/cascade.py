@@ -0,0 +1,372 @@
+"""Local sentiment classifier for routing confident tweets away from the LLM.
+
+This module provides:
+- A TF-IDF + multinomial logistic regression sentiment model over word
+  unigrams and bigrams, hashtags, emoji and !/? runs, fitted on the train CSV
+- A confidence threshold calibrated on out-of-fold predictions, so tweets
+  accepted locally meet a target accuracy; the rest go to the LLM prompt
+- The accuracy / routed fraction / latency trade-off curve across thresholds
+
+The model is small and deterministic, so the same tweets are answered locally
+on every run, including when Batch API results are ingested. Run as a script to
+report the curve on the test set and, optionally, against an LLM sentiment run
+on the test set, whose answers and latency stand in for the routed tweets:
+
+    python -m evals.utils.cascade --solution evals/results/<test_sentiment_run>/solution.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_TARGET_ACCURACY = 0.95
+CV_FOLDS = 5
+MIN_DF = 2
+L2_PENALTY = 1e-4
+LEARNING_RATE = 5.0
+MOMENTUM = 0.9
+ITERATIONS = 300
+CURVE_THRESHOLDS = (0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0)
+
+_URL = re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE)
+_TOKEN = re.compile(r"#\w+|@\w+|[a-z0-9]+(?:'[a-z]+)?|[!?]+|[☀-➿\U0001f300-\U0001faff]", re.IGNORECASE)
+
+def tokenize(tweet: str) -> List[str]:
+    """Split a tweet into model features: words, bigrams, hashtags, emoji and !/? runs.
+
+    Handles are collapsed to '@user' so the model learns sentiment, not which
+    airline is being addressed.
+
+    Args:
+        tweet: Tweet text
+
+    Returns:
+        Unigram tokens followed by space-joined bigrams
+    """
+    tokens = []
+    for token in _TOKEN.findall(_URL.sub(" ", str(tweet)).lower()):
+        if token.startswith("@"):
+            token = "@user"
+        elif token[0] in "!?":
+            token = token[0] * min(len(token), 3)
+        tokens.append(token)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+class SentimentClassifier:
+    """TF-IDF features with a multinomial logistic regression on top."""
+
+    def __init__(self, min_df: int = MIN_DF, l2: float = L2_PENALTY, iterations: int = ITERATIONS):
+        """Initialize an unfitted model.
+
+        Args:
+            min_df: Minimum number of training tweets a feature must appear in
+            l2: L2 penalty on the weights
+            iterations: Gradient descent steps
+        """
+        self.min_df = min_df
+        self.l2 = l2
+        self.iterations = iterations
+        self.vocabulary: Dict[str, int] = {}
+        self.classes: List[str] = []
+        self.idf = None
+        self.weights = None
+        self.bias = None
+
+    def _features(self, tweets: Sequence[str]) -> Tuple:
+        """Sublinear TF-IDF matrix with L2-normalised rows, as sparse (rows, columns, values, n_rows)."""
+        import numpy as np
+
+        rows, columns, values = [], [], []
+        for row, tweet in enumerate(tweets):
+            for token, count in Counter(tokenize(tweet)).items():
+                column = self.vocabulary.get(token)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    values.append(1.0 + math.log(count))
+        rows = np.array(rows, dtype=np.int64)
+        columns = np.array(columns, dtype=np.int64)
+        values = np.array(values) * self.idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(tweets)))
+        return rows, columns, values / np.maximum(norms[rows], 1e-12), len(tweets)
+
+    @staticmethod
+    def _matmul(features: Tuple, weights: np.ndarray) -> np.ndarray:
+        """Sparse features @ dense weights."""
+        import numpy as np
+
+        rows, columns, values, n_rows = features
+        return np.stack([np.bincount(rows, weights=values * weights[columns, j], minlength=n_rows)
+                         for j in range(weights.shape[1])], axis=1)
+
+    @staticmethod
+    def _rmatmul(features: Tuple, error: np.ndarray, n_columns: int) -> np.ndarray:
+        """Sparse features transposed @ dense per-row errors."""
+        import numpy as np
+
+        rows, columns, values, _ = features
+        return np.stack([np.bincount(columns, weights=values * error[rows, j], minlength=n_columns)
+                         for j in range(error.shape[1])], axis=1)
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        """Row-wise softmax of class logits."""
+        import numpy as np
+
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(self, tweets: Sequence[str], labels: Sequence[str]) -> "SentimentClassifier":
+        """Fit the vocabulary, IDF weights and classifier.
+
+        Args:
+            tweets: Training tweets
+            labels: Sentiment label per tweet
+
+        Returns:
+            The fitted model
+        """
+        import numpy as np
+
+        document_frequency = Counter(token for tweet in tweets for token in set(tokenize(tweet)))
+        kept = sorted(token for token, count in document_frequency.items() if count >= self.min_df)
+        self.vocabulary = {token: i for i, token in enumerate(kept)}
+        n = len(tweets)
+        self.idf = np.array([math.log((1 + n) / (1 + document_frequency[token])) + 1 for token in kept])
+        self.classes = sorted(set(labels))
+        features = self._features(tweets)
+        targets = np.zeros((n, len(self.classes)))
+        targets[np.arange(n), [self.classes.index(label) for label in labels]] = 1.0
+
+        self.weights = np.zeros((len(kept), len(self.classes)))
+        self.bias = np.log(targets.mean(axis=0) + 1e-6)
+        velocity_w = np.zeros_like(self.weights)
+        velocity_b = np.zeros_like(self.bias)
+        for _ in range(self.iterations):
+            error = (self._softmax(self._matmul(features, self.weights) + self.bias) - targets) / n
+            velocity_w = MOMENTUM * velocity_w - LEARNING_RATE * (self._rmatmul(features, error, len(kept)) + self.l2 * self.weights)
+            velocity_b = MOMENTUM * velocity_b - LEARNING_RATE * error.sum(axis=0)
+            self.weights += velocity_w
+            self.bias += velocity_b
+        return self
+
+    def predict_proba(self, tweets: Sequence[str]) -> np.ndarray:
+        """Score tweets in one vectorised pass.
+
+        Args:
+            tweets: Tweets to score
+
+        Returns:
+            Array of shape (len(tweets), len(classes)) with class probabilities
+        """
+        return self._softmax(self._matmul(self._features(tweets), self.weights) + self.bias)
+
+    def predict(self, tweets: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """Predict a label and its confidence for every tweet.
+
+        Args:
+            tweets: Tweets to classify
+
+        Returns:
+            (predicted labels, confidence of each prediction)
+        """
+        probabilities = self.predict_proba(tweets)
+        return [self.classes[i] for i in probabilities.argmax(axis=1)], probabilities.max(axis=1)
+
+def out_of_fold_predictions(tweets: List[str], labels: List[str], folds: int = CV_FOLDS) -> Tuple[List[str], np.ndarray]:
+    """Predict every training tweet with a model that did not see it.
+
+    Args:
+        tweets: Training tweets
+        labels: Sentiment label per tweet
+        folds: Number of cross-validation folds
+
+    Returns:
+        (predicted labels, confidences) aligned with the inputs
+    """
+    import numpy as np
+
+    order = np.random.default_rng(0).permutation(len(tweets))
+    predicted: List[Optional[str]] = [None] * len(tweets)
+    confidence = np.zeros(len(tweets))
+    for fold in range(folds):
+        held_out = order[fold::folds]
+        train = np.setdiff1d(order, held_out)
+        model = SentimentClassifier().fit([tweets[i] for i in train], [labels[i] for i in train])
+        fold_predicted, fold_confidence = model.predict([tweets[i] for i in held_out])
+        for i, label, score in zip(held_out, fold_predicted, fold_confidence):
+            predicted[i] = label
+            confidence[i] = score
+    return predicted, confidence
+
+def calibrate_threshold(confidence: Sequence[float], correct: Sequence[bool], target_accuracy: float) -> float:
+    """Find the lowest confidence threshold whose accepted predictions meet a target accuracy.
+
+    Args:
+        confidence: Confidence of each held-out prediction
+        correct: Whether each prediction was right
+        target_accuracy: Required accuracy over the predictions at or above the threshold
+
+    Returns:
+        Threshold in [0, 1], or infinity if no threshold meets the target, so nothing is accepted
+    """
+    ranked = sorted(zip(confidence, correct), key=lambda pair: -pair[0])
+    threshold = math.inf
+    hits = 0
+    for accepted, (score, is_correct) in enumerate(ranked, start=1):
+        hits += is_correct
+        # Only cut between distinct confidences, so ties are accepted or routed together
+        if hits / accepted >= target_accuracy and (accepted == len(ranked) or ranked[accepted][0] < score):
+            threshold = score
+    return threshold
+
+class Cascade:
+    """A fitted local model with its calibrated acceptance threshold."""
+
+    def __init__(self, model: SentimentClassifier, threshold: float, target_accuracy: float):
+        self.model = model
+        self.threshold = threshold
+        self.target_accuracy = target_accuracy
+
+    def route(self, tweets: Sequence[str]) -> List[Optional[str]]:
+        """Answer the confident tweets locally.
+
+        Args:
+            tweets: Tweets to route
+
+        Returns:
+            The local label for tweets at or above the threshold, None for tweets to send to the LLM
+        """
+        if not tweets:
+            return []
+        predicted, confidence = self.model.predict(tweets)
+        return [label if score >= self.threshold else None for label, score in zip(predicted, confidence)]
+
+def fit_cascade(target_accuracy: float = DEFAULT_TARGET_ACCURACY) -> Cascade:
+    """Fit the local model on the train CSV and calibrate its threshold.
+
+    Args:
+        target_accuracy: Required accuracy of locally accepted tweets on held-out folds
+
+    Returns:
+        Cascade fitted on the whole train set
+    """
+    from evals.utils.data import load_dataset, prepare_rows
+
+    columns = prepare_rows(load_dataset("train"))
+    tweets, labels = columns['tweet'], columns['sentiment']
+    predicted, confidence = out_of_fold_predictions(tweets, labels)
+    threshold = calibrate_threshold(confidence, [p == label for p, label in zip(predicted, labels)], target_accuracy)
+    return Cascade(SentimentClassifier().fit(tweets, labels), threshold, target_accuracy)
+
+def tradeoff_curve(confidence: Sequence[float], local_correct: Sequence[bool], llm_correct: Optional[Sequence[bool]] = None,
+                   llm_latency: Optional[float] = None, thresholds: Sequence[float] = CURVE_THRESHOLDS) -> List[Dict]:
+    """Evaluate the cascade at a range of thresholds.
+
+    Args:
+        confidence: Local confidence per tweet
+        local_correct: Whether the local prediction is right, per tweet
+        llm_correct: Whether the LLM answer is right, per tweet (unknown if None)
+        llm_latency: Mean LLM request latency in seconds (unknown if None)
+        thresholds: Thresholds to evaluate
+
+    Returns:
+        One row per threshold with the routed fraction, accuracy of the local
+        answers, overall cascade accuracy and expected LLM seconds per tweet
+    """
+    rows = []
+    n = max(len(confidence), 1)
+    for threshold in thresholds:
+        accepted = [score >= threshold for score in confidence]
+        n_local = sum(accepted)
+        local_hits = sum(ok for ok, keep in zip(local_correct, accepted) if keep)
+        routed = (len(confidence) - n_local) / n
+        row = {
+            'threshold': threshold,
+            'routed': routed,
+            'local_accuracy': local_hits / n_local if n_local else None,
+            'cascade_accuracy': None,
+            'llm_seconds_per_tweet': routed * llm_latency if llm_latency is not None else None,
+        }
+        if llm_correct is not None:
+            llm_hits = sum(ok for ok, keep in zip(llm_correct, accepted) if not keep)
+            row['cascade_accuracy'] = (local_hits + llm_hits) / n
+        rows.append(row)
+    return rows
+
+def _load_llm_answers(solution_path: str) -> Tuple[Dict[str, str], Optional[float]]:
+    """Read tweet -> LLM sentiment from a sentiment or combined run, plus its mean call latency."""
+    from evals.score import load_solutions, resolve_solution_path
+
+    df = load_solutions([solution_path]).drop_duplicates('tweet')
+    answers = dict(zip(df['tweet'], df['output_sentiment']))
+    latency = None
+    metrics_path = os.path.join(os.path.dirname(resolve_solution_path(solution_path)), "metrics.json")
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            latency = json.load(f)['latency']['mean']
+    return answers, latency
+
+def format_curve(rows: List[Dict], calibrated: float) -> str:
+    """Render the trade-off curve as a fixed-width table, marking the calibrated threshold."""
+    def rate(value):
+        return f"{value:.1%}" if value is not None else "-"
+
+    lines = [f"{'Threshold':>9} {'Routed':>7} {'Local acc':>9} {'Cascade acc':>11} {'LLM s/tweet':>11}"]
+    for row in rows:
+        seconds = f"{row['llm_seconds_per_tweet']:.3f}" if row['llm_seconds_per_tweet'] is not None else "-"
+        marker = "  <- calibrated" if math.isclose(row['threshold'], calibrated) else ""
+        lines.append(f"{row['threshold']:>9.3f} {rate(row['routed']):>7} {rate(row['local_accuracy']):>9} "
+                     f"{rate(row['cascade_accuracy']):>11} {seconds:>11}{marker}")
+    return "\n".join(lines)
+
+def main():
+    """Report the cascade's routed fraction and accuracy/latency trade-off on the test set."""
+    from evals.utils.data import load_dataset, prepare_rows
+
+    parser = argparse.ArgumentParser(description="Evaluate the local sentiment cascade on the test set.")
+    parser.add_argument("--target_accuracy", type=float, default=DEFAULT_TARGET_ACCURACY,
+                        help=f"Accuracy the calibrated threshold must reach on held-out train folds (default: {DEFAULT_TARGET_ACCURACY})")
+    parser.add_argument("--solution", default=None, help="Run directory or solution.jsonl of an LLM sentiment or combined run on the test set")
+    parser.add_argument("--output", default=None, help="Save the curve as JSON to this path")
+    args = parser.parse_args()
+
+    cascade = fit_cascade(args.target_accuracy)
+    columns = prepare_rows(load_dataset("test"))
+    tweets, labels = columns['tweet'], columns['sentiment']
+    predicted, confidence = cascade.model.predict(tweets)
+    local_correct = [p == label for p, label in zip(predicted, labels)]
+
+    llm_correct = llm_latency = None
+    if args.solution:
+        answers, llm_latency = _load_llm_answers(args.solution)
+        missing = sum(tweet not in answers for tweet in tweets)
+        if missing:
+            print(f"Note: {missing}/{len(tweets)} test tweets are not in {args.solution}; they count as LLM errors")
+        llm_correct = [answers.get(tweet) == label for tweet, label in zip(tweets, labels)]
+        print(f"LLM alone: accuracy {sum(llm_correct) / len(tweets):.1%}"
+              + (f" | mean call latency {llm_latency:.2f}s" if llm_latency is not None else ""))
+
+    calibrated = min(cascade.threshold, 1.0)
+    thresholds = sorted([t for t in CURVE_THRESHOLDS if not math.isclose(t, calibrated, abs_tol=5e-4)] + [calibrated])
+    rows = tradeoff_curve(confidence, local_correct, llm_correct, llm_latency, thresholds)
+    accepted = sum(score >= cascade.threshold for score in confidence)
+    print(f"Calibrated threshold {cascade.threshold:.3f} (target accuracy {args.target_accuracy:.1%} on held-out train folds): "
+          f"{accepted}/{len(tweets)} test tweets answered locally, {1 - accepted / len(tweets):.1%} routed to the LLM")
+    print(format_curve(rows, calibrated))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'threshold': cascade.threshold, 'target_accuracy': args.target_accuracy, 'curve': rows}, f, indent=2)
+        print(f"Saved curve to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Checkpointing utilities for resumable experiment runs.
+
+This module provides a crash-safe writer for solution.jsonl files and helpers
+for reading back which records a previous, interrupted run already completed.
+"""
+
+import json
+import os
+from typing import Optional, Set, Tuple
+
+def repair_jsonl(path: str) -> int:
+    """Truncate a JSONL file after its last complete, valid line.
+    
+    A crash in the middle of a write can leave a torn trailing line; removing
+    it lets the file be appended to safely.
+    
+    Args:
+        path: Path to the JSONL file
+        
+    Returns:
+        Number of bytes removed from the end of the file
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        # The last newline-terminated line can still be garbage if the crash hit mid-flush
+        while end > 0:
+            start = data.rfind(b'\n', 0, end - 1) + 1
+            try:
+                json.loads(data[start:end])
+                break
+            except ValueError:
+                end = start
+        removed = len(data) - end
+        if removed:
+            f.truncate(end)
+    return removed
+
+def record_key(record_id, airline: Optional[str] = None) -> Tuple:
+    """Build the completion key for a solution record.
+    
+    Args:
+        record_id: Dataset row id of the tweet
+        airline: Airline the record is about (sentiment experiments only)
+        
+    Returns:
+        Hashable key identifying the unit of work
+    """
+    return (record_id, airline)
+
+def load_completed(path: str) -> Set[Tuple]:
+    """Read the keys of all records already written to a solution file.
+    
+    Args:
+        path: Path to solution.jsonl
+        
+    Returns:
+        Set of (row id, airline) keys; airline is None for non-sentiment records
+    """
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    repair_jsonl(path)
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if 'id' not in record:
+                continue
+            airline = record['input'].get('airline') if isinstance(record['input'], dict) else None
+            completed.add(record_key(record['id'], airline))
+    return completed
+
+class CheckpointWriter:
+    """File-like writer that flushes and fsyncs complete lines in batches.
+    
+    Every `sync_every` complete lines the buffered output is flushed and synced
+    to disk, so an interrupted run loses at most one batch and never leaves a
+    half-written record behind that repair_jsonl cannot remove.
+    """
+
+    def __init__(self, path: str, append: bool = False, sync_every: int = 20):
+        """Open the solution file.
+        
+        Args:
+            path: Path to solution.jsonl
+            append: Append to an existing (repaired) file instead of truncating it
+            sync_every: Number of complete lines between fsyncs
+        """
+        if append:
+            repair_jsonl(path)
+        self._f = open(path, 'a' if append else 'w')
+        self.sync_every = sync_every
+        self._unsynced = 0
+
+    def write(self, text: str):
+        """Write text, syncing once enough complete lines have accumulated.
+        
+        Args:
+            text: Text to write (normally one full JSON line)
+        """
+        self._f.write(text)
+        self._unsynced += text.count('\n')
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """Flush buffered lines and fsync them to disk."""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        """Sync any remaining lines and close the file."""
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,17 +1,106 @@
 """Utility functions for data loading and processing.
 
 This module provides functions for:
-- Loading and sampling datasets
+- Loading and sampling datasets (with a cached, pre-parsed copy of each CSV)
+- Reading large CSV/JSONL tweet archives in fixed-size chunks, with
+  single-pass reservoir sampling, in memory bounded by the chunk or sample size
+- Preparing dataset rows as compact columns for the experiment runners
+- Deterministically partitioning dataset rows into shards
 - Extracting true airline mentions from data
 - Creating output directories for experiments
+- Saving and loading run configurations and summaries
 - Writing experiment results to files
 """
 
-import pandas as pd
+from __future__ import annotations
+
+import ast
+import csv
+import functools
+import gzip
+import hashlib
+import itertools
 import json
+import math
 import os
+import pickle
+import random
 from datetime import datetime
-from typing import Any
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DATASET_CACHE_DIR = "evals/cache/datasets"
+DATASET_COLUMNS = ('id', 'tweet', 'airlines', 'sentiment')
+# Seed for sampling, shared by DataFrame.sample and reservoir sampling of archives
+SAMPLE_SEED = 42
+ARCHIVE_CHUNK_SIZE = 10000
+
+# What the experiment runners accept: a DataFrame from load_dataset, or chunks of
+# prepared columns (an Archive)
+Dataset = Union["pd.DataFrame", Iterable[Dict[str, list]]]
+
+def parse_airlines(value: Any) -> List[str]:
+    """Parse the string representation of an airline list (e.g. "['United Airlines']").
+    
+    Args:
+        value: Raw value of the 'airlines' column, or an already parsed list
+        
+    Returns:
+        List of airline names
+    """
+    if isinstance(value, list):
+        return value
+    return list(_parse_airlines_text(str(value)))
+
+@functools.lru_cache(maxsize=4096)
+def _parse_airlines_text(value: str) -> Tuple[str, ...]:
+    """Parse an airlines string; archives repeat a few distinct values, so results are cached."""
+    try:
+        parsed = ast.literal_eval(value)
+        if isinstance(parsed, (list, tuple)):
+            return tuple(str(a).strip() for a in parsed if str(a).strip())
+    except (ValueError, SyntaxError, TypeError):
+        pass
+    return tuple(a.strip() for a in value.replace('[','').replace(']','').replace("'","").split(',') if a.strip())
+
+def _read_prepared_csv(csv_path: str) -> pd.DataFrame:
+    """Read a dataset CSV with the airlines column parsed into lists.
+    
+    The prepared DataFrame is pickled under DATASET_CACHE_DIR, keyed on the
+    CSV's modification time and size, so later loads skip CSV parsing.
+    
+    Args:
+        csv_path: Path to the dataset CSV
+        
+    Returns:
+        DataFrame whose 'airlines' column holds Python lists
+    """
+    stat = os.stat(csv_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cache_path = os.path.join(DATASET_CACHE_DIR, os.path.basename(csv_path) + ".pkl")
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['signature'] == signature:
+            return cached['df']
+    except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+        pass
+
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df['airlines'] = df['airlines'].map(parse_airlines)
+    try:
+        os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'signature': signature, 'df': df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return df
 
 def load_dataset(dataset_type: str, n_samples: int = None) -> pd.DataFrame:
     """Load the airline sentiment dataset.
@@ -21,25 +110,268 @@ def load_dataset(dataset_type: str, n_samples: int = None) -> pd.DataFrame:
         n_samples: Optional number of samples to load. If None, loads entire dataset.
         
     Returns:
-        DataFrame containing the dataset
+        DataFrame containing the dataset, with the 'airlines' column parsed into lists
     """
-    df = pd.read_csv(f"data/airline_{dataset_type}_sentiment.csv")
+    df = _read_prepared_csv(f"data/airline_{dataset_type}_sentiment.csv")
     if n_samples is not None:
-        df = df.sample(n=n_samples, random_state=42)
+        df = df.sample(n=n_samples, random_state=SAMPLE_SEED)
     return df
 
+def iter_archive_records(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Stream the raw records of a CSV or JSONL tweet archive.
+    
+    The format follows the file extension (.csv, otherwise JSONL), optionally
+    gzip-compressed (.gz). Records need a 'tweet' (or 'text') field and may have
+    'id', 'airlines' and 'sentiment'; airlines are parsed later, only for the
+    rows that are kept.
+    
+    Args:
+        path: Path to the archive
+        
+    Yields:
+        (position, record) with the 0-based position of the record in the file
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if name.lower().endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        yield from enumerate(records)
+
+_END = object()
+
+def reservoir_sample(records: Iterable, k: int, seed: int = SAMPLE_SEED) -> List:
+    """Draw a uniform sample of k items from a stream in one pass.
+    
+    Uses Algorithm L, which jumps over runs of items that are not selected,
+    so the random number generator is called O(k log(n/k)) times rather than
+    once per item. The sample only depends on the seed and the order of the
+    stream.
+    
+    Args:
+        records: Stream to sample
+        k: Sample size
+        seed: Random seed
+        
+    Returns:
+        The sampled items in stream order (all of them if the stream is shorter than k)
+    """
+    if k <= 0:
+        return []
+    rng = random.Random(seed)
+    records = iter(records)
+    reservoir = [(position, record) for position, record in zip(range(k), records)]
+    if len(reservoir) < k:
+        return [record for _, record in reservoir]
+    # 1 - random() is in (0, 1], so the logarithms are finite
+    weight = math.exp(math.log(1.0 - rng.random()) / k)
+    position = k - 1
+    while True:
+        skip = math.floor(math.log(1.0 - rng.random()) / math.log(1.0 - weight)) if weight < 1.0 else 0
+        record = next(itertools.islice(records, skip, None), _END)
+        if record is _END:
+            break
+        position += skip + 1
+        reservoir[rng.randrange(k)] = (position, record)
+        weight *= math.exp(math.log(1.0 - rng.random()) / k)
+    return [record for _, record in sorted(reservoir, key=lambda entry: entry[0])]
+
+def _record_id(position: int, record: Dict[str, Any]) -> Any:
+    """Row id of an archive record: its 'id' field, or its position in the file."""
+    row_id = record.get('id')
+    return position if row_id in (None, "") else row_id
+
+def prepare_records(records: Iterable[Tuple[int, Dict[str, Any]]]) -> Dict[str, list]:
+    """Convert raw archive records into the columns of prepare_rows.
+    
+    Args:
+        records: (position, record) pairs from iter_archive_records
+        
+    Returns:
+        Columns as from prepare_rows; a record without an 'id' gets its position
+        (the DataFrame index of the bundled CSVs), missing airlines are an empty
+        list and a missing sentiment is None
+    """
+    columns = {name: [] for name in DATASET_COLUMNS}
+    for position, record in records:
+        columns['id'].append(_record_id(position, record))
+        columns['tweet'].append(record.get('tweet') or record.get('text') or "")
+        airlines = record.get('airlines')
+        columns['airlines'].append(parse_airlines(airlines) if airlines not in (None, "") else [])
+        columns['sentiment'].append(record.get('sentiment') or None)
+    return columns
+
+class Archive:
+    """A tweet archive read as chunks of prepared columns.
+    
+    Iterating yields dictionaries shaped like prepare_rows' output with at most
+    chunk_size rows each, so peak memory depends on the chunk size (or on
+    n_samples when sampling), not on the size of the archive. The archive can be
+    iterated more than once; a sample is drawn on the first pass and kept.
+    """
+    
+    def __init__(self, path: str, n_samples: Optional[int] = None, chunk_size: int = ARCHIVE_CHUNK_SIZE,
+                 shard: Optional[Tuple[int, int]] = None, seed: int = SAMPLE_SEED):
+        """Describe an archive without reading it.
+        
+        Args:
+            path: CSV or JSONL archive, optionally gzip-compressed
+            n_samples: If set, reservoir-sample this many rows (kept in file order)
+            chunk_size: Maximum rows per chunk
+            shard: (index, count) to keep one shard of the (sampled) rows
+            seed: Random seed for sampling
+        """
+        self.path = path
+        self.n_samples = n_samples
+        self.chunk_size = max(1, chunk_size)
+        self.shard = shard
+        self.seed = seed
+        self._sample = None
+        self._length = None
+
+    def _records(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        if self.n_samples is None:
+            records = iter_archive_records(self.path)
+        else:
+            if self._sample is None:
+                self._sample = reservoir_sample(iter_archive_records(self.path), self.n_samples, self.seed)
+            records = iter(self._sample)
+        if self.shard is not None:
+            index, count = self.shard
+            records = (record for record in records if shard_of(_record_id(*record), count) == index)
+        return records
+
+    def __iter__(self) -> Iterator[Dict[str, list]]:
+        records = self._records()
+        while True:
+            chunk = list(itertools.islice(records, self.chunk_size))
+            if not chunk:
+                return
+            yield prepare_records(chunk)
+
+    def __len__(self) -> int:
+        """Number of rows, counted with one streaming pass unless a sample is already in memory."""
+        if self._length is None:
+            self._length = sum(1 for _ in self._records())
+        return self._length
+
+def row_chunks(data: Dataset, n_samples: Optional[int] = None) -> Iterator[Dict[str, list]]:
+    """Prepared columns of the first n_samples rows of a dataset, chunk by chunk.
+    
+    Args:
+        data: DataFrame from load_dataset (one chunk) or an iterable of prepared
+            column chunks such as an Archive
+        n_samples: Maximum number of rows (default: all)
+        
+    Yields:
+        Column dictionaries as from prepare_rows
+    """
+    if hasattr(data, 'iloc'):
+        yield prepare_rows(data.iloc[:n_samples])
+        return
+    remaining = n_samples
+    for columns in data:
+        if remaining is not None:
+            if remaining <= 0:
+                return
+            columns = {name: values[:remaining] for name, values in columns.items()}
+            remaining -= len(columns['id'])
+        yield columns
+
+def prepare_rows(df: pd.DataFrame) -> Dict[str, list]:
+    """Convert a dataset DataFrame into plain Python columns.
+    
+    Args:
+        df: DataFrame from load_dataset
+        
+    Returns:
+        Dictionary of equal-length lists: 'id' (row index), 'tweet', 'airlines', 'sentiment'
+    """
+    return {
+        'id': [int(row_id) for row_id in df.index],
+        'tweet': df['tweet'].tolist(),
+        'airlines': [parse_airlines(value) for value in df['airlines'].tolist()],
+        'sentiment': df['sentiment'].tolist(),
+    }
+
+def iter_rows(columns: Dict[str, list]) -> Iterator[Dict[str, Any]]:
+    """Iterate prepared columns as lightweight row dictionaries.
+    
+    Args:
+        columns: Columns from prepare_rows
+        
+    Yields:
+        Row dictionaries with 'id', 'tweet', 'airlines' and 'sentiment'
+    """
+    for values in zip(*(columns[name] for name in DATASET_COLUMNS)):
+        yield dict(zip(DATASET_COLUMNS, values))
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse a shard spec such as '0/4'.
+    
+    Args:
+        spec: 'i/N' with 0 <= i < N
+        
+    Returns:
+        (shard index, shard count)
+        
+    Raises:
+        ValueError: If the spec is malformed or out of range
+    """
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got '{spec}'")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be in 0..{count - 1}, got '{spec}'")
+    return index, count
+
+def shard_of(row_id: Any, n_shards: int) -> int:
+    """Assign a dataset row to a shard by a stable hash of its id.
+    
+    The hash does not depend on the process, machine or Python version, so
+    every worker agrees on the partition.
+    
+    Args:
+        row_id: Dataset row id
+        n_shards: Number of shards
+        
+    Returns:
+        Shard index in 0..n_shards-1
+    """
+    digest = hashlib.blake2b(str(row_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % n_shards
+
+def select_shard(df: pd.DataFrame, index: int, count: int) -> pd.DataFrame:
+    """Keep the rows of a dataset that belong to one shard, in their original order.
+    
+    Args:
+        df: DataFrame from load_dataset
+        index: Shard index
+        count: Number of shards
+        
+    Returns:
+        The shard's rows
+    """
+    return df[[shard_of(row_id, count) == index for row_id in df.index]]
+
 def get_true_airlines(row: pd.Series) -> list:
     """Extract true airlines from a dataset row.
     
     Args:
-        row: DataFrame row containing airline mentions
+        row: DataFrame row or prepared row dictionary containing airline mentions
         
     Returns:
         List of airline names mentioned in the row
     """
+    if isinstance(row['airlines'], list):
+        return row['airlines']
     return [a.strip() for a in row['airlines'].replace('[','').replace(']','').replace("'","").split(',') if a.strip()]
 
-def create_output_dir(experiment: str, n_samples: int, batch_size: int, is_test: bool) -> str:
+def create_output_dir(experiment: str, n_samples: int, batch_size: int, is_test: bool,
+                      results_dir: str = "evals/results", shard: Optional[Tuple[int, int]] = None) -> str:
     """Create and return the output directory path for experiment results.
     
     Args:
@@ -47,6 +379,8 @@ def create_output_dir(experiment: str, n_samples: int, batch_size: int, is_test:
         n_samples: Number of samples being processed
         batch_size: Size of batches being processed
         is_test: Whether using test dataset
+        results_dir: Parent directory for experiment output directories
+        shard: (index, count) when the run processes one shard of the dataset
         
     Returns:
         Path to created output directory
@@ -60,11 +394,44 @@ def create_output_dir(experiment: str, n_samples: int, batch_size: int, is_test:
         name = "train_full" if n_samples is None else experiment
     
     batch_suffix = f"_batch_{batch_size}" if batch_size > 1 else ""
-    output_dir = f"evals/results/{prefix}{name}{batch_suffix}_{timestamp}"
+    shard_suffix = f"_shard_{shard[0]}of{shard[1]}" if shard else ""
+    output_dir = os.path.join(results_dir, f"{prefix}{name}{batch_suffix}{shard_suffix}_{timestamp}")
     os.makedirs(output_dir, exist_ok=True)
     return output_dir
 
-def write_result(f, input_data: Any, ideal: Any, output: Any):
+def save_run_config(output_dir: str, config: dict):
+    """Save the parameters of a run so it can be resumed later.
+    
+    Args:
+        output_dir: Experiment output directory
+        config: JSON-serializable run parameters
+    """
+    with open(os.path.join(output_dir, "config.json"), 'w') as f:
+        json.dump(config, f, indent=2)
+
+def load_run_config(output_dir: str) -> dict:
+    """Load the parameters saved by save_run_config.
+    
+    Args:
+        output_dir: Experiment output directory
+        
+    Returns:
+        Run parameters dictionary
+    """
+    with open(os.path.join(output_dir, "config.json")) as f:
+        return json.load(f)
+
+def write_run_summary(output_dir: str, summary: dict):
+    """Save the end-of-run summary (throughput, latency, routing counters).
+    
+    Args:
+        output_dir: Experiment output directory
+        summary: JSON-serializable summary dictionary
+    """
+    with open(os.path.join(output_dir, "summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+def write_result(f, input_data: Any, ideal: Any, output: Any, record_id: Any = None):
     """Write a single experiment result to the output file.
     
     Args:
@@ -72,9 +439,13 @@ def write_result(f, input_data: Any, ideal: Any, output: Any):
         input_data: Input data for the experiment
         ideal: Ground truth/expected output
         output: Actual output from the experiment
+        record_id: Optional dataset row id, used to resume interrupted runs
     """
-    f.write(json.dumps({
+    record = {
         'input': input_data,
         'ideal': ideal,
         'output': output
-    }) + '\n') 
\ No newline at end of file
+    }
+    if record_id is not None:
+        record['id'] = record_id
+    f.write(json.dumps(record) + '\n') 
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""Near-duplicate tweet grouping for request deduplication.
+
+This module provides functions for:
+- Normalising tweet text (case, whitespace, URLs, retweet prefixes, punctuation)
+- Grouping exact and near-duplicate texts with MinHash signatures, LSH
+  banding and a Jaccard similarity threshold on word shingles
+
+Grouped tweets share one model call; the caller decides what must also match
+(e.g. the airlines mentioned) for a shared answer to be valid.
+"""
+
+import functools
+import hashlib
+import re
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+DEFAULT_DEDUP_THRESHOLD = 0.9
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 2
+
+_PRIME = (1 << 31) - 1
+
+_URL = re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE)
+_RETWEET = re.compile(r"^\s*(?:rt|mt)\s+@\w+:?\s*", re.IGNORECASE)
+_HANDLE = re.compile(r"@\w+")
+_PUNCTUATION = re.compile(r"[^\w@#\s]")
+
+def normalize_tweet_text(text: str, mask_handles: bool = False) -> str:
+    """Normalise a tweet for duplicate detection.
+
+    Args:
+        text: Tweet text
+        mask_handles: Replace every @handle with '@user' so the same text sent
+            to different airlines compares equal
+
+    Returns:
+        Lowercased text without URLs, retweet prefixes or punctuation, with
+        whitespace collapsed
+    """
+    text = _RETWEET.sub("", _URL.sub(" ", str(text)))
+    text = text.lower()
+    if mask_handles:
+        text = _HANDLE.sub("@user", text)
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+def _shingles(text: str) -> set:
+    """Word shingles of a normalised text (the whole text if it is shorter)."""
+    words = text.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {text}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+@functools.lru_cache(maxsize=None)
+def _permutations() -> Tuple:
+    """Seeded MinHash permutation coefficients, built on first use so numpy loads only when needed."""
+    import numpy as np
+
+    rng = np.random.default_rng(42)
+    return (rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)[:, None],
+            rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)[:, None])
+
+def _minhash(shingles: set):
+    """MinHash signature of a shingle set."""
+    import numpy as np
+
+    perm_a, perm_b = _permutations()
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big") & _PRIME
+                       for s in shingles], dtype=np.int64)
+    return ((perm_a * hashes[None, :] + perm_b) % _PRIME).min(axis=1)
+
+def group_duplicates(texts: Sequence[str], threshold: float = DEFAULT_DEDUP_THRESHOLD,
+                     signatures: Optional[Sequence[Hashable]] = None) -> List[int]:
+    """Assign every text to the first text of its duplicate group.
+
+    Texts are compared as given, so normalise them first. Equal texts always
+    group; with threshold < 1, texts whose word-shingle Jaccard similarity is
+    at least the threshold group too. Candidates come from MinHash LSH and are
+    verified against the exact Jaccard similarity.
+
+    Args:
+        texts: Normalised texts
+        threshold: Minimum Jaccard similarity for near duplicates (1.0 for exact only)
+        signatures: Optional per-text values that must be equal for texts to group
+
+    Returns:
+        For each text, the index of its group's representative (the earliest member)
+    """
+    signatures = signatures if signatures is not None else [None] * len(texts)
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    first: Dict = {}
+    for i, key in enumerate(zip(texts, signatures)):
+        if key in first:
+            union(first[key], i)
+        else:
+            first[key] = i
+
+    if threshold < 1.0:
+        unique = sorted(first.values())
+        shingles = {i: _shingles(texts[i]) for i in unique}
+        rows = NUM_PERMUTATIONS // LSH_BANDS
+        buckets: Dict = {}
+        for i in unique:
+            signature = _minhash(shingles[i])
+            for band in range(LSH_BANDS):
+                buckets.setdefault((band, signatures[i], signature[band * rows:(band + 1) * rows].tobytes()), []).append(i)
+        checked = set()
+        for members in buckets.values():
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    pair = (members[a], members[b])
+                    if pair in checked:
+                        continue
+                    checked.add(pair)
+                    left, right = shingles[pair[0]], shingles[pair[1]]
+                    if len(left & right) >= threshold * len(left | right):
+                        union(*pair)
+
+    return [find(i) for i in range(len(texts))]
+
+def group_tweets(tweets: Sequence[str], threshold: float = DEFAULT_DEDUP_THRESHOLD,
+                 signatures: Optional[Sequence[Hashable]] = None, mask_handles: bool = False) -> List[int]:
+    """Normalise tweets and group the ones that can share one answer.
+
+    Args:
+        tweets: Raw tweet texts
+        threshold: Minimum Jaccard similarity for near duplicates (1.0 for exact only)
+        signatures: Optional per-tweet values that must be equal for tweets to group
+        mask_handles: Treat tweets that differ only in their @handles as duplicates
+
+    Returns:
+        For each tweet, the index of its group's representative
+    """
+    return group_duplicates([normalize_tweet_text(tweet, mask_handles) for tweet in tweets], threshold, signatures)
@@ -0,0 +1,176 @@
+"""Local airline entity matcher for resolving unambiguous tweets without the LLM.
+
+This module provides a compiled alias matcher over airline handles, hashtags and
+name variants that maps mentions to the official names used by
+prompt_entity_v2_standardized. Tweets whose mentions are all unambiguous are
+resolved locally; anything else is left for the model.
+
+Run as a script to measure coverage and agreement against a dataset's labels
+and, optionally, against an earlier LLM entity run:
+
+    python -m evals.utils.entity_matcher --solution evals/results/<run>/solution.jsonl
+"""
+
+import argparse
+import json
+import re
+from typing import Dict, List, Optional
+
+# Official name -> (strong aliases, weak aliases). Strong aliases are handles,
+# hashtags and distinctive name forms; weak aliases are ordinary words that are
+# only trusted at the very start of a tweet, where they address the airline.
+AIRLINE_ALIASES = {
+    "American Airlines": (
+        ["@americanair", "#americanair", "#americanairlines", "americanair", "american airlines", "american air", "#aa"],
+        ["american", "aa"],
+    ),
+    "United Airlines": (
+        ["@united", "#united", "#unitedairlines", "unitedairlines", "united airlines", "united air"],
+        ["united"],
+    ),
+    "Southwest Airlines": (
+        ["@southwestair", "#southwestair", "#southwestairlines", "#southwest", "southwestair", "southwest airlines",
+         "southwest air"],
+        ["southwest"],
+    ),
+    "US Airways": (
+        ["@usairways", "@usair", "#usairways", "usairways", "us airways", "us air"],
+        [],
+    ),
+    "JetBlue Airways": (
+        ["@jetblue", "#jetblue", "jetblue", "jet blue", "jetblue airways"],
+        [],
+    ),
+    "Virgin America": (
+        ["@virginamerica", "#virginamerica", "virginamerica", "virgin america"],
+        ["virgin"],
+    ),
+    "Delta Air Lines": (
+        ["@delta", "#delta", "#deltaairlines", "delta air lines", "delta airlines"],
+        ["delta"],
+    ),
+    "Air Canada": (
+        ["@aircanada", "#aircanada", "aircanada", "air canada"],
+        [],
+    ),
+}
+
+# Words that turn a weak alias into something other than an airline ("United States")
+_NOT_AIRLINE_FOLLOWERS = r"states|kingdom|nations|way|center|express|eagle"
+
+def _build_pattern() -> re.Pattern:
+    """Compile every alias into a single case-insensitive alternation.
+
+    Longer aliases are listed first so "united airlines" wins over "united".
+
+    Returns:
+        Compiled pattern with one named-free group per match
+    """
+    aliases = set()
+    for strong, weak in AIRLINE_ALIASES.values():
+        aliases.update(strong)
+        aliases.update(weak)
+    alternation = "|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True))
+    return re.compile(rf"(?<![\w@#])({alternation})(?![\w])(?!\s+(?:{_NOT_AIRLINE_FOLLOWERS})\b)", re.IGNORECASE)
+
+_PATTERN = _build_pattern()
+_ALIAS_TO_AIRLINE: Dict[str, tuple] = {}
+for _airline, (_strong, _weak) in AIRLINE_ALIASES.items():
+    for _alias in _strong:
+        _ALIAS_TO_AIRLINE[_alias] = (_airline, True)
+    for _alias in _weak:
+        _ALIAS_TO_AIRLINE[_alias] = (_airline, False)
+
+_NAME_LOOKUP = {re.sub(r"[^a-z]", "", alias): airline
+                for alias, (airline, _) in _ALIAS_TO_AIRLINE.items()}
+_NAME_LOOKUP.update({re.sub(r"[^a-z]", "", airline.lower()): airline for airline in AIRLINE_ALIASES})
+
+def normalize_airline(name: str) -> str:
+    """Map an airline name variant to its official name.
+
+    Args:
+        name: Airline name as written by a model or a label (e.g. "American Air")
+
+    Returns:
+        The official name if the variant is known, otherwise the stripped input
+    """
+    key = re.sub(r"[^a-z]", "", str(name).lower())
+    return _NAME_LOOKUP.get(key, str(name).strip())
+
+def match_airlines(tweet: str) -> Optional[List[str]]:
+    """Resolve the airlines mentioned in a tweet if the mentions are unambiguous.
+
+    A tweet is confident when it has at least one strong mention and every
+    weak mention refers to an airline that is also strongly mentioned. A weak
+    alias at the start of the tweet ("United thanks for...") counts as strong.
+
+    Args:
+        tweet: The tweet to analyze
+
+    Returns:
+        Official airline names in order of first mention, or None if the tweet
+        should be sent to the model
+    """
+    strong = []
+    weak = []
+    for match in _PATTERN.finditer(tweet):
+        airline, is_strong = _ALIAS_TO_AIRLINE[match.group(1).lower()]
+        if is_strong or not tweet[:match.start()].strip():
+            if airline not in strong:
+                strong.append(airline)
+        else:
+            weak.append(airline)
+    if not strong or any(airline not in strong for airline in weak):
+        return None
+    return strong
+
+def mentioned_airlines(tweet: str) -> List[str]:
+    """List every airline an alias in the tweet could refer to, strong or weak.
+
+    Args:
+        tweet: The tweet to analyze
+
+    Returns:
+        Official airline names in order of first mention
+    """
+    airlines = []
+    for match in _PATTERN.finditer(tweet):
+        airline = _ALIAS_TO_AIRLINE[match.group(1).lower()][0]
+        if airline not in airlines:
+            airlines.append(airline)
+    return airlines
+
+def main():
+    """Report fast-path coverage and agreement with labels and an LLM run."""
+    # Deferred so the matcher itself stays free of heavy dependencies
+    from evals.utils.data import load_dataset, get_true_airlines
+
+    parser = argparse.ArgumentParser(description="Evaluate the local airline entity matcher.")
+    parser.add_argument("--test", action="store_true", help="Use test dataset instead of train dataset")
+    parser.add_argument("--solution", default=None, help="solution.jsonl from an LLM entity run to compare against")
+    args = parser.parse_args()
+
+    df = load_dataset("test" if args.test else "train")
+    confident = agree = 0
+    for _, row in df.iterrows():
+        matched = match_airlines(row['tweet'])
+        if matched is not None:
+            confident += 1
+            agree += set(matched) == set(get_true_airlines(row))
+    print(f"Resolved locally: {confident}/{len(df)} tweets ({confident / len(df):.1%} of calls avoided)")
+    print(f"Agreement with labels on resolved tweets: {agree}/{confident} ({agree / max(confident, 1):.1%})")
+
+    if args.solution:
+        compared = llm_agree = 0
+        with open(args.solution) as f:
+            for line in f:
+                record = json.loads(line)
+                matched = match_airlines(record['input'])
+                if matched is None:
+                    continue
+                compared += 1
+                llm_agree += set(matched) == {normalize_airline(name) for name in record['output']}
+        print(f"Agreement with LLM on resolved tweets: {llm_agree}/{compared} ({llm_agree / max(compared, 1):.1%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Concurrent execution utilities for experiment runs.
+
+This module provides an asyncio-based executor that keeps a configurable number
+of API requests in flight while handing results back in submission order, so
+output files stay aligned with the original dataset rows.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from evals.utils.api import call_api_async
+from evals.utils.metrics import set_call_tags
+
+_held_slots: contextvars.ContextVar = contextvars.ContextVar("held_slots", default=None)
+
+def held_slots() -> Optional[asyncio.Semaphore]:
+    """Semaphore capping requests in flight whose slot the current job holds.
+    
+    Returns:
+        The semaphore inside a run_jobs worker, None outside of one
+    """
+    return _held_slots.get()
+
+async def call_prompt(job: Dict) -> str:
+    """Default job processor: send the job's prompt to the model.
+    
+    Args:
+        job: Job dictionary containing 'prompt' and optionally 'max_tokens'
+        
+    Returns:
+        The model's response as a string
+    """
+    return await call_api_async(job['prompt'], max_tokens=job.get('max_tokens', 150))
+
+async def run_jobs(jobs: Iterable[Dict], handle: Callable[[Dict, Any], None], concurrency: int = 1,
+                   process: Optional[Callable[[Dict], Awaitable[Any]]] = None,
+                   slots: Optional[asyncio.Semaphore] = None) -> Dict:
+    """Process jobs concurrently and hand each result to a callback in order.
+    
+    Jobs are pulled lazily from the iterable, at most `concurrency` are awaiting
+    the API at any time, and `handle` is always called in the order the jobs
+    were produced regardless of which request finishes first. Jobs carrying the
+    same 'dedup' value share the first such job's result instead of being processed
+    (keys are only remembered until a job with a different 'dedup_scope' arrives,
+    so a run over many archive chunks holds one chunk's keys at a time),
+    and jobs carrying a 'response' (answered locally) are handed back as-is without
+    taking a slot or counting as a request.
+    
+    Args:
+        jobs: Iterable of job dictionaries (each holds a 'prompt' for the default processor)
+        handle: Callback receiving (job, result) in submission order
+        concurrency: Maximum number of requests in flight
+        process: Coroutine function turning a job into a result (default: call the API)
+        slots: Semaphore shared with other concurrent runs; it caps requests in flight
+            across all of them, and `concurrency` only sizes this run's lookahead
+        
+    Returns:
+        Dictionary with job, request, deduplicated and local job counts, elapsed
+        time, throughput and per-request latencies
+    """
+    process = process or call_prompt
+    concurrency = max(1, concurrency)
+    semaphore = slots or asyncio.Semaphore(concurrency)
+    max_pending = concurrency * 4
+    pending = deque()
+    latencies = []
+    shared = {}
+    scope = None
+    counts = {'jobs': 0, 'deduplicated': 0, 'local': 0}
+    start_time = time.perf_counter()
+
+    async def worker(job: Dict) -> Any:
+        # Each worker runs in its own task, so the tag covers only this job's calls
+        set_call_tags(job=job.get('key'))
+        async with semaphore:
+            # Lets the process hook send follow-up requests (batch retries) within the same cap
+            _held_slots.set(semaphore)
+            started = time.perf_counter()
+            result = await process(job)
+            latencies.append(time.perf_counter() - started)
+            return result
+
+    async def emit_next():
+        job, task = pending.popleft()
+        handle(job, await task)
+
+    try:
+        for job in jobs:
+            counts['jobs'] += 1
+            dedup = job.get('dedup')
+            if dedup is not None and job.get('dedup_scope') != scope:
+                # Keys never span scopes: forget the previous scope's tasks (pending ones stay queued)
+                shared.clear()
+                scope = job.get('dedup_scope')
+            if 'response' in job:
+                # Answered without the model: kept out of the request and latency accounting
+                counts['local'] += 1
+                task = asyncio.get_running_loop().create_future()
+                task.set_result(job['response'])
+            elif dedup is not None and dedup in shared:
+                # Duplicates reuse the representative's task: no request, no concurrency slot
+                counts['deduplicated'] += 1
+                task = shared[dedup]
+            else:
+                task = asyncio.ensure_future(worker(job))
+                if dedup is not None:
+                    shared[dedup] = task
+            pending.append((job, task))
+            while len(pending) >= max_pending or (pending and pending[0][1].done()):
+                await emit_next()
+        while pending:
+            await emit_next()
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        **counts,
+        'requests': len(latencies),
+        'elapsed': elapsed,
+        'requests_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latencies': latencies,
+    }
+
+def execute_jobs(jobs: Iterable[Dict], handle: Callable[[Dict, Any], None], concurrency: int = 1,
+                 process: Optional[Callable[[Dict], Awaitable[Any]]] = None) -> Dict:
+    """Synchronous entry point for run_jobs.
+    
+    Args:
+        jobs: Iterable of job dictionaries
+        handle: Callback receiving (job, result) in submission order
+        concurrency: Maximum number of requests in flight
+        process: Coroutine function turning a job into a result (default: call the API)
+        
+    Returns:
+        Run statistics as returned by run_jobs
+    """
+    return asyncio.run(run_jobs(jobs, handle, concurrency, process))
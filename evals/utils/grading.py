@@ -0,0 +1,143 @@
+"""Grader template utilities.
+
+This module provides functions for:
+- Loading the grader prompts in evals/graders/ by task
+- Rendering a grader prompt for one solution.jsonl record or a numbered batch of them
+- Parsing PASS / INFERRED PASS / FAIL verdicts from grader responses
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+GRADERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "graders")
+
+GRADER_FILES = {
+    'entity': "entity_grader_v1.txt",
+    'sentiment': "sentiment_grader_v1.txt",
+    'combined': "combined_grader_v1.txt",
+}
+
+VERDICTS = ("PASS", "INFERRED PASS", "FAIL")
+
+_VERDICT_PATTERN = re.compile(r"\b(INFERRED PASS|PASS|FAIL)\b")
+
+def load_grader(task: str) -> str:
+    """Load a task's grader template without its metadata header.
+
+    Args:
+        task: 'entity', 'sentiment' or 'combined'
+
+    Returns:
+        Template text containing {{item.input}}, {{item.ideal}} and {{item.output}}
+    """
+    with open(os.path.join(GRADERS_DIR, GRADER_FILES[task])) as f:
+        lines = f.read().split('\n')
+    # The leading "# Key: value" lines are notes for the eval platform, not part of the prompt
+    while lines and (lines[0].startswith('# ') or not lines[0].strip()):
+        lines.pop(0)
+    return '\n'.join(lines).strip()
+
+def _as_text(value: Any) -> str:
+    """Render a record field the way the eval platform shows it."""
+    return value if isinstance(value, str) else json.dumps(value)
+
+def render_grader(template: str, record: Dict) -> str:
+    """Fill a grader template with a solution.jsonl record.
+
+    Args:
+        template: Template from load_grader
+        record: Record with 'input', 'ideal' and 'output'
+
+    Returns:
+        The grading prompt
+    """
+    return (template.replace("{{item.input}}", _as_text(record['input']))
+            .replace("{{item.ideal}}", _as_text(record['ideal']))
+            .replace("{{item.output}}", _as_text(record['output'])))
+
+def parse_verdict(response: str) -> Optional[str]:
+    """Extract the verdict from a grader response.
+
+    The verdict after "Result:" wins; otherwise the last verdict mentioned.
+
+    Args:
+        response: Raw response from the grader model
+
+    Returns:
+        'PASS', 'INFERRED PASS' or 'FAIL', or None if no verdict was found
+    """
+    upper = response.upper()
+    result = upper.rfind("RESULT:")
+    match = _VERDICT_PATTERN.search(upper, result) if result != -1 else None
+    if match:
+        return match.group(1)
+    matches = _VERDICT_PATTERN.findall(upper)
+    return matches[-1] if matches else None
+
+def render_batch_grader(template: str, records: List[Dict]) -> str:
+    """Fill a grader template with several records to grade in one request.
+
+    The template's criteria are kept once and its item section is repeated
+    per record, numbered from 1. The grader is asked for a JSON array of
+    verdicts instead of a single "Result:" line.
+
+    Args:
+        template: Template from load_grader
+        records: Records with 'input', 'ideal' and 'output'
+
+    Returns:
+        The batch grading prompt
+    """
+    criteria, _, item = template.partition("\n---\n")
+    criteria = "\n".join(line for line in criteria.split("\n") if not line.startswith("Result:")).strip()
+    items = "\n\n".join(f"### Item {number}\n{render_grader(item.strip(), record)}"
+                         for number, record in enumerate(records, 1))
+    return f"""{criteria}
+
+You will grade {len(records)} items. Grade each item independently using the criteria above.
+Return only a JSON array with one object per item, in order, where "result" is "PASS", "INFERRED PASS" or "FAIL":
+[{{"item": 1, "result": "PASS"}}, {{"item": 2, "result": "FAIL"}}]
+
+---
+
+{items}"""
+
+def _normalize_verdict(value: Any) -> Optional[str]:
+    """Map a grader's result field to one of VERDICTS."""
+    verdict = " ".join(str(value).upper().split())
+    return verdict if verdict in VERDICTS else None
+
+def parse_batch_verdicts(response: str, n_items: int) -> List[Optional[str]]:
+    """Extract per-item verdicts from a batch grader response.
+
+    Args:
+        response: Raw response from the grader model
+        n_items: Number of items in the batch
+
+    Returns:
+        One verdict per item, None for items the response did not grade
+    """
+    verdicts = [None] * n_items
+    start, end = response.find("["), response.rfind("]")
+    try:
+        items = json.loads(response[start:end + 1]) if start != -1 else None
+    except json.JSONDecodeError:
+        items = None
+    if isinstance(items, list):
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            try:
+                number = int(item.get("item", position + 1))
+            except (TypeError, ValueError):
+                continue
+            if 1 <= number <= n_items:
+                verdicts[number - 1] = _normalize_verdict(item.get("result", ""))
+        return verdicts
+    # Fall back to "Item 3: PASS" style lines
+    for number, verdict in re.findall(r"item\W*(\d+)[^\n]*?\b(inferred pass|pass|fail)\b", response, re.IGNORECASE):
+        if 1 <= int(number) <= n_items:
+            verdicts[int(number) - 1] = _normalize_verdict(verdict)
+    return verdicts
@@ -0,0 +1,89 @@
+"""Request hedging utilities for cutting tail latency.
+
+This module provides a hedging policy that tracks recently observed request
+latencies. When a request has been outstanding longer than a chosen
+percentile of them, a duplicate may be sent and whichever response arrives
+first is used. The share of requests that get a duplicate is capped, so the
+extra spend stays bounded.
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from evals.utils.metrics import percentile
+
+class HedgePolicy:
+    """Decide when to send a duplicate request and count how often it pays off."""
+
+    def __init__(self, quantile: float = 95.0, max_rate: float = 0.05, min_samples: int = 20,
+                 window: int = 500, min_delay: float = 0.05):
+        """Initialize the policy.
+
+        Args:
+            quantile: Percentile (0-100) of recent latencies after which a request is hedged
+            max_rate: Maximum hedges as a fraction of requests
+            min_samples: Latencies to observe before hedging starts
+            window: Number of recent latencies the percentile is computed over
+            min_delay: Lower bound on the hedge delay in seconds
+        """
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'hedged': 0, 'won': 0}
+
+    def start(self) -> Optional[float]:
+        """Count a new request and return how long to wait before hedging it.
+
+        Returns:
+            Delay in seconds, or None while too few latencies have been observed
+        """
+        with self._lock:
+            self.counts['requests'] += 1
+            if len(self._latencies) < self.min_samples:
+                return None
+            return max(self.min_delay, percentile(list(self._latencies), self.quantile))
+
+    def try_hedge(self) -> bool:
+        """Take a hedge from the budget if the hedge rate cap allows it.
+
+        Returns:
+            True if a duplicate request may be sent
+        """
+        with self._lock:
+            if self.counts['hedged'] + 1 > self.max_rate * self.counts['requests']:
+                return False
+            self.counts['hedged'] += 1
+            return True
+
+    def observe(self, latency: float, hedge_won: bool = False):
+        """Record the latency of a completed request.
+
+        Args:
+            latency: Seconds from sending to response for the response that was used
+            hedge_won: Whether the duplicate answered first
+        """
+        with self._lock:
+            self._latencies.append(latency)
+            if hedge_won:
+                self.counts['won'] += 1
+
+    def stats(self) -> Dict:
+        """Report request, hedge and win counts and the current hedge delay.
+
+        Returns:
+            Dictionary with counters, hedge rate, win rate and delay in seconds
+        """
+        with self._lock:
+            counts = dict(self.counts)
+            latencies = list(self._latencies)
+        delay = max(self.min_delay, percentile(latencies, self.quantile)) if len(latencies) >= self.min_samples else None
+        return {
+            **counts,
+            'hedge_rate': counts['hedged'] / counts['requests'] if counts['requests'] else 0.0,
+            'win_rate': counts['won'] / counts['hedged'] if counts['hedged'] else 0.0,
+            'delay': delay,
+        }
@@ -0,0 +1,324 @@
+"""Per-call instrumentation for experiment runs.
+
+This module provides:
+- A recorder for per-request latency, retries, token usage, cost and status
+- Per-call tags and per-run recorders carried through asyncio tasks
+- Parse-failure tracking per job
+- Latency percentiles and histograms for the run report
+- metrics.json and calls.csv output next to solution.jsonl
+"""
+
+import contextvars
+import csv
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+# USD per million (input, cached input, output) tokens
+PRICING = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+CALL_FIELDS = ["timestamp", "experiment", "prompt_func", "batch_size", "job", "model", "status", "latency",
+               "retries", "prompt_tokens", "cached_tokens", "completion_tokens", "cost", "parse_ok"]
+
+_call_tags: contextvars.ContextVar = contextvars.ContextVar("call_tags", default={})
+_bound_recorder: contextvars.ContextVar = contextvars.ContextVar("bound_recorder", default=None)
+
+def set_call_tags(**tags):
+    """Tag every API call made from the current task (or thread) from now on.
+
+    asyncio tasks copy the context when created, so tags set inside a job's
+    task also cover any follow-up calls it makes.
+
+    Args:
+        **tags: Tag values, e.g. job='row-12'
+    """
+    _call_tags.set({**_call_tags.get(), **tags})
+
+def bind_recorder(recorder: Optional["MetricsRecorder"]):
+    """Record API calls from the current task (or thread) with this recorder instead of the global one.
+
+    Lets several runs share one event loop while keeping separate metrics.
+
+    Args:
+        recorder: Recorder for this task's calls, or None to fall back to the global one
+    """
+    _bound_recorder.set(recorder)
+
+def bound_recorder() -> Optional["MetricsRecorder"]:
+    """Return the recorder bound to the current task, if any."""
+    return _bound_recorder.get()
+
+def percentile(values: List[float], q: float) -> float:
+    """Compute a percentile with linear interpolation.
+
+    Args:
+        values: Sample values
+        q: Percentile in [0, 100]
+
+    Returns:
+        The interpolated percentile (0.0 for no values)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def latency_summary(latencies: List[float]) -> Dict:
+    """Summarize latencies in seconds.
+
+    Args:
+        latencies: Latency samples
+
+    Returns:
+        Dictionary with mean, p50, p95, p99 and max latency
+    """
+    return {
+        'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': max(latencies) if latencies else 0.0,
+    }
+
+def latency_histogram(latencies: List[float]) -> Dict[str, int]:
+    """Count latencies into LATENCY_BUCKETS.
+
+    Args:
+        latencies: Latency samples in seconds
+
+    Returns:
+        Ordered mapping of bucket label (e.g. '<=0.5s') to count
+    """
+    labels = [f"<={bound:g}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]:g}s"]
+    counts = [0] * len(labels)
+    for latency in latencies:
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+        counts[index] += 1
+    return dict(zip(labels, counts))
+
+def call_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of one call from its token usage.
+
+    Args:
+        model: Model name (unknown models cost 0)
+        prompt_tokens: Prompt tokens, including cached ones
+        cached_tokens: Prompt tokens served from the provider's prompt cache
+        completion_tokens: Completion tokens
+
+    Returns:
+        Estimated cost in USD
+    """
+    input_price, cached_price, output_price = PRICING.get(model, (0.0, 0.0, 0.0))
+    return ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + completion_tokens * output_price) / 1_000_000
+
+class MetricsRecorder:
+    """Thread-safe collector of per-call metrics for one run."""
+
+    def __init__(self, tags: Optional[Dict] = None):
+        """Initialize the recorder.
+
+        Args:
+            tags: Run-level tags copied onto every call (experiment, prompt_func, batch_size)
+        """
+        self.tags = dict(tags or {})
+        self.calls: List[Dict] = []
+        self.parse_ok: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_calls_csv(cls, paths: List[str], tags: Optional[Dict] = None) -> "MetricsRecorder":
+        """Rebuild a recorder from calls.csv files, e.g. to combine the shards of a run.
+
+        Args:
+            paths: calls.csv files written by write()
+            tags: Run-level tags for the combined recorder
+
+        Returns:
+            Recorder holding every call and parse result from the files
+        """
+        recorder = cls(tags)
+        for path in paths:
+            recorder.load_calls_csv(path)
+        return recorder
+
+    def load_calls_csv(self, path: str) -> int:
+        """Add the calls and parse results of a calls.csv file, e.g. from before a resume.
+
+        Args:
+            path: calls.csv file written by write() or write_calls()
+
+        Returns:
+            Number of calls loaded
+        """
+        calls = []
+        parse_ok = {}
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                call = {field: row.get(field) or None for field in CALL_FIELDS if field != 'parse_ok'}
+                for field in ('timestamp', 'latency', 'cost'):
+                    call[field] = float(call[field] or 0)
+                for field in ('retries', 'prompt_tokens', 'cached_tokens', 'completion_tokens'):
+                    call[field] = int(call[field] or 0)
+                calls.append(call)
+                if row.get('parse_ok') in ('True', 'False'):
+                    parse_ok[call['job']] = row['parse_ok'] == 'True'
+        with self._lock:
+            self.calls.extend(calls)
+            self.parse_ok.update(parse_ok)
+        return len(calls)
+
+    def record_call(self, model: str, latency: float, retries: int, status: str, usage=None):
+        """Record one logical API call (all of its retries together).
+
+        Args:
+            model: Model name
+            latency: Seconds from the first attempt (or cache lookup) to the final result
+            retries: Number of retried attempts
+            status: 'ok', 'cache' or 'error'
+            usage: The response's usage object, if any
+        """
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+        call = {
+            'timestamp': time.time(),
+            'experiment': self.tags.get('experiment'),
+            'prompt_func': self.tags.get('prompt_func'),
+            'batch_size': self.tags.get('batch_size'),
+            'job': _call_tags.get().get('job'),
+            'model': model,
+            'status': status,
+            'latency': latency,
+            'retries': retries,
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': cached_tokens,
+            'completion_tokens': completion_tokens,
+            'cost': call_cost(model, prompt_tokens, cached_tokens, completion_tokens),
+        }
+        with self._lock:
+            self.calls.append(call)
+
+    def record_parse(self, job_key: str, ok: bool):
+        """Record whether a job's response parsed cleanly.
+
+        Args:
+            job_key: The job's 'key'
+            ok: False if the response had to fall back to a default or could not be recovered
+        """
+        with self._lock:
+            self.parse_ok[job_key] = ok
+
+    def summary(self, n_tweets: int) -> Dict:
+        """Aggregate the recorded calls.
+
+        Args:
+            n_tweets: Number of tweets processed in the run, for per-tweet figures
+
+        Returns:
+            JSON-serializable metrics dictionary
+        """
+        with self._lock:
+            calls = list(self.calls)
+            parse_failures = sum(not ok for ok in self.parse_ok.values())
+            parsed = len(self.parse_ok)
+        api_calls = [call for call in calls if call['status'] != 'cache']
+        latencies = [call['latency'] for call in api_calls]
+        totals = {field: sum(call[field] for call in calls)
+                  for field in ('prompt_tokens', 'cached_tokens', 'completion_tokens', 'cost')}
+        tweets = max(n_tweets, 1)
+        return {
+            **self.tags,
+            'tweets': n_tweets,
+            'calls': len(calls),
+            'status': {status: sum(call['status'] == status for call in calls) for status in ('ok', 'cache', 'error')},
+            'retries': sum(call['retries'] for call in calls),
+            'parse_failures': parse_failures,
+            'parsed_jobs': parsed,
+            'tokens': {
+                'prompt': totals['prompt_tokens'],
+                'cached': totals['cached_tokens'],
+                'cached_rate': totals['cached_tokens'] / totals['prompt_tokens'] if totals['prompt_tokens'] else 0.0,
+                'completion': totals['completion_tokens'],
+                'per_tweet': (totals['prompt_tokens'] + totals['completion_tokens']) / tweets,
+            },
+            'cost': {
+                'total': totals['cost'],
+                'per_1k_tweets': totals['cost'] * 1000 / tweets,
+            },
+            'latency': latency_summary(latencies),
+            'latency_histogram': latency_histogram(latencies),
+        }
+
+    def write(self, output_dir: str, n_tweets: int) -> Dict:
+        """Write metrics.json and the per-call calls.csv to an output directory.
+
+        Args:
+            output_dir: Experiment output directory
+            n_tweets: Number of tweets processed in the run
+
+        Returns:
+            The summary written to metrics.json
+        """
+        summary = self.summary(n_tweets)
+        with open(os.path.join(output_dir, "metrics.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+        self.write_calls(output_dir)
+        return summary
+
+    def write_calls(self, output_dir: str):
+        """Write every recorded call to calls.csv in an output directory.
+
+        Args:
+            output_dir: Experiment output directory
+        """
+        with self._lock:
+            calls = list(self.calls)
+            parse_ok = dict(self.parse_ok)
+        with open(os.path.join(output_dir, "calls.csv"), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CALL_FIELDS)
+            writer.writeheader()
+            for call in calls:
+                writer.writerow({**call, 'parse_ok': parse_ok.get(call['job'], '')})
+
+def format_report(summary: Dict) -> str:
+    """Render a metrics summary as a short text report with a latency histogram.
+
+    Args:
+        summary: Output of MetricsRecorder.summary
+
+    Returns:
+        Multi-line report string
+    """
+    status = summary['status']
+    tokens = summary['tokens']
+    latency = summary['latency']
+    lines = [
+        f"Calls: {summary['calls']} ({status['ok']} ok | {status['cache']} cached | {status['error']} failed) | "
+        f"retries: {summary['retries']} | parse failures: {summary['parse_failures']}/{summary['parsed_jobs']} jobs",
+        f"Tokens: {tokens['prompt']} prompt ({tokens['cached']} cached, {tokens['cached_rate']:.1%}) | "
+        f"{tokens['completion']} completion | {tokens['per_tweet']:.1f} per tweet",
+        f"Estimated cost: ${summary['cost']['total']:.4f} (${summary['cost']['per_1k_tweets']:.4f} per 1k tweets)",
+        f"Call latency: mean {latency['mean']:.2f}s | p50 {latency['p50']:.2f}s | p95 {latency['p95']:.2f}s | "
+        f"p99 {latency['p99']:.2f}s | max {latency['max']:.2f}s",
+    ]
+    histogram = list(summary['latency_histogram'].items())
+    # Only print the span of buckets that have calls in them
+    filled = [i for i, (_, count) in enumerate(histogram) if count]
+    histogram = histogram[filled[0]:filled[-1] + 1] if filled else []
+    peak = max((count for _, count in histogram), default=0)
+    for label, count in histogram:
+        bar = "#" * (round(40 * count / peak) if peak else 0)
+        lines.append(f"  {label:>7} {count:>6} {bar}")
+    return "\n".join(lines)
@@ -0,0 +1,78 @@
+"""Token-budget-aware batch packing for multi-tweet prompts.
+
+This module provides functions for grouping tweets into batches by their
+estimated prompt and completion token cost, instead of a fixed batch size, and
+for sizing each batch's max_tokens from the tweets it actually contains.
+"""
+
+import math
+from typing import List, Optional
+
+from evals.utils.ratelimit import estimate_tokens
+
+# Tokens per tweet in the prompt beyond the tweet itself (numbering, newline)
+PROMPT_ITEM_OVERHEAD = 4
+# Tokens per result object beyond the echoed tweet (braces, keys, airlines, sentiment)
+COMPLETION_ITEM_OVERHEAD = 40
+# Headroom applied to the completion estimate when setting max_tokens
+COMPLETION_MARGIN = 1.25
+
+def estimate_completion_tokens(tweet: str) -> int:
+    """Estimate the completion tokens a batched response spends on one tweet.
+    
+    The batch output format echoes each tweet alongside its airlines and
+    sentiment, so the cost grows with the tweet's length.
+    
+    Args:
+        tweet: The tweet text
+        
+    Returns:
+        Estimated completion tokens for the tweet's result object
+    """
+    return estimate_tokens(tweet) + COMPLETION_ITEM_OVERHEAD
+
+def batch_max_tokens(tweets: List[str]) -> int:
+    """Size max_tokens for a batch from the tweets it contains.
+    
+    Args:
+        tweets: Tweets in the batch
+        
+    Returns:
+        max_tokens value with headroom over the estimated completion length
+    """
+    return math.ceil(sum(estimate_completion_tokens(tweet) for tweet in tweets) * COMPLETION_MARGIN) + 20
+
+def pack_batches(tweets: List[str], token_ceiling: int, prompt_overhead: int = 0,
+                 max_batch_size: Optional[int] = None) -> List[List[int]]:
+    """Group consecutive tweets into batches under a total token ceiling.
+    
+    Each batch's cost is the static prompt overhead plus, for every tweet, its
+    prompt tokens and estimated completion tokens (with margin). Tweets are
+    kept in their original order so results stay aligned with dataset rows;
+    a single tweet that exceeds the ceiling on its own still gets its own batch.
+    
+    Args:
+        tweets: Tweets to pack
+        token_ceiling: Maximum estimated prompt + completion tokens per batch
+        prompt_overhead: Tokens used by the prompt template without any tweets
+        max_batch_size: Optional cap on the number of tweets per batch
+        
+    Returns:
+        List of batches, each a list of indices into `tweets`
+    """
+    batches = []
+    current = []
+    cost = prompt_overhead
+    for i, tweet in enumerate(tweets):
+        item_cost = (estimate_tokens(tweet) + PROMPT_ITEM_OVERHEAD
+                     + math.ceil(estimate_completion_tokens(tweet) * COMPLETION_MARGIN))
+        full = max_batch_size is not None and len(current) >= max_batch_size
+        if current and (full or cost + item_cost > token_ceiling):
+            batches.append(current)
+            current = []
+            cost = prompt_overhead
+        current.append(i)
+        cost += item_cost
+    if current:
+        batches.append(current)
+    return batches
@@ -5,7 +5,10 @@ including handling different response formats and error cases.
 """
 
 import json
-from typing import List, Dict
+import re
+from typing import List, Dict, Optional, Tuple
+
+VALID_SENTIMENTS = ["positive", "negative", "neutral"]
 
 def parse_entity_response_clean(response: str) -> List[str]:
     """Parse and clean entity extraction response.
@@ -62,9 +65,150 @@ def parse_sentiment_response(response: str) -> str:
         else:
             return "unknown"
 
+
+def parse_multi_sentiment_response(response: str, airlines: List[str]) -> Dict[str, str]:
+    """Parse a multi-airline sentiment response into a per-airline mapping.
+    
+    Accepts {"sentiments": {airline: sentiment}}, a flat {airline: sentiment}
+    mapping, or a list of {"airline", "sentiment"} objects. Airline names are
+    matched case- and punctuation-insensitively; for a single airline a plain
+    {"sentiment": ...} answer is also accepted.
+    
+    Args:
+        response: Raw response from the language model
+        airlines: Airlines the prompt asked about
+        
+    Returns:
+        Dictionary mapping each requested airline to 'positive', 'negative', 'neutral' or 'unknown'
+    """
+    def key(name) -> str:
+        return re.sub(r"[^a-z]", "", str(name).lower())
+
+    sentiments = {airline: "unknown" for airline in airlines}
+    try:
+        if response.startswith('```'):
+            lines = response.split('\n')
+            json_lines = [line for line in lines if line.strip() and not line.strip().startswith('```')]
+            if json_lines:
+                response = '\n'.join(json_lines)
+        data = json.loads(response)
+    except Exception:
+        if len(airlines) == 1:
+            sentiments[airlines[0]] = parse_sentiment_response(response)
+        return sentiments
+
+    if isinstance(data, dict) and len(airlines) == 1 and isinstance(data.get("sentiment"), str):
+        data = {airlines[0]: data["sentiment"]}
+    if isinstance(data, dict) and isinstance(data.get("sentiments"), (dict, list)):
+        data = data["sentiments"]
+    if isinstance(data, list):
+        data = {item.get("airline"): item.get("sentiment") for item in data if isinstance(item, dict)}
+    if not isinstance(data, dict):
+        return sentiments
+
+    by_key = {key(airline): airline for airline in airlines}
+    for name, sentiment in data.items():
+        airline = by_key.get(key(name))
+        if airline is None or not isinstance(sentiment, str):
+            continue
+        sentiment = sentiment.lower().strip()
+        sentiments[airline] = sentiment if sentiment in VALID_SENTIMENTS else "unknown"
+    return sentiments
+
+def _normalize_tweet(text: str) -> str:
+    """Collapse case and whitespace so echoed tweets can be matched to inputs."""
+    return " ".join(str(text).lower().split())
+
+def _extract_json_items(response: str) -> Tuple[List, bool]:
+    """Decode a batch response into a list of items, tolerating damage.
+    
+    Tries to decode the whole response as a JSON array first. If that fails
+    (e.g. the output was truncated or one element is malformed) every complete
+    top-level JSON object in the text is decoded individually instead.
+    
+    Args:
+        response: Raw response from the API, with markdown fences removed
+        
+    Returns:
+        Tuple of (decoded items, whether the response decoded as a whole)
+    """
+    try:
+        results = json.loads(response)
+        if isinstance(results, list):
+            return results, True
+        if isinstance(results, dict):
+            return [results], True
+    except Exception:
+        pass
+    decoder = json.JSONDecoder()
+    items = []
+    pos = response.find('{')
+    while pos != -1:
+        try:
+            item, end = decoder.raw_decode(response, pos)
+            items.append(item)
+            pos = response.find('{', end)
+        except ValueError:
+            pos = response.find('{', pos + 1)
+    return items, False
+
+def _valid_batch_item(item) -> bool:
+    """Check that a batch item has a list of airlines and a valid sentiment."""
+    return (isinstance(item, dict)
+            and isinstance(item.get("airlines"), list)
+            and item.get("sentiment") in VALID_SENTIMENTS)
+
+def salvage_batch_response(response: str, tweets: List[str]) -> List[Optional[Dict]]:
+    """Parse a batch response item by item, keeping every result that is valid.
+    
+    Items are matched back to tweets by their echoed tweet text when present,
+    and otherwise by position when the response has exactly one item per tweet
+    or was cut off part way through.
+    Invalid or unmatched tweets are returned as None so they can be retried.
+    
+    Args:
+        response: Raw response from the API
+        tweets: Original list of tweets
+        
+    Returns:
+        List with one entry per tweet: {'airlines', 'sentiment'} or None if unusable
+    """
+    # Handle potential markdown formatting
+    if "```json" in response:
+        response = response.split("```json")[1].split("```")[0].strip()
+    elif "```" in response:
+        response = response.split("```")[1].strip()
+
+    items, complete = _extract_json_items(response)
+    results: List[Optional[Dict]] = [None] * len(tweets)
+    normalized = [_normalize_tweet(tweet) for tweet in tweets]
+    # A truncated response still lists its surviving items in tweet order
+    positional = len(items) == len(tweets) or (not complete and len(items) < len(tweets))
+
+    for position, item in enumerate(items):
+        if not _valid_batch_item(item):
+            continue
+        index = None
+        echoed = item.get("tweet")
+        if isinstance(echoed, str) and echoed.strip():
+            echoed = _normalize_tweet(echoed)
+            for i, text in enumerate(normalized):
+                if results[i] is None and (text == echoed or text.startswith(echoed) or echoed.startswith(text)):
+                    index = i
+                    break
+        if index is None and positional and results[position] is None:
+            index = position
+        if index is not None:
+            results[index] = {"airlines": item["airlines"], "sentiment": item["sentiment"]}
+    return results
+
 def parse_batch_response(response: str, tweets: List[str]) -> List[Dict]:
     """Parse the response from the API for each tweet in the batch.
     
+    Valid items are kept even when other items in the batch are malformed or
+    missing; only the tweets that could not be recovered fall back to
+    {"airlines": [], "sentiment": "neutral"}.
+    
     Args:
         response: Raw response from the API
         tweets: Original list of tweets
@@ -72,43 +216,8 @@ def parse_batch_response(response: str, tweets: List[str]) -> List[Dict]:
     Returns:
         List[Dict]: List of results for each tweet, containing only airlines and sentiment
     """
-    try:
-        # Handle potential markdown formatting
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0].strip()
-        elif "```" in response:
-            response = response.split("```")[1].strip()
-            
-        results = json.loads(response)
-        
-        # Validate results
-        if not isinstance(results, list):
-            raise ValueError("Response is not a list")
-            
-        # Ensure we have results for all tweets
-        if len(results) != len(tweets):
-            raise ValueError(f"Expected {len(tweets)} results, got {len(results)}")
-            
-        # Extract only airlines and sentiment from each result
-        parsed_results = []
-        for result in results:
-            if not isinstance(result, dict):
-                raise ValueError("Result is not a dictionary")
-            if "airlines" not in result or "sentiment" not in result:
-                raise ValueError("Missing required fields in result")
-            if not isinstance(result["airlines"], list):
-                raise ValueError("airlines field must be a list")
-            if result["sentiment"] not in ["positive", "negative", "neutral"]:
-                raise ValueError("Invalid sentiment value")
-                
-            parsed_results.append({
-                "airlines": result["airlines"],
-                "sentiment": result["sentiment"]
-            })
-                
-        return parsed_results
-        
-    except Exception as e:
-        print(f"Error parsing batch response: {str(e)}")
-        # Return empty results for failed batch
-        return [{"airlines": [], "sentiment": "neutral"} for _ in tweets] 
\ No newline at end of file
+    results = salvage_batch_response(response, tweets)
+    failed = sum(result is None for result in results)
+    if failed:
+        print(f"Error parsing batch response: {failed}/{len(tweets)} results could not be recovered")
+    return [result if result is not None else {"airlines": [], "sentiment": "neutral"} for result in results]
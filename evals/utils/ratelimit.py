@@ -0,0 +1,119 @@
+"""Rate limiting utilities for API calls.
+
+This module provides a token-bucket limiter that enforces requests-per-minute and
+tokens-per-minute budgets, plus a cheap prompt token estimator used to size
+requests against the tokens-per-minute budget.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+# Rough characters-per-token ratio for English text with GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text.
+    
+    Args:
+        text: Text to estimate
+        
+    Returns:
+        Approximate token count (at least 1)
+    """
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+class RateLimiter:
+    """Token-bucket limiter for requests-per-minute and tokens-per-minute budgets.
+    
+    Both buckets start full and refill continuously. A request is admitted once
+    there is one request slot and enough token budget for its estimated cost.
+    `pause` blocks every caller until a deadline, which is how server-side
+    rate limit responses (429 + Retry-After) slow the whole run down.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """Initialize the limiter.
+        
+        Args:
+            rpm: Requests-per-minute budget (None for unlimited)
+            tpm: Tokens-per-minute budget (None for unlimited)
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm) if rpm else 0.0
+        self._tokens = float(tpm) if tpm else 0.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60.0)
+
+    def _reserve(self, tokens: int) -> float:
+        """Try to take budget for one request.
+        
+        Args:
+            tokens: Estimated token cost of the request
+            
+        Returns:
+            0.0 if the request was admitted, otherwise seconds to wait before retrying
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            wait = 0.0
+            if self.rpm and self._requests < 1:
+                wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+            if self.tpm:
+                tokens = min(tokens, self.tpm)
+                if self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+            if wait > 0:
+                return wait
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int = 0):
+        """Block until a request of the given token cost may be sent.
+        
+        Args:
+            tokens: Estimated token cost of the request
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Wait without blocking the event loop until a request may be sent.
+        
+        Args:
+            tokens: Estimated token cost of the request
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back all callers for the given number of seconds.
+        
+        Args:
+            seconds: Length of the pause from now
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
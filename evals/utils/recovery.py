@@ -0,0 +1,116 @@
+"""Batch response recovery for combined batch prompts.
+
+This module provides functions for salvaging the usable items of a batch
+response and re-dispatching only the tweets that failed, shared by the batch
+runner, the streaming mode and the classification service.
+"""
+
+import asyncio
+from collections import deque
+from typing import Callable, List, Optional
+
+from evals.utils.api import call_api_async
+from evals.utils.packing import batch_max_tokens
+from evals.utils.parsers import salvage_batch_response
+
+async def _send_retries(batches: List[List[str]], prompt_func: Callable, slots: Optional[asyncio.Semaphore]) -> List[str]:
+    """Send one batch prompt per group of tweets, within the caller's concurrency slot.
+    
+    Without slots the requests are sent together. With slots, the caller is
+    expected to hold one of them and works through the requests on it, while
+    slots free at that moment are borrowed to send more of them in parallel.
+    Retries never wait for a slot held by another job, so the cap is kept
+    without jobs deadlocking on each other.
+    
+    Args:
+        batches: Tweets of each retry request
+        prompt_func: Batch prompt function used to build the retry prompts
+        slots: Semaphore capping requests in flight, or None
+        
+    Returns:
+        Raw responses, one per batch
+    """
+    if slots is None:
+        return await asyncio.gather(*(
+            call_api_async(prompt_func(batch), max_tokens=batch_max_tokens(batch)) for batch in batches
+        ))
+    responses = [""] * len(batches)
+    queue = deque(range(len(batches)))
+
+    async def drain():
+        while queue:
+            k = queue.popleft()
+            responses[k] = await call_api_async(prompt_func(batches[k]), max_tokens=batch_max_tokens(batches[k]))
+
+    helpers = []
+    while len(helpers) < len(batches) - 1 and not slots.locked():
+        # A free slot is taken without waiting; it is returned when its helper ends, even if cancelled
+        await slots.acquire()
+        helper = asyncio.ensure_future(drain())
+        helper.add_done_callback(lambda _: slots.release())
+        helpers.append(helper)
+    try:
+        await drain()
+        await asyncio.gather(*helpers)
+    finally:
+        for helper in helpers:
+            helper.cancel()
+    return responses
+
+async def recover_batch(tweets: List[str], response: str, prompt_func: Callable, redispatch: bool = True,
+                        slots: Optional[asyncio.Semaphore] = None) -> dict:
+    """Salvage a batch response and re-dispatch only the tweets that failed.
+    
+    Failed tweets are retried in batches of half the original size, then any
+    that still fail are retried one tweet per request. Each retry's max_tokens
+    is sized from the tweets it contains.
+    
+    Args:
+        tweets: Tweets in the batch
+        response: Raw response from the API for the full batch
+        prompt_func: Batch prompt function used to build the retry prompts
+        redispatch: Whether failed tweets may be sent to the API again
+        slots: Semaphore capping requests in flight that the caller holds a slot of
+            (e.g. executor.held_slots()); retries stay within it instead of adding requests
+        
+    Returns:
+        Dictionary with per-tweet 'results', the indices of tweets that fell back to the
+        default result ('failed') and 'counts' of salvaged, retried and unrecovered tweets
+    """
+    results = salvage_batch_response(response, tweets)
+    failed = [i for i, result in enumerate(results) if result is None]
+    counts = {'salvaged': len(tweets) - len(failed) if failed else 0, 'retried': len(failed) if redispatch else 0}
+
+    chunk_size = max(1, len(tweets) // 2)
+    while failed and redispatch:
+        chunks = [failed[k:k + chunk_size] for k in range(0, len(failed), chunk_size)]
+        responses = await _send_retries([[tweets[i] for i in chunk] for chunk in chunks], prompt_func, slots)
+        for chunk, chunk_response in zip(chunks, responses):
+            for i, result in zip(chunk, salvage_batch_response(chunk_response, [tweets[i] for i in chunk])):
+                results[i] = result
+        failed = [i for i in failed if results[i] is None]
+        if chunk_size == 1:
+            break
+        chunk_size = 1
+
+    counts['unrecovered'] = len(failed)
+    if failed:
+        print(f"Error parsing batch response: {len(failed)}/{len(tweets)} results could not be recovered")
+    return {
+        'results': [result if result is not None else {"airlines": [], "sentiment": "neutral"} for result in results],
+        'failed': failed,
+        'counts': counts,
+    }
+
+async def classify_batch(tweets: List[str], prompt_func: Callable) -> dict:
+    """Classify a batch of tweets with one batch prompt call plus recovery.
+    
+    Args:
+        tweets: Tweets to classify
+        prompt_func: Batch prompt function (from COMBINED_BATCH_PROMPT_FUNCS)
+        
+    Returns:
+        The recover_batch result for the batch
+    """
+    response = await call_api_async(prompt_func(tweets), max_tokens=batch_max_tokens(tweets))
+    return await recover_batch(tweets, response, prompt_func)
@@ -0,0 +1,255 @@
+"""Micro-batching and stream reading utilities for continuous classification.
+
+This module provides:
+- A micro-batcher that coalesces single items into batches by size and
+  maximum wait time, with a bounded queue for backpressure and a cap on the
+  number of batches in flight
+- Readers that follow stdin or a growing JSONL/CSV file
+- A bridge that feeds a blocking reader into asyncio with backpressure
+"""
+
+import asyncio
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+
+from evals.utils.metrics import latency_summary
+
+class MicroBatcher:
+    """Coalesce individually submitted items into batched calls."""
+
+    def __init__(self, process_batch: Callable[[List[Any]], Awaitable[List[Any]]], max_batch_size: int = 10,
+                 max_wait: float = 0.5, max_in_flight: int = 4, max_queue: int = 1000):
+        """Initialize the batcher.
+
+        Args:
+            process_batch: Coroutine function mapping a list of items to a list of results
+            max_batch_size: Maximum items per batch
+            max_wait: Maximum seconds the first item of a batch waits for more items
+            max_in_flight: Maximum batches being processed at once
+            max_queue: Maximum items waiting for a batch before submit() blocks
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+        self._latencies = deque(maxlen=10000)
+        self.counts = {'items': 0, 'batches': 0, 'errors': 0}
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result.
+
+        Blocks while the queue is full, which propagates backpressure to the caller.
+
+        Args:
+            item: Item to process
+
+        Returns:
+            The item's result from process_batch
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        """Form and dispatch batches until close() is called and the queue drains."""
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            entry = await self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+            # Waiting for a free slot here leaves items queued, so submitters feel the backpressure
+            await self._slots.acquire()
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def start(self) -> asyncio.Task:
+        """Start forming batches on the running event loop.
+
+        Returns:
+            The batching task; it finishes after close() once every queued item is processed
+        """
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        return asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """Flush queued items as a final batch and stop the batching task once they are processed."""
+        await self._queue.put(None)
+
+    async def _dispatch(self, batch: List):
+        """Process one batch and resolve its items' futures."""
+        try:
+            results = await self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"process_batch returned {len(results)} results for {len(batch)} items")
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            self.counts['errors'] += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+            now = time.perf_counter()
+            self._latencies.extend(now - queued_at for _, _, queued_at in batch)
+            self.counts['items'] += len(batch)
+            self.counts['batches'] += 1
+
+    def stats(self) -> Dict:
+        """Report queue depth, batch counts and recent item latencies.
+
+        Returns:
+            Dictionary with queue depth, in-flight batches, counters, mean batch
+            size and a latency summary over the most recent items
+        """
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': len(self._tasks),
+            **self.counts,
+            'mean_batch_size': self.counts['items'] / self.counts['batches'] if self.counts['batches'] else 0.0,
+            'latency': latency_summary(list(self._latencies)),
+        }
+
+def follow_lines(path: str, poll_interval: float = 0.5) -> Iterator[str]:
+    """Yield lines from a file as it grows, like `tail -f` from the start of the file.
+
+    Partial trailing lines are held back until their newline arrives, and the
+    file is reread from the start if it is truncated.
+
+    Args:
+        path: File to follow
+        poll_interval: Seconds to sleep at end of file before checking again
+
+    Yields:
+        Complete lines, including the newline
+    """
+    with open(path, newline='') as f:
+        partial = ""
+        while True:
+            line = f.readline()
+            if not line:
+                if os.path.getsize(path) < f.tell():
+                    f.seek(0)
+                    partial = ""
+                time.sleep(poll_interval)
+                continue
+            partial += line
+            if partial.endswith("\n"):
+                yield partial
+                partial = ""
+
+def parse_stream_records(lines: Iterable[str], fmt: str = "jsonl") -> Iterator[Dict]:
+    """Turn raw stream lines into tweet records.
+
+    JSONL lines may be objects with a 'tweet' (or 'text') field and an optional
+    'id'; any other non-empty line is taken as the tweet text itself. CSV
+    streams need a header row with a 'tweet' (or 'text') column.
+
+    Args:
+        lines: Lines from stdin or follow_lines
+        fmt: 'jsonl' or 'csv'
+
+    Yields:
+        Records with 'id' and 'tweet'; a record without an id gets 'seq-<n>', n being
+        its position in the stream, which cannot collide with numeric ids
+    """
+    if fmt == "csv":
+        rows = csv.DictReader(lines)
+    else:
+        rows = (_parse_jsonl_line(line) for line in lines if line.strip())
+    for sequence, row in enumerate(rows):
+        tweet = row.get('tweet') or row.get('text')
+        if tweet:
+            row_id = row.get('id')
+            yield {'id': row_id if row_id not in (None, "") else f"seq-{sequence}", 'tweet': tweet}
+
+def _parse_jsonl_line(line: str) -> Dict:
+    """Decode one JSONL stream line, falling back to raw tweet text."""
+    line = line.strip()
+    if line.startswith("{"):
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            pass
+    return {'tweet': line}
+
+def open_stream(source: str, poll_interval: float = 0.5) -> Iterator[Dict]:
+    """Open a tweet stream by name.
+
+    Args:
+        source: '-' for stdin, otherwise a JSONL or CSV file to follow
+        poll_interval: Seconds between checks for new lines when following a file
+
+    Returns:
+        Iterator over tweet records (see parse_stream_records)
+    """
+    if source == "-":
+        return parse_stream_records(sys.stdin)
+    fmt = "csv" if source.lower().endswith(".csv") else "jsonl"
+    return parse_stream_records(follow_lines(source, poll_interval), fmt)
+
+async def iterate_in_thread(iterator: Iterator, max_buffer: int = 100) -> AsyncIterator:
+    """Consume a blocking iterator on a daemon thread and yield its items asynchronously.
+
+    The reader thread blocks when max_buffer items are waiting, so a slow
+    consumer slows the reader instead of growing memory.
+
+    Args:
+        iterator: Blocking iterator (e.g. over stdin or a followed file)
+        max_buffer: Maximum items read ahead of the consumer
+
+    Yields:
+        The iterator's items in order
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_buffer)
+    done = object()
+    errors = []
+
+    def reader():
+        try:
+            for item in iterator:
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    threading.Thread(target=reader, daemon=True).start()
+    while True:
+        item = await queue.get()
+        if item is done:
+            break
+        yield item
+    if errors:
+        raise errors[0]
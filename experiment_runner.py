@@ -9,124 +9,494 @@ The script supports both single-tweet and batch processing modes, with configura
 parameters for experiment type, number of samples, and batch size.
 """
 
+from __future__ import annotations
+
 import argparse
-import pandas as pd
+import asyncio
+import contextlib
 import json
 import os
+import sys
 import time
-from typing import Callable
+from typing import Callable, Iterator, List, Optional, Set
 
 from evals.prompts.entity import ENTITY_PROMPT_FUNCS
-from evals.prompts.sentiment import SENTIMENT_PROMPT_FUNCS
-from evals.prompts.combined import COMBINED_PROMPT_FUNCS
-from evals.utils.api import call_api
-from evals.utils.parsers import parse_entity_response_clean, parse_sentiment_response, parse_batch_response
-from evals.utils.data import load_dataset, get_true_airlines, create_output_dir, write_result
+from evals.prompts.sentiment import SENTIMENT_PROMPT_FUNCS, MULTI_SENTIMENT_PROMPT_FUNCS
+from evals.prompts.combined import COMBINED_PROMPT_FUNCS, COMBINED_BATCH_PROMPT_FUNCS
+from evals.prompts.layout import prefix_cache_warning, prompt_text
+from evals.utils import api
+from evals.utils.api import configure_rate_limit, configure_cache, configure_metrics, configure_hedging
+from evals.utils.cache import CACHE_MODES, DEFAULT_CACHE_PATH
+from evals.utils.parsers import parse_entity_response_clean, parse_sentiment_response, parse_multi_sentiment_response
+from evals.utils.data import ARCHIVE_CHUNK_SIZE, Archive, Dataset, load_dataset, row_chunks, iter_rows, create_output_dir, write_result, save_run_config, load_run_config, write_run_summary, parse_shard, select_shard
+from evals.utils.checkpoint import CheckpointWriter, load_completed, record_key
+from evals.utils.executor import execute_jobs, call_prompt, held_slots
+from evals.utils.metrics import latency_summary, format_report
+from evals.utils.entity_matcher import match_airlines, mentioned_airlines
+from evals.utils.dedup import DEFAULT_DEDUP_THRESHOLD, group_tweets
+from evals.utils.packing import pack_batches, batch_max_tokens
+from evals.utils.ratelimit import estimate_tokens
+from evals.utils.batch_files import write_batch_file, read_batch_results, batch_results_processor
+from evals.utils.streaming import MicroBatcher, iterate_in_thread, open_stream
+from evals.utils.recovery import recover_batch, classify_batch
+from evals.utils.cascade import DEFAULT_TARGET_ACCURACY, Cascade, fit_cascade
+
+def clean_json_response(response: str):
+    """Strip markdown fences from a single-tweet response and decode it as JSON.
+    
+    Args:
+        response: Raw response from the API
+        
+    Returns:
+        Decoded JSON object, or the cleaned response string if it is not valid JSON
+    """
+    if response.startswith('```'):
+        lines = response.split('\n')
+        json_lines = [line for line in lines if line.strip() and not line.strip().startswith('```')]
+        if json_lines:
+            response = '\n'.join(json_lines)
+    try:
+        return json.loads(response)
+    except Exception:
+        return response
+
+def record_parse(job: dict, ok: bool):
+    """Record whether a job's response parsed cleanly, if metrics are being collected.
+    
+    Args:
+        job: The job whose response was parsed
+        ok: False if the parser had to fall back to a default
+    """
+    recorder = api.active_metrics()
+    if recorder is not None:
+        recorder.record_parse(job['key'], ok)
+
+def mention_signatures(tweets: List[str]) -> List[tuple]:
+    """Airlines each tweet mentions; near-duplicate tweets only share an answer if these match."""
+    return [tuple(mentioned_airlines(tweet)) for tweet in tweets]
 
-def run_entity_experiment(df: pd.DataFrame, n_samples: int, prompt_func: Callable, solution_path: str):
+def entity_jobs(df: Dataset, n_samples: int, prompt_func: Callable, completed: Optional[Set] = None,
+                fast_path: bool = False, dedup_threshold: Optional[float] = None) -> Iterator[dict]:
+    """Generate one entity extraction job per tweet.
+    
+    Args:
+        df: DataFrame or Archive containing tweets and true airline mentions
+        n_samples: Number of samples to process
+        prompt_func: Function to generate the prompt for each tweet
+        completed: Keys of records already written by an interrupted run (resume mode)
+        fast_path: Resolve unambiguous tweets with the local matcher ('local' and 'response' keys)
+            instead of the LLM
+        dedup_threshold: If set, jobs for duplicate tweets share one request ('dedup' key);
+            duplicates are found within each archive chunk ('dedup_scope' key)
+        
+    Yields:
+        Job dictionaries with the prompt and the context needed to write the result
+    """
+    completed = completed or set()
+    start = 0
+    for columns in row_chunks(df, n_samples):
+        groups = None
+        if dedup_threshold is not None:
+            groups = group_tweets(columns['tweet'], dedup_threshold, mention_signatures(columns['tweet']))
+        for position, row in enumerate(iter_rows(columns)):
+            if record_key(row['id']) in completed:
+                continue
+            tweet = row['tweet']
+            job = {'key': f"row-{row['id']}", 'index': start + position, 'id': row['id'], 'tweet': tweet,
+                   'true_airlines': row['airlines'], 'prompt': prompt_func(tweet)}
+            if fast_path:
+                local = match_airlines(tweet)
+                if local is not None:
+                    job['local'] = local
+                    job['response'] = json.dumps({"airlines": local})
+            if groups is not None and 'local' not in job:
+                job['dedup'] = f"dup-{start + groups[position]}"
+                job['dedup_scope'] = start
+            yield job
+        start += len(columns['id'])
+
+def sentiment_jobs(df: Dataset, n_samples: int, prompt_func: Callable, completed: Optional[Set] = None,
+                   dedup_threshold: Optional[float] = None, cascade: Optional[Cascade] = None) -> Iterator[dict]:
+    """Generate one sentiment job per (tweet, airline) pair.
+    
+    Multi-airline prompt functions (MULTI_SENTIMENT_PROMPT_FUNCS) get one job
+    per tweet covering all of its airlines instead.
+    
+    Args:
+        df: DataFrame or Archive containing tweets and true sentiment labels
+        n_samples: Number of samples to process
+        prompt_func: Function to generate the prompt for each tweet-airline pair (or tweet-airlines list)
+        completed: Keys of records already written by an interrupted run (resume mode)
+        dedup_threshold: If set, jobs for duplicate tweets share one request ('dedup' key);
+            duplicates are found within each archive chunk ('dedup_scope' key)
+        cascade: Answer tweets the local model is confident about locally ('local' and 'response' keys)
+            instead of with the LLM
+        
+    Yields:
+        Job dictionaries with the prompt and the context needed to write the result
+    """
+    completed = completed or set()
+    multi_airline = prompt_func in MULTI_SENTIMENT_PROMPT_FUNCS.values()
+    start = 0
+    group_start = 0
+    for columns in row_chunks(df, n_samples):
+        # One vectorized pass per chunk; the label covers every airline of the tweet
+        local = cascade.route(columns['tweet']) if cascade is not None else [None] * len(columns['id'])
+        groups = {}
+        if dedup_threshold is not None:
+            if multi_airline:
+                keys = list(enumerate(columns['tweet']))
+                signatures = [tuple(airlines) for airlines in columns['airlines']]
+            else:
+                # The same text addressed to different airlines gets the same answer, but the
+                # airlines of one multi-airline tweet must stay apart
+                keys = [(i, airline) for i, airlines in enumerate(columns['airlines']) for airline in airlines]
+                signatures = [(columns['airlines'][i].index(airline), len(columns['airlines'][i])) for i, airline in keys]
+            tweets = [columns['tweet'][key[0]] for key in keys]
+            representatives = group_tweets(tweets, dedup_threshold, signatures, mask_handles=not multi_airline)
+            groups = {key[:1] if multi_airline else key: f"dup-{group_start + representative}"
+                      for key, representative in zip(keys, representatives)}
+            group_start += len(keys)
+        for position, row in enumerate(iter_rows(columns)):
+            i = start + position
+            row_id = row['id']
+            tweet = row['tweet']
+            airlines = row['airlines']
+            if multi_airline:
+                pending = [airline for airline in airlines if record_key(row_id, airline) not in completed]
+                if pending:
+                    job = {'key': f"row-{row_id}", 'index': i, 'id': row_id, 'tweet': tweet, 'airlines': airlines,
+                           'pending': pending, 'true_sentiment': row['sentiment'], 'prompt': prompt_func(tweet, airlines),
+                           'max_tokens': max(150, 40 * len(airlines))}
+                    if local[position] is not None:
+                        job['local'] = local[position]
+                        job['response'] = json.dumps({"sentiments": {airline: local[position] for airline in airlines}})
+                    else:
+                        job['dedup'] = groups.get((position,))
+                        job['dedup_scope'] = start
+                    yield job
+                continue
+            for airline in airlines:
+                if record_key(row_id, airline) in completed:
+                    continue
+                job = {'key': f"row-{row_id}-{airline}", 'index': i, 'id': row_id, 'tweet': tweet, 'airline': airline,
+                       'true_sentiment': row['sentiment'], 'prompt': prompt_func(tweet, airline)}
+                if local[position] is not None:
+                    job['local'] = local[position]
+                    job['response'] = json.dumps({"sentiment": local[position]})
+                else:
+                    job['dedup'] = groups.get((position, airline))
+                    job['dedup_scope'] = start
+                yield job
+        start += len(columns['id'])
+
+def combined_jobs(df: Dataset, n_samples: int, batch_size: int, prompt_func: Callable,
+                  completed: Optional[Set] = None, pack_tokens: Optional[int] = None,
+                  dedup_threshold: Optional[float] = None) -> Iterator[dict]:
+    """Generate combined analysis jobs, one per tweet or one per batch of tweets.
+    
+    Batches never span two archive chunks, so the last batch of a chunk may be short.
+    
+    Args:
+        df: DataFrame or Archive containing tweets and true labels
+        n_samples: Number of samples to process
+        batch_size: Number of tweets to process in each batch (the cap per batch when packing)
+        prompt_func: Function to generate the prompt for tweets
+        completed: Keys of records already written by an interrupted run (resume mode)
+        pack_tokens: If set, pack batches up to this many estimated prompt + completion tokens
+        dedup_threshold: If set, duplicate tweets share one request ('dedup' key) or, when
+            batching, only one copy is sent and the rest ride along in 'duplicates';
+            duplicates are found within each archive chunk
+        
+    Yields:
+        Job dictionaries with the prompt and the context needed to write the results
+    """
+    completed = completed or set()
+    if batch_size == 1 and not pack_tokens:
+        start = 0
+        for columns in row_chunks(df, n_samples):
+            groups = None
+            if dedup_threshold is not None:
+                groups = group_tweets(columns['tweet'], dedup_threshold, mention_signatures(columns['tweet']))
+            for position, row in enumerate(iter_rows(columns)):
+                if record_key(row['id']) in completed:
+                    continue
+                tweet = row['tweet']
+                yield {'key': f"row-{row['id']}", 'index': start + position, 'id': row['id'], 'tweet': tweet,
+                       'true_sentiment': row['sentiment'], 'true_airlines': row['airlines'], 'prompt': prompt_func(tweet),
+                       'dedup': f"dup-{start + groups[position]}" if groups is not None else None,
+                       'dedup_scope': start}
+            start += len(columns['id'])
+        return
+
+    overhead = estimate_tokens(prompt_text(prompt_func([]))) if pack_tokens else 0
+    batch_number = 0
+    for columns in row_chunks(df, n_samples):
+        if completed:
+            keep = [i for i, row_id in enumerate(columns['id']) if record_key(row_id) not in completed]
+            columns = {name: [values[i] for i in keep] for name, values in columns.items()}
+        duplicates = None
+        if dedup_threshold is not None:
+            # Only representatives go into batches; their duplicates are written with their results
+            representatives = group_tweets(columns['tweet'], dedup_threshold, mention_signatures(columns['tweet']))
+            keep = [p for p, representative in enumerate(representatives) if representative == p]
+            members = {p: [] for p in keep}
+            for p, representative in enumerate(representatives):
+                if representative != p:
+                    members[representative].append({'id': columns['id'][p], 'tweet': columns['tweet'][p],
+                                                    'sentiment': columns['sentiment'][p], 'airlines': columns['airlines'][p]})
+            duplicates = [members[p] for p in keep]
+            columns = {name: [values[p] for p in keep] for name, values in columns.items()}
+        if pack_tokens:
+            batches = pack_batches(columns['tweet'], pack_tokens, overhead, batch_size if batch_size > 1 else None)
+        else:
+            n_rows = len(columns['id'])
+            batches = [list(range(i, min(i + batch_size, n_rows))) for i in range(0, n_rows, batch_size)]
+        for positions in batches:
+            batch_number += 1
+            batch_ids = [columns['id'][p] for p in positions]
+            batch_tweets = [columns['tweet'][p] for p in positions]
+            yield {
+                'key': f"rows-{batch_ids[0]}-{batch_ids[-1]}-{len(batch_ids)}",
+                'batch': batch_number,
+                'ids': batch_ids,
+                'tweets': batch_tweets,
+                'sentiments': [columns['sentiment'][p] for p in positions],
+                'airlines': [columns['airlines'][p] for p in positions],
+                'prompt': prompt_func(batch_tweets),
+                'max_tokens': batch_max_tokens(batch_tweets) if pack_tokens else 300 * len(batch_tweets),
+                'duplicates': [duplicates[p] for p in positions] if duplicates is not None else [[] for _ in positions],
+            }
+
+def run_entity_experiment(df: Dataset, n_samples: int, prompt_func: Callable, solution_path: str,
+                          concurrency: int = 1, completed: Optional[Set] = None, process: Optional[Callable] = None,
+                          fast_path: bool = False, dedup_threshold: Optional[float] = None,
+                          execute: Callable = execute_jobs) -> dict:
     """Run entity extraction experiment on tweets.
     
     Args:
-        df: DataFrame containing tweets and true airline mentions
+        df: DataFrame or Archive containing tweets and true airline mentions
         n_samples: Number of samples to process
         prompt_func: Function to generate the prompt for each tweet
         solution_path: Path to save the results
+        concurrency: Maximum number of API requests in flight
+        completed: Keys of records already written by an interrupted run (resume mode)
+        process: Optional coroutine function producing each job's response (default: call the API)
+        fast_path: Resolve unambiguous tweets with the local alias matcher and only send the rest to the model
+        dedup_threshold: If set, send one request per group of duplicate tweets and reuse its answer
+        execute: Function running (jobs, handle, concurrency, process) to completion (default: execute_jobs)
+        
+    Returns:
+        Run statistics from the executor
     """
-    with open(solution_path, 'w') as f:
-        for i, (_, row) in enumerate(df.iterrows()):
-            if i >= n_samples:
-                break
-            tweet = row['tweet']
-            true_airlines = get_true_airlines(row)
-            prompt = prompt_func(tweet)
-            response = call_api(prompt)
+    with CheckpointWriter(solution_path, append=bool(completed)) as f:
+        def handle(job, response):
             predicted_airlines = parse_entity_response_clean(response)
-            write_result(f, tweet, true_airlines, predicted_airlines)
-            print(f"{i+1}/{n_samples} | True: {true_airlines} | Pred: {predicted_airlines}")
-            time.sleep(0.3)
+            if response:
+                record_parse(job, isinstance(clean_json_response(response), dict))
+            write_result(f, job['tweet'], job['true_airlines'], predicted_airlines, job['id'])
+            print(f"{job['index']+1}/{n_samples} | True: {job['true_airlines']} | Pred: {predicted_airlines}")
 
-def run_sentiment_experiment(df: pd.DataFrame, n_samples: int, prompt_func: Callable, solution_path: str):
+        stats = execute(entity_jobs(df, n_samples, prompt_func, completed, fast_path, dedup_threshold), handle, concurrency, process)
+        if fast_path:
+            stats['fast_path'] = {'local': stats['local'], 'llm': stats['requests']}
+        if dedup_threshold is not None:
+            stats['dedup'] = {'items': stats['jobs'], 'shared': stats['deduplicated']}
+        return stats
+
+def run_sentiment_experiment(df: Dataset, n_samples: int, prompt_func: Callable, solution_path: str,
+                             concurrency: int = 1, completed: Optional[Set] = None, process: Optional[Callable] = None,
+                             dedup_threshold: Optional[float] = None, cascade: Optional[Cascade] = None,
+                             execute: Callable = execute_jobs) -> dict:
     """Run sentiment analysis experiment on tweets.
     
     Args:
-        df: DataFrame containing tweets and true sentiment labels
+        df: DataFrame or Archive containing tweets and true sentiment labels
         n_samples: Number of samples to process
-        prompt_func: Function to generate the prompt for each tweet-airline pair
+        prompt_func: Function to generate the prompt for each tweet-airline pair (or tweet-airlines list)
         solution_path: Path to save the results
+        concurrency: Maximum number of API requests in flight
+        completed: Keys of records already written by an interrupted run (resume mode)
+        process: Optional coroutine function producing each job's response (default: call the API)
+        dedup_threshold: If set, send one request per group of duplicate tweets and reuse its answer
+        cascade: Answer tweets the local model is confident about locally and only send the rest to the model
+        execute: Function running (jobs, handle, concurrency, process) to completion (default: execute_jobs)
+        
+    Returns:
+        Run statistics from the executor
     """
-    with open(solution_path, 'w') as f:
-        for i, (_, row) in enumerate(df.iterrows()):
-            if i >= n_samples:
-                break
-            tweet = row['tweet']
-            true_sentiment = row['sentiment']
-            true_airlines = get_true_airlines(row)
-            for airline in true_airlines:
-                prompt = prompt_func(tweet, airline)
-                response = call_api(prompt)
-                predicted_sentiment = parse_sentiment_response(response)
-                write_result(f, {'tweet': tweet, 'airline': airline}, true_sentiment, predicted_sentiment)
-                print(f"{i+1}/{n_samples} | Airline: {airline} | True: {true_sentiment} | Pred: {predicted_sentiment}")
-                time.sleep(0.3)
-
-def run_combined_experiment(df: pd.DataFrame, n_samples: int, batch_size: int, prompt_func: Callable, solution_path: str):
+    with CheckpointWriter(solution_path, append=bool(completed)) as f:
+        def handle(job, response):
+            if 'pending' in job:
+                predicted = parse_multi_sentiment_response(response, job['airlines'])
+            else:
+                predicted = {job['airline']: parse_sentiment_response(response)}
+            if response:
+                record_parse(job, all(predicted[airline] != "unknown" for airline in job.get('pending', [job.get('airline')])))
+            # Multi-airline jobs still write one record per (tweet, airline) pair
+            for airline in job.get('pending', [job.get('airline')]):
+                write_result(f, {'tweet': job['tweet'], 'airline': airline}, job['true_sentiment'], predicted[airline], job['id'])
+                print(f"{job['index']+1}/{n_samples} | Airline: {airline} | True: {job['true_sentiment']} | Pred: {predicted[airline]}")
+
+        stats = execute(sentiment_jobs(df, n_samples, prompt_func, completed, dedup_threshold, cascade), handle,
+                        concurrency, process)
+        if cascade is not None:
+            stats['cascade'] = {'local': stats['local'], 'llm': stats['requests']}
+        if dedup_threshold is not None:
+            stats['dedup'] = {'items': stats['jobs'], 'shared': stats['deduplicated']}
+        return stats
+
+def run_combined_experiment(df: Dataset, n_samples: int, batch_size: int, prompt_func: Callable, solution_path: str,
+                            concurrency: int = 1, completed: Optional[Set] = None, process: Optional[Callable] = None,
+                            pack_tokens: Optional[int] = None, dedup_threshold: Optional[float] = None,
+                            execute: Callable = execute_jobs) -> dict:
     """Run combined entity extraction and sentiment analysis experiment.
     
     Args:
-        df: DataFrame containing tweets and true labels
+        df: DataFrame or Archive containing tweets and true labels
         n_samples: Number of samples to process
         batch_size: Number of tweets to process in each batch
         prompt_func: Function to generate the prompt for tweets
         solution_path: Path to save the results
+        concurrency: Maximum number of API requests in flight
+        completed: Keys of records already written by an interrupted run (resume mode)
+        process: Optional coroutine function producing each job's response (default: call the API)
+        pack_tokens: If set, pack batches up to this many estimated prompt + completion tokens
+        dedup_threshold: If set, send each group of duplicate tweets once and reuse its answer
+        execute: Function running (jobs, handle, concurrency, process) to completion (default: execute_jobs)
+        
+    Returns:
+        Run statistics from the executor
     """
-    with open(solution_path, 'w') as f:
-        if batch_size == 1:
-            for i, (_, row) in enumerate(df.iterrows()):
-                if i >= n_samples:
-                    break
-                tweet = row['tweet']
-                true_sentiment = row['sentiment']
-                true_airlines = get_true_airlines(row)
-                prompt = prompt_func(tweet)
-                response = call_api(prompt)
-                # Clean the response: remove markdown and parse JSON
-                if response.startswith('```'):
-                    lines = response.split('\n')
-                    json_lines = [line for line in lines if line.strip() and not line.strip().startswith('```')]
-                    if json_lines:
-                        response = '\n'.join(json_lines)
+    jobs = combined_jobs(df, n_samples, batch_size, prompt_func, completed, pack_tokens, dedup_threshold)
+    with CheckpointWriter(solution_path, append=bool(completed)) as f:
+        if batch_size == 1 and not pack_tokens:
+            def handle(job, response):
+                output_json = clean_json_response(response)
+                if response:
+                    record_parse(job, isinstance(output_json, dict))
+                write_result(f, job['tweet'], {'sentiment': job['true_sentiment'], 'airlines': job['true_airlines']}, output_json, job['id'])
+                print(f"{job['index']+1}/{n_samples} | Tweet: {job['tweet'][:50]}... | Response: {str(response)[:50]}...")
+
+            stats = execute(jobs, handle, concurrency, process)
+            if dedup_threshold is not None:
+                stats['dedup'] = {'items': stats['jobs'], 'shared': stats['deduplicated']}
+            return stats
+
+        recovery = {'salvaged': 0, 'retried': 0, 'unrecovered': 0}
+        dedup = {'items': 0, 'shared': 0}
+        fetch = process or call_prompt
+
+        async def process_batch(job):
+            # Offline (ingested) responses are salvaged but never re-dispatched to the API
+            return await recover_batch(job['tweets'], await fetch(job), prompt_func, redispatch=process is None,
+                                       slots=held_slots())
+
+        def handle(job, recovered):
+            for key, count in recovered['counts'].items():
+                recovery[key] += count
+            record_parse(job, recovered['counts']['unrecovered'] == 0)
+            for j, (row_id, tweet, true_sentiment, true_airlines, output) in enumerate(zip(job['ids'], job['tweets'], job['sentiments'], job['airlines'], recovered['results'])):
+                write_result(f, tweet, {'sentiment': true_sentiment, 'airlines': true_airlines}, output, row_id)
+                print(f"Batch {job['batch']}, {j+1}/{len(job['tweets'])} | Tweet: {tweet[:50]}... | Output: {str(output)[:50]}...")
+                for duplicate in job['duplicates'][j]:
+                    write_result(f, duplicate['tweet'], {'sentiment': duplicate['sentiment'], 'airlines': duplicate['airlines']},
+                                 output, duplicate['id'])
+                dedup['items'] += 1 + len(job['duplicates'][j])
+                dedup['shared'] += len(job['duplicates'][j])
+
+        stats = execute(jobs, handle, concurrency, process_batch)
+        stats['batch_recovery'] = recovery
+        if dedup_threshold is not None:
+            stats['dedup'] = dedup
+        return stats
+
+def run_stream(source: str, prompt_func: Callable, batch_size: int, max_wait: float, concurrency: int = 1,
+               output=None, poll_interval: float = 0.5) -> dict:
+    """Classify a live stream of tweets with micro-batched combined prompts.
+    
+    Tweets are read from stdin or a followed JSONL/CSV file, grouped into
+    batches of up to batch_size tweets or whatever arrived within max_wait
+    seconds, and written out in arrival order as soon as their batch returns.
+    Every buffer is bounded, so a slow API slows the reader instead of
+    growing memory.
+    
+    Args:
+        source: '-' for stdin, otherwise a JSONL or CSV file to follow
+        prompt_func: Batch prompt function (from COMBINED_BATCH_PROMPT_FUNCS)
+        batch_size: Maximum tweets per request
+        max_wait: Maximum seconds a tweet waits for its batch to fill
+        concurrency: Maximum batches in flight
+        output: Text file receiving one JSON result per line (default: stdout)
+        poll_interval: Seconds between checks for new lines when following a file
+        
+    Returns:
+        Micro-batcher statistics
+    """
+    output = output or sys.stdout
+
+    async def classify(tweets):
+        return (await classify_batch(tweets, prompt_func))['results']
+
+    async def stream():
+        window = batch_size * max(1, concurrency)
+        batcher = MicroBatcher(classify, batch_size, max_wait, concurrency, max_queue=window * 2)
+        batching = await batcher.start()
+        pending = asyncio.Queue(maxsize=window * 4)
+
+        async def emit():
+            while True:
+                entry = await pending.get()
+                if entry is None:
+                    return
+                record, result = entry
                 try:
-                    output_json = json.loads(response)
-                except Exception:
-                    output_json = response
-                write_result(f, tweet, {'sentiment': true_sentiment, 'airlines': true_airlines}, output_json)
-                print(f"{i+1}/{n_samples} | Tweet: {tweet[:50]}... | Response: {str(response)[:50]}...")
-                time.sleep(0.3)
-        else:
-            for i in range(0, len(df), batch_size):
-                if i >= n_samples:
-                    break
-                    
-                batch_df = df.iloc[i:i+batch_size]
-                batch_tweets = batch_df['tweet'].tolist()
-                batch_sentiments = batch_df['sentiment'].tolist()
-                batch_airlines = [get_true_airlines(row) for _, row in batch_df.iterrows()]
-                
-                # Get response from API
-                prompt = prompt_func(batch_tweets)
-                response = call_api(prompt, max_tokens=300 * len(batch_tweets))
-                
-                # Parse results
-                batch_results = parse_batch_response(response, batch_tweets)
-                
-                # Save results
-                for j, (tweet, true_sentiment, true_airlines, output) in enumerate(zip(batch_tweets, batch_sentiments, batch_airlines, batch_results)):
-                    if i + j >= n_samples:
-                        break
-                        
-                    write_result(f, tweet, {'sentiment': true_sentiment, 'airlines': true_airlines}, output)
-                    print(f"Batch {i//batch_size+1}, {j+1}/{len(batch_tweets)} | Tweet: {tweet[:50]}... | Output: {str(output)[:50]}...")
-                time.sleep(0.5)
+                    line = {'id': record['id'], 'input': record['tweet'], 'output': await result}
+                except Exception as e:
+                    line = {'id': record['id'], 'input': record['tweet'], 'error': str(e)}
+                output.write(json.dumps(line) + '\n')
+                output.flush()
+
+        emitter = asyncio.ensure_future(emit())
+        try:
+            async for record in iterate_in_thread(open_stream(source, poll_interval), max_buffer=window):
+                await pending.put((record, asyncio.ensure_future(batcher.submit(record['tweet']))))
+        finally:
+            await pending.put(None)
+            await emitter
+            await batcher.close()
+            await batching
+        return batcher.stats()
+
+    return asyncio.run(stream())
+
+def experiment_jobs(experiment: str, df: Dataset, n_samples: int, batch_size: int,
+                    pack_tokens: Optional[int] = None, fast_path: bool = False,
+                    dedup_threshold: Optional[float] = None, cascade: Optional[Cascade] = None) -> Iterator[dict]:
+    """Generate the jobs for an experiment by name, without running them.
+    
+    Args:
+        experiment: Experiment name from one of the *_PROMPT_FUNCS registries
+        df: DataFrame or Archive containing tweets and true labels
+        n_samples: Number of samples to process
+        batch_size: Number of tweets to process in each batch (combined experiments only)
+        pack_tokens: If set, pack combined batches up to this many estimated tokens
+        fast_path: Resolve unambiguous entity tweets locally (entity experiments only)
+        dedup_threshold: If set, mark duplicate tweets so only one request per group is sent
+        cascade: Answer confident tweets with the local model (sentiment experiments only)
+        
+    Returns:
+        Iterator over the experiment's jobs
+    """
+    if experiment in ENTITY_PROMPT_FUNCS:
+        return entity_jobs(df, n_samples, ENTITY_PROMPT_FUNCS[experiment], fast_path=fast_path, dedup_threshold=dedup_threshold)
+    if experiment in SENTIMENT_PROMPT_FUNCS:
+        return sentiment_jobs(df, n_samples, SENTIMENT_PROMPT_FUNCS[experiment], dedup_threshold=dedup_threshold,
+                              cascade=cascade)
+    if experiment in COMBINED_PROMPT_FUNCS:
+        return combined_jobs(df, n_samples, batch_size, COMBINED_PROMPT_FUNCS[experiment], pack_tokens=pack_tokens,
+                             dedup_threshold=dedup_threshold)
+    raise KeyError(experiment)
 
 def main():
     """Main entry point for running experiments.
@@ -137,33 +507,261 @@ def main():
     start_time = time.time()
     
     parser = argparse.ArgumentParser(description="Run prompt experiment.")
-    parser.add_argument("--experiment", default="combined_v1", help="Experiment name (entity_v1, entity_v2_standardized, entity_v3_examples, sentiment_v1_basic, sentiment_v2_context_aware, combined_v1, combined_batch_v1)")
+    parser.add_argument("--experiment", default="combined_v1", help="Experiment name (entity_v1, entity_v2_standardized, entity_v3_examples, sentiment_v1_basic, sentiment_v2_context_aware, sentiment_v3_multi_airline, combined_v1, combined_batch_v1; add _prefix for the prefix-cached layout, e.g. combined_batch_v1_prefix)")
     parser.add_argument("--n_samples", type=int, default=None, help="Number of samples (default: use full dataset)")
     parser.add_argument("--batch_size", type=int, default=1, help="Batch size for processing (default: 1)")
     parser.add_argument("--test", action="store_true", help="Use test dataset instead of train dataset")
+    parser.add_argument("--archive", metavar="PATH", default=None, help="Read tweets from a CSV or JSONL archive (optionally .gz) in fixed-size chunks instead of the train/test CSV; with --n_samples, rows are reservoir-sampled in one pass")
+    parser.add_argument("--chunk_size", type=int, default=ARCHIVE_CHUNK_SIZE, help=f"Rows per chunk when reading an --archive (default: {ARCHIVE_CHUNK_SIZE})")
+    parser.add_argument("--pack_tokens", type=int, default=None, help="Pack combined batches up to this many estimated prompt + completion tokens; --batch_size caps tweets per batch")
+    parser.add_argument("--dedup", action="store_true", help="Send one request per group of duplicate or near-duplicate tweets and reuse its answer for the rest")
+    parser.add_argument("--dedup_threshold", type=float, default=DEFAULT_DEDUP_THRESHOLD, help=f"Minimum word-shingle Jaccard similarity for near duplicates with --dedup, 1.0 for exact (normalised) duplicates only (default: {DEFAULT_DEDUP_THRESHOLD})")
+    parser.add_argument("--entity_fast_path", action="store_true", help="Resolve unambiguous airline mentions locally and only send ambiguous tweets to the model (entity experiments)")
+    parser.add_argument("--cascade", action="store_true", help="Answer tweets a local sentiment model is confident about locally and only send the rest to the model (sentiment experiments)")
+    parser.add_argument("--cascade_target_accuracy", type=float, default=DEFAULT_TARGET_ACCURACY, help=f"Accuracy the locally answered tweets must reach on held-out train folds; sets the cascade's confidence threshold (default: {DEFAULT_TARGET_ACCURACY})")
+    parser.add_argument("--concurrency", type=int, default=1, help="Maximum number of API requests in flight (default: 1)")
+    parser.add_argument("--rpm", type=float, default=500, help="Requests-per-minute budget, 0 to disable (default: 500)")
+    parser.add_argument("--tpm", type=float, default=200000, help="Tokens-per-minute budget, 0 to disable (default: 200000)")
+    parser.add_argument("--hedge_quantile", type=float, default=None, help="Send a duplicate request when one runs past this percentile (e.g. 95) of recent latencies and use the first response (default: off)")
+    parser.add_argument("--hedge_max_rate", type=float, default=0.05, help="Maximum duplicate requests as a fraction of all requests when hedging (default: 0.05)")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off", help="Response cache mode (default: off)")
+    parser.add_argument("--cache_path", default=DEFAULT_CACHE_PATH, help=f"Response cache database (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--shard", metavar="I/N", default=None, help="Process only shard I of N (0-based) of the sampled rows, partitioned by a stable hash of the row id; combine shard directories with python -m evals.merge")
+    parser.add_argument("--results_dir", default="evals/results", help="Parent directory for output directories (default: evals/results)")
+    parser.add_argument("--no_index", action="store_true", help="Do not add the finished run to the results index (RESULTS_DIR/index.sqlite)")
+    parser.add_argument("--resume", metavar="OUTPUT_DIR", default=None, help="Resume an interrupted run in an existing output directory")
+    parser.add_argument("--offline_batch", action="store_true", help="Write all prompts as an OpenAI Batch API input file instead of calling the API")
+    parser.add_argument("--ingest_batch", metavar="OUTPUT_DIR", default=None, help="Parse Batch API results for an --offline_batch output directory")
+    parser.add_argument("--batch_results", default=None, help="Batch API output file to ingest (default: OUTPUT_DIR/batch_output.jsonl)")
+    parser.add_argument("--stream", metavar="SOURCE", default=None, help="Classify a live stream from stdin ('-') or a growing JSONL/CSV file instead of the dataset")
+    parser.add_argument("--max_wait", type=float, default=0.5, help="Seconds a streamed tweet waits for its micro-batch to fill (default: 0.5)")
+    parser.add_argument("--stream_output", default=None, help="Append streamed results to this JSONL file instead of stdout")
     args = parser.parse_args()
 
+    completed = None
+    process = None
+    existing_dir = args.resume or args.ingest_batch
+    if existing_dir:
+        # Restore the original run parameters so the same rows are sampled
+        config = load_run_config(existing_dir)
+        for key in ('experiment', 'n_samples', 'batch_size', 'test', 'archive', 'chunk_size', 'pack_tokens',
+                    'entity_fast_path', 'dedup_threshold', 'cascade_target_accuracy', 'shard'):
+            setattr(args, key, config.get(key))
+    else:
+        if args.archive and args.test:
+            parser.error("--archive replaces the train/test CSV; drop --test")
+        if not args.dedup:
+            args.dedup_threshold = None
+        if not args.cascade:
+            args.cascade_target_accuracy = None
+    # Validate the experiment before creating an output directory or loading data
+    prompt_funcs = {**ENTITY_PROMPT_FUNCS, **SENTIMENT_PROMPT_FUNCS, **COMBINED_PROMPT_FUNCS}
+    if not args.stream and args.experiment not in prompt_funcs:
+        parser.error(f"experiment '{args.experiment}' not found. Available: {list(prompt_funcs.keys())}")
+    if not existing_dir and args.entity_fast_path and (args.stream or args.experiment not in ENTITY_PROMPT_FUNCS):
+        parser.error("--entity_fast_path only applies to entity experiments")
+    if not existing_dir and args.cascade and (args.stream or args.experiment not in SENTIMENT_PROMPT_FUNCS):
+        parser.error("--cascade only applies to sentiment experiments")
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    configure_rate_limit(args.rpm, args.tpm)
+    configure_cache(args.cache, args.cache_path)
+    configure_hedging(args.hedge_quantile, args.hedge_max_rate)
+
+    if args.stream:
+        if args.stream != "-" and not os.path.isfile(args.stream):
+            parser.error(f"--stream: no such file: {args.stream}")
+        if args.experiment not in COMBINED_BATCH_PROMPT_FUNCS:
+            print(f"Streaming needs a batch prompt ({list(COMBINED_BATCH_PROMPT_FUNCS.keys())}); using combined_batch_v1", file=sys.stderr)
+            args.experiment = "combined_batch_v1"
+        output = open(args.stream_output, 'a') if args.stream_output else sys.stdout
+        try:
+            # Results own stdout; progress and error messages go to stderr
+            with contextlib.redirect_stdout(sys.stderr):
+                stream_stats = run_stream(args.stream, COMBINED_BATCH_PROMPT_FUNCS[args.experiment], args.batch_size,
+                                          args.max_wait, args.concurrency, output)
+            latency = stream_stats['latency']
+            print(f"Streamed {stream_stats['items']} tweets in {stream_stats['batches']} batches "
+                  f"(mean {stream_stats['mean_batch_size']:.1f} per batch) | latency p50 {latency['p50']:.2f}s | "
+                  f"p95 {latency['p95']:.2f}s", file=sys.stderr)
+        except KeyboardInterrupt:
+            print("Stream stopped", file=sys.stderr)
+        finally:
+            if args.stream_output:
+                output.close()
+            configure_cache("off")
+        return
+
     # Create output directory
-    output_dir = create_output_dir(args.experiment, args.n_samples, args.batch_size, args.test)
-    solution_path = os.path.join(output_dir, "solution.jsonl")
+    if args.resume:
+        output_dir = args.resume
+        solution_path = os.path.join(output_dir, "solution.jsonl")
+        completed = load_completed(solution_path)
+        print(f"Resuming {output_dir}: {len(completed)} records already complete")
+    elif args.ingest_batch:
+        output_dir = args.ingest_batch
+        solution_path = os.path.join(output_dir, "solution.jsonl")
+        results_path = args.batch_results or os.path.join(output_dir, "batch_output.jsonl")
+        results = read_batch_results(results_path)
+        process = batch_results_processor(results)
+        print(f"Ingesting {len(results)} batch results from {results_path}")
+    else:
+        output_dir = create_output_dir(args.experiment, args.n_samples, args.batch_size, args.test, args.results_dir, shard)
+        solution_path = os.path.join(output_dir, "solution.jsonl")
+        save_run_config(output_dir, {'experiment': args.experiment, 'n_samples': args.n_samples,
+                                     'batch_size': args.batch_size, 'test': args.test, 'archive': args.archive,
+                                     'chunk_size': args.chunk_size, 'pack_tokens': args.pack_tokens,
+                                     'entity_fast_path': args.entity_fast_path, 'dedup_threshold': args.dedup_threshold,
+                                     'cascade_target_accuracy': args.cascade_target_accuracy, 'shard': args.shard})
 
     # Load data
-    dataset_type = "test" if args.test else "train"
-    df = load_dataset(dataset_type, args.n_samples)
-    if args.n_samples is None:
-        args.n_samples = len(df)  # Set n_samples to full dataset length
+    if args.archive:
+        # Read lazily chunk by chunk; len() samples the archive or counts its rows in one pass
+        dataset_type = args.archive
+        df = Archive(args.archive, args.n_samples, args.chunk_size or ARCHIVE_CHUNK_SIZE, shard)
+        args.n_samples = len(df)
+        print(f"Archive {args.archive}: {args.n_samples} rows{f' (shard {args.shard})' if shard else ''} "
+              f"in chunks of {df.chunk_size}")
+    else:
+        dataset_type = "test" if args.test else "train"
+        df = load_dataset(dataset_type, args.n_samples)
+        if shard is not None:
+            # Sample first, then partition, so the shards of a run cover exactly the unsharded sample
+            df = select_shard(df, *shard)
+            args.n_samples = len(df)
+            print(f"Shard {args.shard}: {len(df)} rows")
+        if args.n_samples is None:
+            args.n_samples = len(df)  # Set n_samples to full dataset length
 
-    # Run experiment
-    if args.experiment in ENTITY_PROMPT_FUNCS:
-        run_entity_experiment(df, args.n_samples, ENTITY_PROMPT_FUNCS[args.experiment], solution_path)
+    cascade = None
+    if args.cascade_target_accuracy is not None and args.experiment in SENTIMENT_PROMPT_FUNCS:
+        # Refitted on every run (a few seconds); the model is deterministic, so a resumed or
+        # ingested run answers the same tweets locally
+        cascade = fit_cascade(args.cascade_target_accuracy)
+        print(f"Cascade threshold {cascade.threshold:.3f} (target accuracy {cascade.target_accuracy:.1%})")
+        if not args.test and not args.archive:
+            print("Warning: the cascade's local model is trained on the train set; use --test for a fair comparison")
+
+    if args.offline_batch:
+        jobs = experiment_jobs(args.experiment, df, args.n_samples, args.batch_size, args.pack_tokens, args.entity_fast_path,
+                               args.dedup_threshold, cascade)
+        batch_path = os.path.join(output_dir, "batch_input.jsonl")
+        # Tweets resolved by the entity fast path or the cascade are re-resolved locally at ingest time
+        count = write_batch_file((job for job in jobs if 'local' not in job), batch_path)
+        print(f"Wrote {count} batch requests to {batch_path}")
+        print(f"Submit it to the Batch API, save the output as {os.path.join(output_dir, 'batch_output.jsonl')}, "
+              f"then run: python experiment_runner.py --ingest_batch {output_dir}")
+        return
+
+    # Tag every API call of this run so prompt variants can be compared on cost and speed
+    prompt_func = prompt_funcs[args.experiment]
+    configure_metrics({'experiment': args.experiment, 'prompt_func': prompt_func.__name__,
+                       'batch_size': args.batch_size})
+    # The static prefix does not depend on the tweet, so an empty sample shows its length
+    if args.experiment in COMBINED_BATCH_PROMPT_FUNCS:
+        sample_prompt = prompt_func([])
+    elif args.experiment in MULTI_SENTIMENT_PROMPT_FUNCS:
+        sample_prompt = prompt_func("", [])
     elif args.experiment in SENTIMENT_PROMPT_FUNCS:
-        run_sentiment_experiment(df, args.n_samples, SENTIMENT_PROMPT_FUNCS[args.experiment], solution_path)
-    elif args.experiment in COMBINED_PROMPT_FUNCS:
-        run_combined_experiment(df, args.n_samples, args.batch_size, COMBINED_PROMPT_FUNCS[args.experiment], solution_path)
+        sample_prompt = prompt_func("", "")
     else:
-        print(f"Experiment '{args.experiment}' not found. Available: "
-              f"{list(ENTITY_PROMPT_FUNCS.keys()) + list(SENTIMENT_PROMPT_FUNCS.keys()) + list(COMBINED_PROMPT_FUNCS.keys())}")
+        sample_prompt = prompt_func("")
+    warning = prefix_cache_warning(sample_prompt)
+    if warning:
+        print(warning)
+    calls_path = os.path.join(output_dir, "calls.csv")
+    resumed_calls = 0
+    if args.resume and os.path.exists(calls_path):
+        # Cost, tokens and latency cover the whole run, not just the calls since the restart
+        resumed_calls = api.metrics.load_calls_csv(calls_path)
+        print(f"Loaded {resumed_calls} calls from the interrupted run")
+
+    # Run experiment
+    stats = None
+    try:
+        if args.experiment in ENTITY_PROMPT_FUNCS:
+            stats = run_entity_experiment(df, args.n_samples, ENTITY_PROMPT_FUNCS[args.experiment], solution_path, args.concurrency, completed, process,
+                                          args.entity_fast_path, args.dedup_threshold)
+        elif args.experiment in SENTIMENT_PROMPT_FUNCS:
+            stats = run_sentiment_experiment(df, args.n_samples, SENTIMENT_PROMPT_FUNCS[args.experiment], solution_path, args.concurrency, completed, process,
+                                             args.dedup_threshold, cascade)
+        else:
+            stats = run_combined_experiment(df, args.n_samples, args.batch_size, COMBINED_PROMPT_FUNCS[args.experiment], solution_path, args.concurrency, completed, process, args.pack_tokens,
+                                            args.dedup_threshold)
+    except BaseException:
+        # Keep the calls made so far for --resume
+        api.metrics.write_calls(output_dir)
+        raise
 
+    if stats is not None:
+        print(f"API requests: {stats['requests']} | Concurrency: {args.concurrency} | "
+              f"Throughput: {stats['requests_per_sec']:.2f} requests/sec")
+        if 'fast_path' in stats:
+            routing = stats['fast_path']
+            total = routing['local'] + routing['llm']
+            print(f"Entity fast path: {routing['local']}/{total} tweets resolved locally "
+                  f"({routing['local'] / max(total, 1):.1%} of calls avoided)")
+        if 'cascade' in stats:
+            routing = stats['cascade']
+            total = routing['local'] + routing['llm']
+            print(f"Cascade (threshold {cascade.threshold:.3f}): {routing['local']}/{total} answered locally "
+                  f"({routing['llm'] / max(total, 1):.1%} routed to the model)")
+        if 'dedup' in stats:
+            dedup = stats['dedup']
+            print(f"Dedup: {dedup['shared']}/{dedup['items']} answered from a duplicate's request "
+                  f"({dedup['shared'] / max(dedup['items'], 1):.1%} fewer sent to the model)")
+        if 'batch_recovery' in stats:
+            recovery = stats['batch_recovery']
+            print(f"Batch recovery: {recovery['salvaged']} salvaged | {recovery['retried']} retried | "
+                  f"{recovery['unrecovered']} unrecovered")
+    if api.hedger is not None:
+        hedge_stats = api.hedger.stats()
+        print(f"Hedging (p{args.hedge_quantile:g}): {hedge_stats['hedged']}/{hedge_stats['requests']} requests hedged "
+              f"({hedge_stats['hedge_rate']:.1%}) | {hedge_stats['won']} won by the duplicate")
+    if api.cache is not None:
+        cache_stats = api.cache.stats()
+        print(f"Cache ({args.cache}): {cache_stats['hits']} hits | {cache_stats['misses']} misses | "
+              f"hit rate {cache_stats['hit_rate']:.1%}")
+        configure_cache("off")
+    if stats is not None:
+        n_tweets = args.n_samples - len({key[0] for key in completed or ()})
+        print(format_report(api.metrics.write(output_dir, args.n_samples if resumed_calls else n_tweets)))
+        summary = {
+            'experiment': args.experiment,
+            'dataset': dataset_type,
+            'n_samples': args.n_samples,
+            'batch_size': args.batch_size,
+            'shard': args.shard,
+            'concurrency': args.concurrency,
+            'elapsed': stats['elapsed'],
+            'requests': stats['requests'],
+            'requests_per_sec': stats['requests_per_sec'],
+            'tweets_per_sec': n_tweets / stats['elapsed'] if stats['elapsed'] > 0 else 0.0,
+            'latency': latency_summary(stats['latencies']),
+        }
+        for key in ('fast_path', 'cascade', 'dedup', 'batch_recovery'):
+            if key in stats:
+                summary[key] = stats[key]
+        if cascade is not None:
+            summary['cascade_threshold'] = cascade.threshold
+        if args.cache != "off":
+            summary['cache'] = cache_stats
+        if api.hedger is not None:
+            summary['hedging'] = hedge_stats
+        write_run_summary(output_dir, summary)
+        if not args.no_index:
+            # Deferred to keep --help fast
+            import sqlite3
+            from evals.results_index import index_run_dir
+            try:
+                index_run_dir(output_dir)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"Could not update the results index: {e}")
     print(f"Saved solution to {output_dir}")
     print(f"Total runtime: {time.time() - start_time:.2f} seconds")
 
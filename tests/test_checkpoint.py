@@ -0,0 +1,59 @@
+"""Tests for evals.utils.checkpoint."""
+
+import json
+
+from evals.utils.checkpoint import CheckpointWriter, load_completed, record_key, repair_jsonl
+
+def write_lines(path, *lines):
+    with open(path, 'w') as f:
+        f.write(''.join(lines))
+
+def test_repair_leaves_complete_files_alone(tmp_path):
+    path = tmp_path / "solution.jsonl"
+    write_lines(path, '{"id": 1}\n', '{"id": 2}\n')
+    assert repair_jsonl(str(path)) == 0
+    assert path.read_text() == '{"id": 1}\n{"id": 2}\n'
+
+def test_repair_truncates_a_torn_last_line(tmp_path):
+    path = tmp_path / "solution.jsonl"
+    write_lines(path, '{"id": 1}\n', '{"id": 2, "inp')
+    assert repair_jsonl(str(path)) == len('{"id": 2, "inp')
+    assert path.read_text() == '{"id": 1}\n'
+
+def test_repair_drops_invalid_newline_terminated_lines(tmp_path):
+    path = tmp_path / "solution.jsonl"
+    write_lines(path, '{"id": 1}\n', '{"id": \n', '{"i')
+    repair_jsonl(str(path))
+    assert path.read_text() == '{"id": 1}\n'
+
+def test_repair_empties_a_file_without_valid_lines(tmp_path):
+    path = tmp_path / "solution.jsonl"
+    write_lines(path, 'garbage\n')
+    repair_jsonl(str(path))
+    assert path.read_text() == ''
+
+def test_repair_ignores_missing_files(tmp_path):
+    assert repair_jsonl(str(tmp_path / "missing.jsonl")) == 0
+
+def test_load_completed_keys_records_by_id_and_airline(tmp_path):
+    path = tmp_path / "solution.jsonl"
+    write_lines(path,
+                json.dumps({"id": 1, "input": "tweet"}) + '\n',
+                json.dumps({"id": 2, "input": {"tweet": "tweet", "airline": "Delta"}}) + '\n',
+                json.dumps({"input": "no id"}) + '\n',
+                '{"id": 3, "inp')
+    assert load_completed(str(path)) == {record_key(1), record_key(2, "Delta")}
+
+def test_writer_appends_after_repairing(tmp_path):
+    path = tmp_path / "solution.jsonl"
+    write_lines(path, '{"id": 1}\n', '{"id": 2')
+    with CheckpointWriter(str(path), append=True, sync_every=1) as f:
+        f.write('{"id": 2}\n')
+    assert path.read_text() == '{"id": 1}\n{"id": 2}\n'
+
+def test_writer_truncates_without_append(tmp_path):
+    path = tmp_path / "solution.jsonl"
+    write_lines(path, '{"id": 1}\n')
+    with CheckpointWriter(str(path)) as f:
+        f.write('{"id": 9}\n')
+    assert path.read_text() == '{"id": 9}\n'
@@ -0,0 +1,24 @@
+"""Tests for dataset sampling in evals.utils.data."""
+
+from evals.utils.data import reservoir_sample
+
+def test_reservoir_sample_returns_short_streams_whole():
+    assert reservoir_sample(iter(range(5)), 10) == list(range(5))
+    assert reservoir_sample(range(5), 0) == []
+
+def test_reservoir_sample_keeps_stream_order():
+    sample = reservoir_sample(range(10_000), 100)
+    assert len(sample) == 100 == len(set(sample))
+    assert sample == sorted(sample)
+
+def test_reservoir_sample_depends_only_on_seed_and_stream():
+    assert reservoir_sample(range(10_000), 50, seed=1) == reservoir_sample(iter(list(range(10_000))), 50, seed=1)
+    assert reservoir_sample(range(10_000), 50, seed=1) != reservoir_sample(range(10_000), 50, seed=2)
+
+def test_reservoir_sample_is_roughly_uniform():
+    # Each item of a 20-item stream should be picked about k/n = 25% of the time
+    counts = [0] * 20
+    for seed in range(2000):
+        for item in reservoir_sample(range(20), 5, seed=seed):
+            counts[item] += 1
+    assert all(350 < count < 650 for count in counts)
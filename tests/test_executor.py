@@ -0,0 +1,83 @@
+"""Tests for evals.utils.executor."""
+
+import asyncio
+
+from evals.utils.executor import run_jobs
+
+def run(jobs, concurrency=4):
+    """Run jobs whose result is their 'value' after 'delay' seconds; return (handled, processed, stats)."""
+    handled = []
+    processed = []
+
+    async def process(job):
+        processed.append(job['key'])
+        await asyncio.sleep(job.get('delay', 0))
+        return job['value']
+
+    stats = asyncio.run(run_jobs(jobs, lambda job, result: handled.append((job['key'], result)), concurrency, process))
+    return handled, processed, stats
+
+def test_results_are_handled_in_submission_order():
+    jobs = [{'key': i, 'value': i * 10, 'delay': 0.02 * (5 - i)} for i in range(6)]
+    handled, _, stats = run(jobs, concurrency=6)
+    assert handled == [(i, i * 10) for i in range(6)]
+    assert stats['jobs'] == 6 and stats['requests'] == 6 and len(stats['latencies']) == 6
+
+def test_concurrency_caps_requests_in_flight():
+    in_flight = []
+    peak = []
+
+    async def process(job):
+        in_flight.append(job)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(job)
+        return None
+
+    asyncio.run(run_jobs([{'key': i} for i in range(12)], lambda job, result: None, 3, process))
+    assert max(peak) == 3
+
+def test_duplicates_share_the_representative_result():
+    jobs = [{'key': 0, 'value': 'a', 'dedup': 'x'}, {'key': 1, 'value': 'b', 'dedup': 'y'},
+            {'key': 2, 'value': 'c', 'dedup': 'x'}, {'key': 3, 'value': 'd', 'dedup': None}]
+    handled, processed, stats = run(jobs)
+    assert handled == [(0, 'a'), (1, 'b'), (2, 'a'), (3, 'd')]
+    assert processed == [0, 1, 3]
+    assert stats['deduplicated'] == 1 and stats['requests'] == 3
+
+def test_dedup_keys_do_not_cross_scopes():
+    jobs = [{'key': 0, 'value': 'a', 'dedup': 'x', 'dedup_scope': 0},
+            {'key': 1, 'value': 'b', 'dedup': 'x', 'dedup_scope': 1},
+            {'key': 2, 'value': 'c', 'dedup': 'x', 'dedup_scope': 1}]
+    handled, processed, stats = run(jobs)
+    assert handled == [(0, 'a'), (1, 'b'), (2, 'b')]
+    assert processed == [0, 1]
+
+def test_local_responses_skip_processing_and_request_accounting():
+    jobs = [{'key': 0, 'value': 'a'}, {'key': 1, 'response': 'local'}, {'key': 2, 'value': 'c', 'delay': 0.01}]
+    handled, processed, stats = run(jobs)
+    assert handled == [(0, 'a'), (1, 'local'), (2, 'c')]
+    assert processed == [0, 2]
+    assert stats['local'] == 1 and stats['requests'] == 2 and len(stats['latencies']) == 2
+
+def test_jobs_are_pulled_lazily():
+    pulled = []
+
+    def jobs():
+        for i in range(100):
+            pulled.append(i)
+            yield {'key': i, 'value': i}
+
+    handled = []
+
+    async def process(job):
+        await asyncio.sleep(0)
+        return job['value']
+
+    def handle(job, result):
+        handled.append(result)
+        # Only a bounded lookahead of jobs is pulled ahead of the one being handled
+        assert len(pulled) - len(handled) <= 2 * 4
+
+    asyncio.run(run_jobs(jobs(), handle, 2, process))
+    assert handled == list(range(100))
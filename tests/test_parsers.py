@@ -0,0 +1,82 @@
+"""Tests for evals.utils.parsers."""
+
+import json
+
+from evals.utils.parsers import (parse_batch_response, parse_entity_response_clean, parse_multi_sentiment_response,
+                                 parse_sentiment_response, salvage_batch_response)
+
+def item(tweet=None, airlines=("United",), sentiment="negative"):
+    result = {"airlines": list(airlines), "sentiment": sentiment}
+    if tweet is not None:
+        result["tweet"] = tweet
+    return result
+
+def test_entity_response_strips_fences_and_wraps_strings():
+    assert parse_entity_response_clean('```json\n{"airlines": ["Delta"]}\n```') == ["Delta"]
+    assert parse_entity_response_clean('{"airlines": "Delta"}') == ["Delta"]
+    assert parse_entity_response_clean("not json") == []
+
+def test_sentiment_response_falls_back_to_keywords():
+    assert parse_sentiment_response('{"sentiment": " Positive "}') == "positive"
+    assert parse_sentiment_response('{"sentiment": "angry"}') == "unknown"
+    assert parse_sentiment_response("Sentiment: negative") == "negative"
+    assert parse_sentiment_response("no idea") == "unknown"
+
+def test_multi_sentiment_matches_airline_names_loosely():
+    response = json.dumps({"sentiments": {"US AIRWAYS": "negative", "delta": "Positive", "Other": "neutral"}})
+    assert parse_multi_sentiment_response(response, ["US Airways", "Delta", "United"]) == {
+        "US Airways": "negative", "Delta": "positive", "United": "unknown"}
+
+def test_multi_sentiment_accepts_list_and_single_airline_forms():
+    response = json.dumps([{"airline": "United", "sentiment": "neutral"}])
+    assert parse_multi_sentiment_response(response, ["United"]) == {"United": "neutral"}
+    assert parse_multi_sentiment_response('{"sentiment": "negative"}', ["Delta"]) == {"Delta": "negative"}
+
+def test_salvage_keeps_positional_items_in_order():
+    tweets = ["first tweet", "second tweet"]
+    response = json.dumps([item(sentiment="negative"), item(sentiment="positive")])
+    results = salvage_batch_response(response, tweets)
+    assert [result["sentiment"] for result in results] == ["negative", "positive"]
+
+def test_salvage_matches_echoed_tweets_out_of_order():
+    tweets = ["@united lost my bag", "@delta great crew"]
+    response = json.dumps([item("@delta  GREAT crew", ["Delta"], "positive"), item("@united lost my bag")])
+    results = salvage_batch_response(response, tweets)
+    assert results[0] == {"airlines": ["United"], "sentiment": "negative"}
+    assert results[1] == {"airlines": ["Delta"], "sentiment": "positive"}
+
+def test_salvage_matches_echo_prefixes_in_both_directions():
+    tweets = ["@united lost my bag again, third time this month", "@delta ok"]
+    # A shortened echo of the first tweet, and an echo that runs past the end of the second
+    response = json.dumps([item("@united lost my bag"), item("@delta ok thanks", ["Delta"], "neutral")])
+    results = salvage_batch_response(response, tweets)
+    assert results[0]["airlines"] == ["United"]
+    assert results[1]["airlines"] == ["Delta"]
+
+def test_salvage_assigns_identical_echoes_to_the_first_unassigned_tweet():
+    tweets = ["same text", "same text", "other"]
+    response = json.dumps([item("same text", sentiment="negative"), item("same text", sentiment="positive"),
+                           item("other", sentiment="neutral")])
+    results = salvage_batch_response(response, tweets)
+    assert [result["sentiment"] for result in results] == ["negative", "positive", "neutral"]
+
+def test_salvage_recovers_items_before_a_truncation():
+    tweets = ["a", "b", "c"]
+    response = '```json\n[' + json.dumps(item()) + ', {"airlines": ["Del'
+    results = salvage_batch_response(response, tweets)
+    assert results[0] == {"airlines": ["United"], "sentiment": "negative"}
+    assert results[1:] == [None, None]
+
+def test_salvage_drops_invalid_items():
+    tweets = ["a", "b"]
+    response = json.dumps([item(sentiment="furious"), {"airlines": "United", "sentiment": "neutral"}])
+    assert salvage_batch_response(response, tweets) == [None, None]
+
+def test_salvage_does_not_guess_positions_for_a_short_complete_response():
+    tweets = ["a", "b", "c"]
+    response = json.dumps([item(), item()])
+    assert salvage_batch_response(response, tweets) == [None, None, None]
+
+def test_parse_batch_response_fills_defaults():
+    results = parse_batch_response("garbage", ["a", "b"])
+    assert results == [{"airlines": [], "sentiment": "neutral"}] * 2
@@ -0,0 +1,100 @@
+"""Tests for sharding (evals.utils.data) and shard merging (evals.merge)."""
+
+import json
+
+import pandas as pd
+import pytest
+
+from evals.merge import load_shards, merge_solutions
+from evals.utils.checkpoint import record_key
+from evals.utils.data import parse_shard, save_run_config, select_shard, shard_of
+
+CONFIG = {'experiment': 'entity_v1', 'n_samples': 10, 'batch_size': 1, 'test': False, 'archive': None,
+          'chunk_size': None, 'pack_tokens': None, 'entity_fast_path': False, 'dedup_threshold': None,
+          'cascade_target_accuracy': None}
+
+def make_shard(tmp_path, index, count, records=(), **overrides):
+    shard_dir = tmp_path / f"run_shard_{index}of{count}"
+    shard_dir.mkdir()
+    save_run_config(str(shard_dir), {**CONFIG, **overrides, 'shard': f"{index}/{count}"})
+    with open(shard_dir / "solution.jsonl", 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return str(shard_dir)
+
+def entity_record(row_id):
+    return {'id': row_id, 'input': f"tweet {row_id}", 'ideal': {}, 'output': {}}
+
+def test_parse_shard():
+    assert parse_shard("0/4") == (0, 4)
+    assert parse_shard("3/4") == (3, 4)
+    for spec in ("4/4", "-1/4", "0/0", "1", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+def test_shard_of_is_stable_across_processes():
+    # Fixed values: a change here would split resumed or merged runs differently
+    assert [shard_of(row_id, 4) for row_id in range(10)] == [1, 2, 0, 1, 2, 0, 0, 2, 2, 1]
+    assert shard_of("abc", 3) == 1
+    assert shard_of(7, 4) == shard_of("7", 4)
+
+def test_select_shard_partitions_rows_in_order():
+    df = pd.DataFrame({'tweet': [f"t{i}" for i in range(50)]}, index=range(100, 150))
+    parts = [select_shard(df, index, 3) for index in range(3)]
+    assert sorted(row_id for part in parts for row_id in part.index) == list(df.index)
+    for part in parts:
+        assert list(part.index) == sorted(part.index)
+
+def test_load_shards_sorts_and_checks_shards(tmp_path):
+    dirs = [make_shard(tmp_path, index, 3) for index in (2, 0, 1)]
+    config, shards = load_shards(dirs)
+    assert config == CONFIG
+    assert [shard['index'] for shard in shards] == [0, 1, 2]
+
+def test_load_shards_rejects_missing_repeated_or_mismatched_shards(tmp_path):
+    first = make_shard(tmp_path, 0, 3)
+    with pytest.raises(ValueError, match="missing"):
+        load_shards([first, make_shard(tmp_path, 1, 3)])
+    with pytest.raises(ValueError, match="different parameters"):
+        load_shards([first, make_shard(tmp_path, 2, 3, n_samples=20)])
+    unsharded = tmp_path / "unsharded"
+    unsharded.mkdir()
+    save_run_config(str(unsharded), {**CONFIG, 'shard': None})
+    with pytest.raises(ValueError, match="not run with --shard"):
+        load_shards([str(unsharded)])
+
+def test_merge_solutions_restores_dataset_order(tmp_path):
+    keys = [record_key(row_id) for row_id in range(10)]
+    records = {index: [entity_record(row_id) for row_id in reversed(range(10)) if shard_of(row_id, 3) == index]
+               for index in range(3)}
+    _, shards = load_shards([make_shard(tmp_path, index, 3, records[index]) for index in range(3)])
+    lines, report = merge_solutions(shards, keys)
+    assert [json.loads(line)['id'] for line in lines] == list(range(10))
+    assert report == {'missing': {}, 'misplaced': 0, 'unexpected': 0, 'duplicates': 0}
+
+def test_merge_solutions_reports_bad_keys(tmp_path):
+    keys = [record_key(row_id) for row_id in range(30)]
+    home = {index: [row_id for row_id in range(30) if shard_of(row_id, 3) == index] for index in range(3)}
+    misplaced = home[1][0]
+    records = {
+        # Shard 0 holds one of its rows twice, an id outside the sample and a row that hashes to shard 1
+        0: [entity_record(row_id) for row_id in home[0]] + [entity_record(home[0][0]), entity_record(999),
+                                                           entity_record(misplaced)],
+        # Shard 1 is missing the row shard 0 wrongly holds
+        1: [entity_record(row_id) for row_id in home[1] if row_id != misplaced],
+        2: [entity_record(row_id) for row_id in home[2]],
+    }
+    _, shards = load_shards([make_shard(tmp_path, index, 3, records[index]) for index in range(3)])
+    lines, report = merge_solutions(shards, keys)
+    assert report == {'missing': {1: 1}, 'misplaced': 1, 'unexpected': 1, 'duplicates': 1}
+    assert lines[misplaced] is None
+
+def test_merge_solutions_keys_sentiment_records_by_airline(tmp_path):
+    keys = [record_key(1, "Delta"), record_key(1, "United")]
+    index = shard_of(1, 1)
+    records = [{'id': 1, 'input': {'tweet': "t", 'airline': airline}, 'ideal': {}, 'output': {}}
+               for airline in ("United", "Delta")]
+    _, shards = load_shards([make_shard(tmp_path, index, 1, records)])
+    lines, report = merge_solutions(shards, keys)
+    assert [json.loads(line)['input']['airline'] for line in lines] == ["Delta", "United"]
+    assert report['missing'] == {}